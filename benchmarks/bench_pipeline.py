@@ -0,0 +1,172 @@
+"""
+全流程基准测试 (不依赖 demo/ 素材与真实 TTS 引擎)：
+合成 SRT -> 解析 -> 假 TTS 合成 -> 变速 -> 拼装 -> 混流，逐阶段记录耗时与内存
+
+用法 (在项目根目录执行):
+    python -m benchmarks.bench_pipeline --lines 1000 --latency-ms 20 --output bench.json
+    python -m benchmarks.bench_pipeline --lines 50000 --skip-mix --trace-memory
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+from contextlib import contextmanager
+
+import config
+from core.subtitle_parser import SubtitleParser
+from core.audio_processor import AudioProcessor
+from core.video_mixer import VideoMixer
+from core.duration_model import DurationPredictor
+from benchmarks.synthetic import generate_srt, FakeTTSProvider
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+class StageTimer:
+    """记录每个阶段的墙钟耗时、峰值 RSS 的增长量，以及 (可选) tracemalloc 统计的阶段内峰值分配"""
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        rss_before = _max_rss_mb()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                "seconds": round(time.perf_counter() - start, 4),
+                "max_rss_mb": round(_max_rss_mb(), 1),
+                "rss_growth_mb": round(_max_rss_mb() - rss_before, 1),
+            }
+            if self.trace_memory:
+                record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+            self.stages[name] = record
+
+def _make_video(path: str, duration_s: float):
+    """用 ffmpeg lavfi 生成带背景音的测试视频 (不计入耗时)"""
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=25:duration={duration_s:.3f}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={duration_s:.3f}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path
+    ]
+    subprocess.run(cmd, check=True)
+
+def run(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="lark_bench_")
+    timer = StageTimer(args.trace_memory)
+    if args.trace_memory:
+        tracemalloc.start()
+    try:
+        srt_path = os.path.join(work_dir, "bench.srt")
+        srt_info = generate_srt(srt_path, args.lines, seed=args.seed, min_chars=args.min_chars,
+                                max_chars=args.max_chars, overlap=args.overlap)
+        tts = FakeTTSProvider(chars_per_second=args.tts_cps, latency_ms=args.latency_ms,
+                              latency_per_char_ms=args.latency_per_char_ms)
+        # 语速规划使用本次运行独立的时长模型，结果不受之前运行的影响
+        duration_model = DurationPredictor(os.path.join(work_dir, "duration_model.json")) if args.rate_planning else None
+        processor = AudioProcessor(tts, max_workers=args.workers, stretch_engine=args.stretch_engine,
+                                   duration_model=duration_model)
+
+        with timer.stage("parse"):
+            subtitles = SubtitleParser(srt_path).parse()
+
+        with timer.stage("synthesize"):
+            timeline = processor.allocate_timeline(subtitles)
+            segments, stretch_jobs = processor.synthesize_segments(subtitles, timeline, config.MAX_SPEED_UP_RATIO)
+
+        with timer.stage("stretch"):
+            processor._stretch_segments(stretch_jobs, segments, work_dir, timeline)
+
+        with timer.stage("assemble"):
+            processor.assemble(timeline, subtitles, segments)
+
+        mix = {"skipped": None}
+        if args.skip_mix:
+            mix["skipped"] = "--skip-mix"
+        elif not shutil.which("ffmpeg"):
+            mix["skipped"] = "ffmpeg not found"
+        else:
+            video_path = os.path.join(work_dir, "bench.mp4")
+            _make_video(video_path, timeline.duration_ms / 1000)
+            with timer.stage("mix"):
+                stream = VideoMixer().open_stream(video_path, os.path.join(work_dir, "out.mp4"),
+                                                  timeline.frame_rate, timeline.channels)
+                stream.write(timeline.samples)
+                stream.close()
+
+        total = sum(stage["seconds"] for stage in timer.stages.values())
+        return {
+            "benchmark": "pipeline",
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "config": {
+                "lines": args.lines, "seed": args.seed, "min_chars": args.min_chars, "max_chars": args.max_chars,
+                "overlap": args.overlap, "tts_cps": args.tts_cps, "latency_ms": args.latency_ms,
+                "latency_per_char_ms": args.latency_per_char_ms, "workers": args.workers,
+                "stretch_engine": args.stretch_engine, "trace_memory": args.trace_memory,
+                "rate_planning": args.rate_planning,
+            },
+            "input": {
+                "subtitles": len(subtitles),
+                "chars": srt_info["chars"],
+                "timeline_seconds": round(timeline.duration_ms / 1000, 1),
+                "stretched": len(stretch_jobs),
+                "rate_planned": processor.rate_report["planned"],
+                "stretches_avoided": processor.rate_report["avoided"],
+                "silence_trimmed_ms": processor.trim_report["trimmed_ms"],
+                "trim_stretches_avoided": processor.trim_report["stretches_avoided"],
+            },
+            "stages": timer.stages,
+            "mix": mix,
+            "total_seconds": round(total, 4),
+            "lines_per_second": round(len(subtitles) / total, 1) if total else None,
+        }
+    finally:
+        if args.trace_memory:
+            tracemalloc.stop()
+        shutil.rmtree(work_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Lark 全流程基准测试 (合成字幕 + 假 TTS)")
+    parser.add_argument("--lines", type=int, default=1000, help="合成字幕条数 (100 - 50000)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同参数下生成完全相同的字幕")
+    parser.add_argument("--min-chars", type=int, default=4, help="每句最少字数")
+    parser.add_argument("--max-chars", type=int, default=30, help="每句最多字数")
+    parser.add_argument("--overlap", type=float, default=0.05, help="与上一句重叠的句子比例")
+    parser.add_argument("--tts-cps", type=float, default=5.0, help="假 TTS 的朗读速度 (字/秒)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="假 TTS 每次调用的固定延迟")
+    parser.add_argument("--latency-per-char-ms", type=float, default=0.0, help="假 TTS 按字数增加的延迟")
+    parser.add_argument("--workers", type=int, default=config.TTS_MAX_WORKERS, help="并发合成线程数")
+    parser.add_argument("--stretch-engine", choices=["wsola", "ffmpeg"], default=config.TIME_STRETCH_ENGINE)
+    parser.add_argument("--rate-planning", action="store_true", help="启用语速规划 (合成前按时长模型提高假 TTS 的语速)")
+    parser.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 统计各阶段峰值分配 (会拖慢 Python 密集的阶段)")
+    parser.add_argument("--skip-mix", action="store_true", help="跳过 ffmpeg 混流阶段")
+    parser.add_argument("--output", default=None, help="结果 JSON 的保存路径 (缺省只打印)")
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
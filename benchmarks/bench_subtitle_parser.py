@@ -0,0 +1,109 @@
+"""
+字幕解析基准测试：流式解析器 (SubtitleParser.iter_items) 与原先基于 pysrt.open 的整文件解析对比，
+记录总耗时、首条字幕产出延迟与 tracemalloc 峰值分配，并校验两者结果一致
+
+用法 (在项目根目录执行):
+    python -m benchmarks.bench_subtitle_parser --lines 50000 --encoding gbk --output parser.json
+"""
+import os
+import time
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import pysrt
+
+from core.subtitle_parser import SubtitleParser, SubtitleItem
+from benchmarks.synthetic import generate_srt
+
+def parse_with_pysrt(srt_path: str):
+    """原解析路径：pysrt 一次性读入整个文件，UTF-8 失败后以 GBK 重新读取"""
+    try:
+        subs = pysrt.open(srt_path, encoding='utf-8')
+    except UnicodeDecodeError:
+        subs = pysrt.open(srt_path, encoding='gbk')
+    for i, sub in enumerate(subs):
+        start_ms, end_ms = sub.start.ordinal, sub.end.ordinal
+        text = sub.text.replace('\n', ' ').strip()
+        if end_ms - start_ms <= 0 or not text:
+            continue
+        yield SubtitleItem(index=i + 1, start_time_ms=start_ms, end_time_ms=end_ms,
+                           duration_ms=end_ms - start_ms, text=text)
+
+def parse_streaming(srt_path: str):
+    return SubtitleParser(srt_path).iter_items()
+
+def _measure(parse, srt_path: str, repeat: int) -> dict:
+    best_total = best_first = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = parse(srt_path)
+        next(items)  # 只记录首条字幕可用的时刻
+        first_at = time.perf_counter() - start
+        count = 1 + sum(1 for _ in items)
+        total = time.perf_counter() - start
+        best_total = total if best_total is None else min(best_total, total)
+        best_first = first_at if best_first is None else min(best_first, first_at)
+
+    # 峰值内存单独测一次：只逐条消费、不保留结果，体现解析器自身的内存占用
+    tracemalloc.start()
+    for _ in parse(srt_path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "items": count,
+        "seconds": round(best_total, 4),
+        "first_item_ms": round(best_first * 1000, 2),
+        "peak_traced_mb": round(peak / 1024 ** 2, 2),
+        "lines_per_second": round(count / best_total, 1),
+    }
+
+def run(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="lark_bench_")
+    try:
+        srt_path = os.path.join(work_dir, "bench.srt")
+        generate_srt(srt_path, args.lines, seed=args.seed, min_chars=args.min_chars, max_chars=args.max_chars)
+        if args.encoding != "utf-8":
+            with open(srt_path, encoding="utf-8") as f:
+                content = f.read()
+            with open(srt_path, "w", encoding=args.encoding) as f:
+                f.write(content)
+
+        reference = list(parse_with_pysrt(srt_path))
+        identical = reference == list(parse_streaming(srt_path))
+        return {
+            "benchmark": "subtitle_parser",
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "config": {"lines": args.lines, "seed": args.seed, "encoding": args.encoding, "repeat": args.repeat},
+            "file_mb": round(os.path.getsize(srt_path) / 1024 ** 2, 2),
+            "identical": identical,
+            "pysrt": _measure(parse_with_pysrt, srt_path, args.repeat),
+            "streaming": _measure(parse_streaming, srt_path, args.repeat),
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Lark 字幕解析基准测试 (流式解析 vs pysrt)")
+    parser.add_argument("--lines", type=int, default=50000, help="合成字幕条数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-chars", type=int, default=4)
+    parser.add_argument("--max-chars", type=int, default=30)
+    parser.add_argument("--encoding", default="utf-8", help="测试文件的编码，例如 gbk (走 chardet 识别路径)")
+    parser.add_argument("--repeat", type=int, default=3, help="计时重复次数，取最好成绩")
+    parser.add_argument("--output", default=None, help="结果 JSON 的保存路径 (缺省只打印)")
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+变速引擎基准测试：对比进程内 WSOLA 与逐句 ffmpeg atempo 子进程
+
+用法 (在项目根目录执行):
+    python -m benchmarks.bench_time_stretch --segments 300
+"""
+import os
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from pydub import AudioSegment
+
+from core.time_stretch import stretch_many
+from core.timeline import TimelineBuffer
+from core.audio_processor import AudioProcessor
+
+def make_segments(count: int, frame_rate: int, seed: int = 0):
+    """生成类语音的测试片段：基频随机的谐波叠加 + 音节包络，时长 1-4 秒，变速倍率 1.05-1.5"""
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for _ in range(count):
+        seconds = rng.uniform(1.0, 4.0)
+        t = np.arange(int(frame_rate * seconds)) / frame_rate
+        f0 = rng.uniform(90, 260)
+        voice = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        samples = (voice * envelope * 6000).astype(np.int16).reshape(-1, 1)
+        jobs.append((samples, float(rng.uniform(1.05, 1.5))))
+    return jobs
+
+def bench_wsola(jobs, frame_rate, workers):
+    start = time.perf_counter()
+    stretch_many(jobs, frame_rate, workers=workers)
+    return time.perf_counter() - start
+
+def bench_ffmpeg(jobs, frame_rate):
+    """复现原有流程：写 wav -> ffmpeg atempo -> from_wav 读回"""
+    work_dir = tempfile.mkdtemp(prefix="lark_bench_")
+    processor = AudioProcessor(tts_provider=None, stretch_engine="ffmpeg")
+    timeline = TimelineBuffer(0, frame_rate)
+    try:
+        start = time.perf_counter()
+        for i, (samples, ratio) in enumerate(jobs):
+            src = os.path.join(work_dir, f"tts_{i}.wav")
+            dst = os.path.join(work_dir, f"tts_processed_{i}.wav")
+            AudioSegment(samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=1).export(src, format="wav")
+            processor._apply_atempo(src, dst, ratio)
+            timeline.to_array(AudioSegment.from_wav(dst))
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="WSOLA vs ffmpeg atempo 变速基准测试")
+    parser.add_argument("--segments", type=int, default=300, help="测试片段数量")
+    parser.add_argument("--frame-rate", type=int, default=22050, help="采样率")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="WSOLA 进程池大小")
+    parser.add_argument("--skip-ffmpeg", action="store_true", help="跳过 ffmpeg 对照组")
+    args = parser.parse_args()
+
+    jobs = make_segments(args.segments, args.frame_rate)
+    audio_seconds = sum(len(s) for s, _ in jobs) / args.frame_rate
+    results = {
+        "segments": args.segments,
+        "audio_seconds": round(audio_seconds, 1),
+        "wsola_inline_s": round(bench_wsola(jobs, args.frame_rate, workers=1), 3),
+        "wsola_pool_s": round(bench_wsola(jobs, args.frame_rate, workers=args.workers), 3),
+        "wsola_workers": args.workers,
+    }
+    if not args.skip_ffmpeg:
+        if shutil.which("ffmpeg"):
+            results["ffmpeg_atempo_s"] = round(bench_ffmpeg(jobs, args.frame_rate), 3)
+        else:
+            results["ffmpeg_atempo_s"] = None
+            print("未找到 ffmpeg，跳过对照组")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,137 @@ import os
 
 # 基础路径配置
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-TEMP_DIR = os.path.join(PROJECT_ROOT, "temp")
-
-# 确保临时目录存在
-os.makedirs(TEMP_DIR, exist_ok=True)
+TEMP_DIR = os.path.join(PROJECT_ROOT, "temp")  # 由 run_dubbing_job 在任务开始时创建，导入配置时不触碰磁盘
 
 # 音频处理策略
 MAX_SPEED_UP_RATIO = 1.5  # 最大允许的加速倍率 (超过则裁剪结尾)
 BACKGROUND_VOLUME_RATIO = 0.2  # 原视频作为背景音的音量比例 (20%)
+MIX_AUDIO_BITRATE = "192k"  # 混流输出 AAC 音轨的最低码率 (原音轨码率更高时沿用原码率)
+# 多版本输出时按朗读语言标注音轨的 ISO 639-2 语言代码 (本地引擎音色均为中文)
+TRACK_LANGUAGE_CODES = {"中文": "chi", "English": "eng", "日本語": "jpn", "粤语": "yue", "한국어": "kor"}
+
+# 长视频分段并行混流: 时长超过 MIX_CHUNK_MIN_SECONDS 时把音轨切成 MIX_CHUNKS 段 (None 表示 CPU 核数)
+# 并行编码后按 AAC 帧拼接，视频与音轨均以 stream copy 封装；此模式需要配音音轨落盘，会自动关闭流式混流
+MIX_CHUNKS = None
+MIX_CHUNK_MIN_SECONDS = 1200
+
+# 配音音轨的内部格式: 所有 TTS 片段在拼装时统一转换到该采样率/声道数
+VOCAL_SAMPLE_RATE = 22050
+VOCAL_CHANNELS = 1
+# 按原视频音轨确定每个任务的内部格式: 配音直接按原音轨的采样率 (以及单/双声道布局) 拼装，
+# 每句只在合成后转换一次，混流时无需再重采样；原视频无音轨、多于两个声道或探测失败时沿用上面的缺省格式。
+# 注意内部格式越高，拼装音轨占用的内存越大 (48kHz 双声道约为 22.05kHz 单声道的 4.4 倍)
+VOCAL_MATCH_SOURCE_FORMAT = True
+
+# 静音裁剪: 判断是否需要变速之前，先按短时能量去掉每句合成结果首尾的静音 (引擎输出常带数百毫秒的空白)，
+# 窗口均方根低于 SILENCE_TRIM_THRESHOLD_DB (dBFS) 视为静音，首尾各保留 SILENCE_TRIM_PAD_MS 的保护余量
+SILENCE_TRIM_ENABLED = True
+SILENCE_TRIM_THRESHOLD_DB = -45.0
+SILENCE_TRIM_PAD_MS = 40
+SILENCE_TRIM_WINDOW_MS = 10
+
+# 变速引擎: "wsola" 为进程内向量化实现 (多进程并行)，"ffmpeg" 为逐句调用 atempo 的兼容回退方案
+TIME_STRETCH_ENGINE = "wsola"
+TIME_STRETCH_WORKERS = None  # WSOLA 进程池大小，None 表示使用 CPU 核数
+
+# 流式混流: 配音 PCM 直接管道输入 ffmpeg，不再导出 merged_vocal.wav
+STREAM_VOCAL_TO_MIXER = True
+
+# 并发合成: 同时发起的 TTS 请求数 (非线程安全的引擎会自动退化为串行)
+TTS_MAX_WORKERS = 4
+
+# 本地引擎 (pyttsx3: Windows sapi5 / Linux espeak-ng) 的进程池大小: 每个进程持有独立的引擎实例并行合成，
+# None 表示使用 CPU 核数，1 表示在当前进程内使用单个引擎 (Mac 的 say 本身可并发，不使用进程池)
+NATIVE_TTS_PROCESSES = None
+
+# 批量合成: 对支持批处理的引擎，每批最多包含的句数与总字符数
+TTS_BATCH_SIZE = 8
+TTS_BATCH_MAX_CHARS = 300
+
+# TTS 持久化缓存: 按 (规范化文本, 引擎模式, 音色, 语速/风格) 的哈希寻址，跨任务复用
+# 缓存目录独立于 TEMP_DIR，不会被每次任务前后的清理动作删除
+TTS_CACHE_ENABLED = True
+TTS_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "tts")
+TTS_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 缓存容量上限 (2GB)，超出后按最近最少使用淘汰
+# 重新扫描缓存目录统计总容量的间隔 (秒)：多个进程 (批量任务、守护进程与命令行) 共用缓存目录时，
+# 每个进程只能累计自己写入的大小，定期重新扫描才能计入其他进程的写入并及时淘汰
+TTS_CACHE_RESCAN_SECONDS = 60
+# 缓存条目的存储格式：wav 在进程内直接读写；其他格式 (如 flac，体积约为 wav 的一半) 经 pydub 调用 ffmpeg 子进程编解码，
+# 每次命中与写入都要启动一个进程，且未安装 ffmpeg 时无法写入缓存
+TTS_CACHE_FORMAT = "wav"
+
+# 语速规划: 按音色在线学习 "字数/秒" 并持久化到 DURATION_MODEL_PATH，合成前为预计超出字幕窗口的句子
+# 直接提高引擎语速 (本地引擎的 rate / CosyVoice 的 speed)，让大多数句子无需事后变速就能放进窗口
+RATE_PLANNING_ENABLED = True
+DURATION_MODEL_PATH = os.path.join(PROJECT_ROOT, "cache", "duration_model.json")
+DURATION_MODEL_DECAY = 0.98      # 每新增一句，历史样本的权重衰减系数 (越小越偏向最近的句子)
+RATE_PLAN_MIN_SAMPLES = 5        # 某音色累计样本少于该句数时不做预测
+RATE_PLAN_MARGIN = 1.05          # 预测时长的安全余量
+RATE_PLAN_STEP = 0.05            # 语速倍率的量化步长 (同时让相同文本在缓存中可复用)
+RATE_PLAN_MAX_SPEED = 1.3        # 引擎语速最多提高到的倍率，剩余超出部分仍交给变速处理
+
+# 增量渲染: 在输出视频旁保存渲染清单 (<输出文件>.lark/)，再次运行时只重新合成改动过的字幕，
+# 中途崩溃的任务也可从已完成的句子继续
+RENDER_MANIFEST_ENABLED = True
+
+# 字幕编码识别: 只读取文件开头这么多字节交给 chardet 推测编码 (BOM 与 UTF-8 优先判断)
+SRT_ENCODING_SAMPLE_BYTES = 64 * 1024
+
+# 任务指标: 在 <输出文件>.lark/ 下追加 metrics.jsonl (各阶段耗时、单次 TTS 请求、变速倍率、混流进度等事件)
+# 并写出 metrics.prom (Prometheus 文本格式，可交给 node_exporter 的 textfile 采集器)
+METRICS_ENABLED = True
+
+# 图形界面后台预合成: 选中字幕后按当前参数在后台合成并写入 TTS 缓存 (需启用 TTS 缓存)，
+# 参数改动停止 PRESYNTH_DEBOUNCE_MS 毫秒后按新参数重新开始；每合成 PRESYNTH_CHUNK_LINES 句检查一次是否放弃
+PRESYNTH_ENABLED = True
+PRESYNTH_DEBOUNCE_MS = 800
+PRESYNTH_CHUNK_LINES = 16
+# 图形界面进度刷新的最短间隔 (毫秒)：期间的多次进度汇报合并为一次界面更新
+GUI_PROGRESS_INTERVAL_MS = 100
+
+# 常驻渲染服务 (python main.py daemon): 只监听本机地址，按音色保持已初始化的 TTS 引擎；
+# main.py 检测到服务在运行时直接把任务提交给它 (--no-daemon 强制在当前进程中渲染)
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 9240
+DAEMON_MAX_JOBS = 2           # 同时运行的任务数 (同一音色的任务共用一个引擎，按提交顺序依次执行)
+DAEMON_JOB_HISTORY = 200      # 保留状态以供查询的已结束任务数
+DAEMON_PROBE_TIMEOUT = 0.5    # 探测服务是否在运行的超时 (秒)
+DAEMON_REQUEST_TIMEOUT = 10   # 提交任务/查询状态的超时 (秒)
+DAEMON_POLL_INTERVAL = 0.5    # 客户端轮询任务状态的间隔 (秒)
+
+# 批量模式 (main.py batch): 并行任务数 (None 表示 CPU 核数)、所有任务共享的 TTS 并发上限、
+# 任务工作区的父目录 (None 表示系统临时目录；--tmpfs 时改用 BATCH_TMPFS_DIR)
+BATCH_MAX_JOBS = None
+BATCH_TTS_CONCURRENCY = 8
+BATCH_WORKSPACE_ROOT = None
+BATCH_TMPFS_DIR = "/dev/shm"
 
 # TTS 引擎模式选择: "native" 或 "cosyvoice"
 TTS_MODE = "native" 
 COSYVOICE_URL = "http://localhost:9233/v1/audio/speech"
+# 批量合成接口 (可选，缺省为 None 即始终逐句请求)。CosyVoice 服务本身不提供该接口，需要自行部署满足以下约定的服务后再填写地址：
+#   请求: POST JSON {"model", "inputs": [逐句文本], "voice", "response_format": "wav"}，
+#         可选 "speed" (整批统一的语速倍率) 与 "sample_rate" (期望的输出采样率)
+#   响应: 200，正文为各句按顺序拼接成的一个 wav；响应头 X-Segment-Frames 给出逐句的采样帧数 (逗号分隔，与 inputs 一一对应)
+#   返回 404/405/501 时视为不支持批量接口，之后改为逐句请求
+COSYVOICE_BATCH_URL = None
+
+# 流式接收: 落盘的请求 (generate_audio) 按分块边收边写入片段文件，不在内存中缓存整段响应；
+# 直接返回内存音频的 synthesize 始终整段接收后一次解析
+COSYVOICE_STREAMING = True
+COSYVOICE_PCM_SAMPLE_RATE = 22050  # 服务端以裸 PCM 分块返回时的采样率 (16bit 单声道)
+# 请求服务端直接以任务内部格式的采样率返回裸 PCM (response_format=pcm + sample_rate)，省去本地重采样。
+# 只有响应头声明了相同采样率 (X-Sample-Rate 或 Content-Type 的 rate 参数) 的裸 PCM 才会被采用；
+# 服务端明确拒绝该格式或未声明采样率时自动关闭，改回请求 wav (wav 头部自带采样率，由本地转换)
+COSYVOICE_REQUEST_PCM = True
+
+# CosyVoice HTTP 长连接池与重试策略
+COSYVOICE_MAX_CONNECTIONS = 8      # 连接池最多同时持有的连接数 (所有工作线程共享)
+COSYVOICE_CONNECT_TIMEOUT = 5      # 建立 TCP 连接的超时 (秒)
+COSYVOICE_READ_TIMEOUT = 120       # 等待/读取响应的超时 (秒)
+COSYVOICE_REQUEST_DEADLINE = 300   # 单句请求含全部重试的总截止时间 (秒)
+COSYVOICE_MAX_RETRIES = 3          # 连接错误、超时与 5xx 响应的最大重试次数
+COSYVOICE_RETRY_BACKOFF = 0.5      # 指数退避的基准等待时间 (秒)，实际等待带随机抖动
 
 # 引擎能力矩阵与参数映射
 TTS_ENGINE_CAPABILITIES = {
@@ -22,8 +141,8 @@ TTS_ENGINE_CAPABILITIES = {
         "params": ["gender", "rate"],
         "genders": ["male", "female"],
         "voices": {
-            "female": {"mac": "Tingting", "win": "Huihui"},
-            "male": {"mac": "Eddy", "win": "Kangkang"}
+            "female": {"mac": "Tingting", "win": "Huihui", "linux": "cmn+f3"},
+            "male": {"mac": "Eddy", "win": "Kangkang", "linux": "cmn+m3"}
         },
         "default_rate": 180  # 系统默认语速 (单词/分钟)
     },
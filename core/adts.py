@@ -0,0 +1,47 @@
+"""
+ADTS (裸 AAC 流) 的帧级读写：分段并行编码后按帧裁剪、拼接，再交给 ffmpeg 以 stream copy 封装
+"""
+from typing import BinaryIO, List
+
+AAC_FRAME_SAMPLES = 1024  # 每个 AAC 帧固定编码 1024 个采样
+
+def split_frames(data: bytes) -> List[bytes]:
+    """按 ADTS 帧头切分字节流，返回每帧 (含帧头) 的字节"""
+    frames = []
+    pos = 0
+    while pos + 7 <= len(data):
+        if data[pos] != 0xFF or (data[pos + 1] & 0xF0) != 0xF0:
+            raise ValueError(f"ADTS 同步字错误 (偏移 {pos})")
+        length = ((data[pos + 3] & 0x03) << 11) | (data[pos + 4] << 3) | (data[pos + 5] >> 5)
+        if length < 7 or pos + length > len(data):
+            raise ValueError(f"ADTS 帧长度无效 (偏移 {pos})")
+        frames.append(data[pos:pos + length])
+        pos += length
+    return frames
+
+def append_frames(target: BinaryIO, source_path: str, skip: int, keep: int = None) -> int:
+    """
+    把 source_path 中第 skip 帧起的 keep 帧 (缺省为剩余全部) 追加写入 target
+    :return: 实际写入的帧数
+    """
+    with open(source_path, "rb") as f:
+        frames = split_frames(f.read())
+    selected = frames[skip:] if keep is None else frames[skip:skip + keep]
+    for frame in selected:
+        target.write(frame)
+    return len(selected)
+
+def chunk_windows(total_samples: int, chunks: int) -> List[tuple]:
+    """
+    把 [0, total_samples) 切分为至多 chunks 个窗口 (start, end)，除最后一个窗口外边界都对齐到 AAC 帧长，
+    保证各段编码后的帧可以首尾相接，不产生半帧缝隙
+    """
+    frames = -(-total_samples // AAC_FRAME_SAMPLES)
+    per_chunk = max(1, -(-frames // chunks)) * AAC_FRAME_SAMPLES
+    windows = []
+    start = 0
+    while start < total_samples:
+        end = min(start + per_chunk, total_samples)
+        windows.append((start, end))
+        start = end
+    return windows
@@ -0,0 +1,71 @@
+import io
+import wave
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    # pydub 导入时会探测 ffmpeg，只在真正需要转换格式时才导入
+    from pydub import AudioSegment
+
+@dataclass
+class AudioClip:
+    """内存中的一段 PCM 音频：int16 采样 ([帧数, 声道数]) 加采样率，时长直接由采样数得出，无需解码"""
+    samples: np.ndarray
+    frame_rate: int
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration_ms(self) -> int:
+        return int(round(self.frames * 1000 / self.frame_rate))
+
+    @classmethod
+    def from_wav_bytes(cls, data: bytes) -> "AudioClip":
+        """直接按 wav 头部信息取出 PCM 数据；非 16bit 整型 PCM (如 float/24bit) 再交给 pydub 转换"""
+        try:
+            with wave.open(io.BytesIO(data), "rb") as w:
+                channels, sample_width, frame_rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+                raw = w.readframes(w.getnframes())
+        except wave.Error:
+            from pydub import AudioSegment
+            return cls.from_segment(AudioSegment.from_file(io.BytesIO(data), format="wav"))
+        if sample_width != 2:
+            from pydub import AudioSegment
+            return cls.from_segment(AudioSegment(raw, frame_rate=frame_rate, sample_width=sample_width, channels=channels))
+        return cls(np.frombuffer(raw, dtype=np.int16).reshape(-1, channels), frame_rate)
+
+    @classmethod
+    def from_wav_file(cls, path: str) -> "AudioClip":
+        with open(path, "rb") as f:
+            return cls.from_wav_bytes(f.read())
+
+    @classmethod
+    def from_segment(cls, segment: "AudioSegment") -> "AudioClip":
+        if segment.sample_width != 2:
+            segment = segment.set_sample_width(2)
+        samples = np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, segment.channels)
+        return cls(samples, segment.frame_rate)
+
+    def to_segment(self) -> "AudioSegment":
+        from pydub import AudioSegment
+        return AudioSegment(self.samples.tobytes(), frame_rate=self.frame_rate, sample_width=2, channels=self.channels)
+
+    def write_wav(self, target):
+        """:param target: 输出路径或可写的二进制文件对象"""
+        with wave.open(target, "wb") as w:
+            w.setnchannels(self.channels)
+            w.setsampwidth(2)
+            w.setframerate(self.frame_rate)
+            w.writeframes(self.samples.tobytes())
+
+    def to_wav_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        self.write_wav(buf)
+        return buf.getvalue()
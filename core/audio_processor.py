@@ -1,14 +1,181 @@
 import os
+import time
+import threading
 import subprocess
-from pydub import AudioSegment
-from typing import List, Callable
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from typing import List, Callable, Dict, Optional, Tuple
 
+import config
 from .subtitle_parser import SubtitleItem
 from .tts_provider import TTSProvider
+from .audio_clip import AudioClip
+from .timeline import TimelineBuffer
+from .time_stretch import stretch_many
+from .silence import trim_silence
+from .render_manifest import RenderManifest
+from .metrics import JobMetrics
+from .duration_model import DurationPredictor
 
 class AudioProcessor:
-    def __init__(self, tts_provider: TTSProvider):
+    def __init__(self, tts_provider: TTSProvider, max_workers: Optional[int] = None, stretch_engine: Optional[str] = None, metrics: Optional[JobMetrics] = None, duration_model: Optional[DurationPredictor] = None, timing_identity: Optional[dict] = None, sample_rate: Optional[int] = None, channels: Optional[int] = None):
+        """
+        :param tts_provider: 语音合成引擎
+        :param max_workers: 并发合成的最大线程数，缺省读取 config.TTS_MAX_WORKERS；
+                            若引擎声明自身非线程安全 (thread_safe=False)，则强制串行
+        :param stretch_engine: 变速引擎 "wsola" (进程内向量化实现) 或 "ffmpeg" (逐句 atempo 子进程)，
+                               缺省读取 config.TIME_STRETCH_ENGINE
+        :param metrics: 可选的任务指标记录器，记录各阶段耗时、单次 TTS 请求耗时、变速倍率与导出字节数
+        :param duration_model: 可选的时长预测模型；引擎支持调速 (supports_speed) 时，合成前为预计放不进字幕窗口的句子
+                               提高语速，并用每句的实际时长在线更新模型
+        :param timing_identity: 草稿模式下最终成片所用引擎的 cache_identity：按该音色学到的语速规划每句的语速倍率，
+                                使草稿与最终渲染的加速/变速决策一致；草稿引擎的时长不会写回该音色的模型
+        :param sample_rate: 本次任务配音音轨的内部采样率 (通常取原视频音轨的采样率)，缺省为 config.VOCAL_SAMPLE_RATE；
+                            每句合成结果只在拼装前转换一次到该格式，能按指定采样率输出的引擎直接返回该采样率
+        :param channels: 内部格式的声道数，缺省为 config.VOCAL_CHANNELS
+        """
         self.tts = tts_provider
+        self.max_workers = max_workers if max_workers is not None else config.TTS_MAX_WORKERS
+        self.stretch_engine = stretch_engine or config.TIME_STRETCH_ENGINE
+        if self.stretch_engine not in ("wsola", "ffmpeg"):
+            raise ValueError(f"不支持的变速引擎: {self.stretch_engine}")
+        self.metrics = metrics
+        self.duration_model = duration_model
+        self.timing_identity = timing_identity
+        self.sample_rate = sample_rate or config.VOCAL_SAMPLE_RATE
+        self.channels = channels or config.VOCAL_CHANNELS
+        # 语速规划统计: 提前加速的句数 / 因此免于事后变速的句数
+        self.rate_report = {"planned": 0, "avoided": 0}
+        # 静音裁剪统计: 裁掉静音的句数 / 裁掉的总时长 / 因此免于变速的句数 / 因此免于截断尾部的句数
+        self.trim_report = {"trimmed": 0, "trimmed_ms": 0, "stretches_avoided": 0, "truncations_avoided": 0}
+        self._speeds = {}
+        self._voice = None
+        self._report_lock = threading.Lock()
+
+    def _stage(self, name: str):
+        return self.metrics.stage(name) if self.metrics else nullcontext()
+
+    def _effective_workers(self, total: int) -> int:
+        if not getattr(self.tts, "thread_safe", True):
+            return 1
+        return max(1, min(self.max_workers, total))
+
+    def _plans_speed(self) -> bool:
+        return self.duration_model is not None and getattr(self.tts, "supports_speed", False)
+
+    def _plan_speeds(self, batch: List[SubtitleItem]) -> Optional[List[float]]:
+        """
+        提交合成前才为每句选择语速：模型此时已吸收了本次运行中先完成的句子，
+        未启用语速规划时返回 None (按引擎默认语速合成)
+        """
+        if not self._plans_speed():
+            return None
+        speeds = [self.duration_model.plan_speed(self._voice, item.text, item.duration_ms) for item in batch]
+        for item, speed in zip(batch, speeds):
+            self._speeds[item.index] = speed
+        return speeds
+
+    def _synthesize_one(self, item: SubtitleItem, speed: Optional[float] = None) -> Optional[AudioClip]:
+        """合成单句字幕，音频直接以内存中的 PCM 采样返回，失败返回 None"""
+        if speed is None:
+            return self.tts.synthesize(item.text)
+        return self.tts.synthesize(item.text, speed)
+
+    def _make_batches(self, items: List[SubtitleItem]) -> List[List[SubtitleItem]]:
+        """
+        按顺序把字幕打包成批：每批不超过 config.TTS_BATCH_SIZE 句、总字符数不超过 config.TTS_BATCH_MAX_CHARS
+        (单句超出字符预算时独占一批)。引擎不支持批处理时每句独立成批。
+        """
+        if not getattr(self.tts, "supports_batch", False) or config.TTS_BATCH_SIZE <= 1:
+            return [[item] for item in items]
+        batches, current, chars = [], [], 0
+        for item in items:
+            if current and (len(current) >= config.TTS_BATCH_SIZE or chars + len(item.text) > config.TTS_BATCH_MAX_CHARS):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(item)
+            chars += len(item.text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _synthesize_batch(self, batch: List[SubtitleItem], on_ready: Callable[[SubtitleItem, AudioClip], None] = None) -> List[bool]:
+        """
+        合成一批字幕，返回与 batch 一一对应的成功标记
+        :param on_ready: 每句合成成功后在当前工作线程中立即以 (字幕, 音频) 调用 (用于提前转换格式与测长)
+        """
+        speeds = self._plan_speeds(batch)
+        start = time.perf_counter()
+        if len(batch) == 1:
+            clips = [self._synthesize_one(batch[0], speeds[0] if speeds else None)]
+        elif speeds:
+            clips = self.tts.synthesize_batch([item.text for item in batch], speeds)
+        else:
+            clips = self.tts.synthesize_batch([item.text for item in batch])
+        if self.metrics:
+            self.metrics.observe("tts_request_seconds", time.perf_counter() - start)
+            self.metrics.incr("tts_requests")
+            self.metrics.incr("tts_lines", len(batch))
+            self.metrics.incr("tts_failed_lines", sum(1 for clip in clips if clip is None))
+        if on_ready:
+            for item, clip in zip(batch, clips):
+                if clip is not None:
+                    on_ready(item, clip)
+        return [clip is not None for clip in clips]
+
+    def _synthesize_all(self, subtitles: List[SubtitleItem], progress_callback: Callable[[int, int], None] = None, on_ready: Callable[[SubtitleItem, AudioClip], None] = None) -> Dict[int, bool]:
+        """
+        合成阶段：使用有界线程池并发调用 TTS，返回 {字幕序号: 是否成功}。
+        并发模式下按文本长度从长到短调度 (最长任务优先)，避免长句落在队尾拖慢整体完成时间；
+        支持批处理的引擎会按句数与字符预算分批提交，长度相近的句子自然落在同一批。
+        拼装阶段仍按时间轴顺序进行，与调度顺序无关。
+        """
+        total = len(subtitles)
+        workers = self._effective_workers(total)
+        results = {}
+        done = 0
+
+        if progress_callback:
+            progress_callback(0, total)
+
+        if workers <= 1:
+            # 串行模式：保持时间轴顺序逐批合成
+            for batch in self._make_batches(subtitles):
+                try:
+                    flags = self._synthesize_batch(batch, on_ready)
+                except Exception as e:
+                    self._report_batch_error(batch, e)
+                    flags = [False] * len(batch)
+                for item, ok in zip(batch, flags):
+                    results[item.index] = ok
+                done += len(batch)
+                if progress_callback and done < total:
+                    progress_callback(done, total)
+            return results
+
+        ordered = sorted(subtitles, key=lambda it: len(it.text), reverse=True)
+        batches = self._make_batches(ordered)
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            futures = {pool.submit(self._synthesize_batch, batch, on_ready): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    flags = future.result()
+                except Exception as e:
+                    self._report_batch_error(batch, e)
+                    flags = [False] * len(batch)
+                for item, ok in zip(batch, flags):
+                    results[item.index] = ok
+                done += len(batch)
+                # 回调始终在调用线程中触发，保持与串行模式一致的线程语义
+                if progress_callback and done < total:
+                    progress_callback(done, total)
+        return results
+
+    def _report_batch_error(self, batch: List[SubtitleItem], error: Exception):
+        """引擎抛出的异常只让该批句子记为失败 (静音占位)，不中断整个任务"""
+        print(f"第 {', '.join(str(item.index) for item in batch)} 句合成异常: {error}")
         
     def _apply_atempo(self, input_path: str, output_path: str, ratio: float):
         """调用 FFmpeg 的 atempo 滤镜进行音频变速"""
@@ -17,87 +184,263 @@ class AudioProcessor:
             "-filter:a", f"atempo={ratio}",
             output_path
         ]
+        start = time.perf_counter()
         # 屏蔽 FFmpeg 输出
         subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        if self.metrics:
+            self.metrics.observe("atempo_seconds", time.perf_counter() - start)
+
+    def _stretch_segments(self, jobs: List[Tuple[SubtitleItem, float]], segments: Dict[int, np.ndarray], temp_dir: str, timeline: TimelineBuffer):
+        """
+        对超出字幕窗口的片段统一变速，结果直接替换 segments 中对应的采样
+        :param jobs: [(字幕, 速度倍率), ...]
+        """
+        if not jobs:
+            return
+        if self.metrics:
+            self.metrics.incr("stretched_lines", len(jobs))
+            for _, ratio in jobs:
+                self.metrics.observe("stretch_ratio", ratio)
+        if self.stretch_engine == "ffmpeg":
+            # 兼容回退路径：逐句落盘后调用 ffmpeg atempo 子进程
+            from pydub import AudioSegment
+            for item, ratio in jobs:
+                temp_wav = os.path.join(temp_dir, f"tts_{item.index}.wav")
+                AudioClip(segments[item.index], timeline.frame_rate).write_wav(temp_wav)
+                processed_wav = os.path.join(temp_dir, f"tts_processed_{item.index}.wav")
+                self._apply_atempo(temp_wav, processed_wav, ratio)
+                segments[item.index] = timeline.to_array(AudioSegment.from_wav(processed_wav))
+            return
+
+        stretched = stretch_many(
+            [(segments[item.index], ratio) for item, ratio in jobs],
+            timeline.frame_rate,
+            workers=config.TIME_STRETCH_WORKERS
+        )
+        for (item, _), samples in zip(jobs, stretched):
+            segments[item.index] = samples
         
-    def process_subtitles(self, subtitles: List[SubtitleItem], temp_dir: str, max_speed: float, progress_callback: Callable[[int, int], None] = None) -> str:
+    def _trim(self, clip: AudioClip) -> AudioClip:
+        """config.SILENCE_TRIM_ENABLED 时去掉合成结果首尾的静音，是否变速只取决于实际语音的时长"""
+        if not config.SILENCE_TRIM_ENABLED:
+            return clip
+        samples = trim_silence(clip.samples, clip.frame_rate, config.SILENCE_TRIM_THRESHOLD_DB,
+                               config.SILENCE_TRIM_PAD_MS, config.SILENCE_TRIM_WINDOW_MS)
+        return clip if len(samples) == clip.frames else AudioClip(samples, clip.frame_rate)
+
+    def _count_trim(self, item: SubtitleItem, clip: AudioClip, trimmed: AudioClip, max_speed: float):
+        """统计裁剪效果：按原始时长本需变速 (或超出 max_speed 而被截断) 的句子，裁剪后不再需要"""
+        if trimmed is clip:
+            return
+        before, after = clip.duration_ms, trimmed.duration_ms
+        stretch_avoided = bool(self._fit_ratio(before, item.duration_ms, max_speed)) and after <= item.duration_ms
+        truncation_avoided = before > item.duration_ms * max_speed >= after
+        with self._report_lock:
+            self.trim_report["trimmed"] += 1
+            self.trim_report["trimmed_ms"] += before - after
+            self.trim_report["stretches_avoided"] += int(stretch_avoided)
+            self.trim_report["truncations_avoided"] += int(truncation_avoided)
+        if self.metrics:
+            self.metrics.incr("silence_trimmed_ms", before - after)
+            self.metrics.incr("trim_stretches_avoided", int(stretch_avoided))
+            self.metrics.incr("trim_truncations_avoided", int(truncation_avoided))
+
+    @staticmethod
+    def _fit_ratio(segment_dur_ms: int, target_dur_ms: int, max_speed: float) -> Optional[float]:
         """
-        核心处理：遍历字幕并生成整条拼装对齐好的新音轨
-        :param subtitles: 解析后的字幕列表
-        :param temp_dir: 临时文件存放目录
-        :param max_speed: 最大允许的加速倍率
-        :param progress_callback: UI 回调，报告进度 (当前条数, 总条数)
-        :return: 最终合成好的 wav 音频绝对路径
+        策略: 若 TTS 生成时间过长，计算挤进字幕窗口所需的压缩比率，否则返回 None (尾部补静音即可)
+        超过阈值时先硬性加速到 max_speed，多余尾部在写入时间轴时按窗口长度裁掉
+        """
+        if segment_dur_ms <= target_dur_ms:
+            return None
+        return min(segment_dur_ms / target_dur_ms, max_speed)
+
+    def render_params(self, max_speed: float) -> dict:
+        """影响单句对齐结果的全部参数，用作渲染清单中片段的失效依据"""
+        return {
+            "voice": self.tts.cache_identity(),
+            "max_speed": max_speed,
+            "frame_rate": self.sample_rate,
+            "channels": self.channels,
+            "stretch_engine": self.stretch_engine,
+            **({"rate_plan": {"max_speed": config.RATE_PLAN_MAX_SPEED, "step": config.RATE_PLAN_STEP}}
+               if self._plans_speed() else {}),
+            **({"timing_voice": self.timing_identity} if self.timing_identity else {}),
+            **({"silence_trim": {"threshold_db": config.SILENCE_TRIM_THRESHOLD_DB, "pad_ms": config.SILENCE_TRIM_PAD_MS,
+                                 "window_ms": config.SILENCE_TRIM_WINDOW_MS}}
+               if config.SILENCE_TRIM_ENABLED else {}),
+        }
+
+    def allocate_timeline(self, subtitles: List[SubtitleItem]) -> TimelineBuffer:
+        # 按最后一句字幕的结束时间一次性分配整条音轨，片段直接写入各自的采样偏移
+        total_ms = max((item.end_time_ms for item in subtitles), default=0)
+        return TimelineBuffer(total_ms, self.sample_rate, self.channels)
+
+    def synthesize_segments(self, subtitles: List[SubtitleItem], timeline: TimelineBuffer, max_speed: float, progress_callback: Callable[[int, int], None] = None, manifest: Optional[RenderManifest] = None) -> Tuple[Dict[int, np.ndarray], List[Tuple[SubtitleItem, float]]]:
         """
-        # 初始一个空声轨作为叠加根部
-        final_audio = AudioSegment.silent(duration=0)
-        current_time_ms = 0
+        阶段 1：合成全部字幕 (合成失败的句子保持静音)，并转换为时间轴格式的采样
+        :return: ({字幕序号: 采样}, 需要变速的 [(字幕, 速度倍率), ...])
+        """
+        segments = {}
+        fit_ratios = {}
+        pending = subtitles
+        if manifest is not None:
+            if manifest.params is None:
+                manifest.begin(self.render_params(max_speed))
+            pending = []
+            for item in subtitles:
+                clip = manifest.load_segment(manifest.segment_key(item))
+                if clip is not None:
+                    segments[item.index] = timeline.clip_to_array(clip)
+                else:
+                    pending.append(item)
+
+        def on_ready(item: SubtitleItem, clip: AudioClip):
+            # 在合成工作线程中立即裁剪静音、转换格式并进行长短校验，与其他句子的合成重叠进行。
+            # 变速倍率总是按该句实际返回的音频计算：同一文本的不同句子可能以不同语速合成，时长并不相同
+            trimmed = self._trim(clip)
+            self._count_trim(item, clip, trimmed, max_speed)
+            clip = trimmed
+            segments[item.index] = timeline.clip_to_array(clip)
+            fit_ratios[item.index] = self._fit_ratio(clip.duration_ms, item.duration_ms, max_speed)
+            if self._plans_speed():
+                self._observe_speed(item, clip, fit_ratios[item.index])
+            if manifest is not None and not fit_ratios[item.index]:
+                # 无需变速的片段此刻已经定稿，立即落盘
+                manifest.save_segment(manifest.segment_key(item), segments[item.index], timeline.frame_rate)
+
+        if self._plans_speed():
+            self._voice = DurationPredictor.voice_key(self.timing_identity or self.tts.cache_identity())
+        self.tts.set_output_sample_rate(timeline.frame_rate)
+        try:
+            if pending:
+                self._synthesize_all(pending, progress_callback, on_ready=on_ready)
+        finally:
+            self.tts.set_output_sample_rate(None)
+
+        stretch_jobs = [(item, fit_ratios[item.index]) for item in pending
+                        if item.index in segments and fit_ratios.get(item.index)]
+        return segments, stretch_jobs
+
+    def presynthesize(self, subtitles: List[SubtitleItem], should_stop: Callable[[], bool], max_speed: float, progress_callback: Callable[[int, int], None] = None) -> int:
+        """
+        后台预合成：只调用 TTS (结果由 CachedTTSProvider 写入缓存)，不拼装音轨。
+        按时间轴顺序每 config.PRESYNTH_CHUNK_LINES 句一组合成，组与组之间检查 should_stop 以便随时放弃；
+        语速规划与正式渲染相同 (在线学习、提交时才规划)，正式渲染时同一句会以相同语速命中缓存
+        :return: 已合成的句数
+        """
+        if self._plans_speed():
+            self._voice = DurationPredictor.voice_key(self.timing_identity or self.tts.cache_identity())
+
+        def on_ready(item: SubtitleItem, clip: AudioClip):
+            if self._plans_speed():
+                # 与正式渲染一样按裁剪静音后的时长学习，两者规划出的语速一致
+                clip = self._trim(clip)
+                self._observe_speed(item, clip, self._fit_ratio(clip.duration_ms, item.duration_ms, max_speed))
+
         total = len(subtitles)
-        
-        for i, item in enumerate(subtitles):
-            # 报告进度
+        done = 0
+        step = config.PRESYNTH_CHUNK_LINES
+        for pos in range(0, total, step):
+            if should_stop():
+                break
+            chunk = subtitles[pos:pos + step]
+            self._synthesize_all(chunk, on_ready=on_ready)
+            done += len(chunk)
             if progress_callback:
-                progress_callback(i, total)
-                
-            # 1. 填补间隔静音 (前一句结束到当前句开始)
-            if item.start_time_ms > current_time_ms:
-                gap = item.start_time_ms - current_time_ms
-                final_audio += AudioSegment.silent(duration=gap)
-                current_time_ms = item.start_time_ms
-                
-            # 2. 调用 TTS 接口生成此句字幕片段 (.wav)
-            temp_wav = os.path.join(temp_dir, f"tts_{item.index}.wav")
-            processed_wav = os.path.join(temp_dir, f"tts_processed_{item.index}.wav")
-            
-            success = self.tts.generate_audio(item.text, temp_wav)
-            if not success or not os.path.exists(temp_wav):
-                # 理论上这里的 failed 应该做日志记录，并用静音跳过保证时间轴不错乱
-                final_audio += AudioSegment.silent(duration=item.duration_ms)
-                current_time_ms += item.duration_ms
-                continue
-                
-            # 3. 读取片段长度，并进行长短校验与处理
-            segment = AudioSegment.from_wav(temp_wav)
-            segment_dur_ms = len(segment)
-            target_dur_ms = item.duration_ms
-            
-            if segment_dur_ms <= target_dur_ms:
-                # 策略: 若 TTS 生成足够快，长度没满，尾部补充静音进行对齐 (Pad)
-                diff = target_dur_ms - segment_dur_ms
-                segment += AudioSegment.silent(duration=diff)
-                final_audio += segment
-                current_time_ms += target_dur_ms
-            else:
-                # 策略: 若 TTS 生成时间过长，计算挤进字幕窗口所需的压缩比率 (atempo加速)
-                ratio = segment_dur_ms / target_dur_ms
-                if ratio > max_speed:
-                    # 超过阈值：先硬性加速到 max_speed
-                    self._apply_atempo(temp_wav, processed_wav, max_speed)
-                    accelerated_segment = AudioSegment.from_wav(processed_wav)
-                    # 再强行进行绝对时间裁剪 (丢弃多余尾部)
-                    accelerated_segment = accelerated_segment[:target_dur_ms]
-                    final_audio += accelerated_segment
-                else:
-                    # 在安全接受区间内：完全依据时间比例进行挤压
-                    self._apply_atempo(temp_wav, processed_wav, ratio)
-                    accelerated_segment = AudioSegment.from_wav(processed_wav)
-                    
-                    # 以防 FFmpeg 精度毫秒不完全对齐，强制截取
-                    accelerated_segment = accelerated_segment[:target_dur_ms]
-                    # 余下用静音填平（如果因为四舍五入少了）
-                    diff = target_dur_ms - len(accelerated_segment)
-                    if diff > 0:
-                        accelerated_segment += AudioSegment.silent(duration=diff)
-                        
-                    final_audio += accelerated_segment
-                    
-                current_time_ms += target_dur_ms
+                progress_callback(done, total)
+        return done
+
+    def _observe_speed(self, item: SubtitleItem, clip: AudioClip, ratio: Optional[float]):
+        """用实际时长更新时长模型；提前加速后放进了窗口、而按原语速本会超出的句子计为一次免去的变速"""
+        speed = self._speeds.get(item.index, 1.0)
+        if self.timing_identity is None:
+            self.duration_model.observe(self._voice, item.text, clip.duration_ms, speed)
+        if speed <= 1.0:
+            return
+        avoided = not ratio and clip.duration_ms * speed > item.duration_ms
+        with self._report_lock:
+            self.rate_report["planned"] += 1
+            self.rate_report["avoided"] += int(avoided)
+        if self.metrics:
+            self.metrics.incr("rate_planned_lines")
+            self.metrics.incr("stretches_avoided", int(avoided))
+
+    def assemble(self, timeline: TimelineBuffer, subtitles: List[SubtitleItem], segments: Dict[int, np.ndarray], sink: Callable[[np.ndarray], None] = None):
+        """
+        阶段 3：按开始时间顺序写入时间轴：不足窗口的部分天然就是静音 (Pad)，超出窗口的部分被裁剪
+        :param sink: 可选的流式输出回调，定稿的采样按时间顺序交给 sink
+        """
+        ordered = sorted(subtitles, key=lambda it: it.start_time_ms)
+        flushed = 0
+        for pos, item in enumerate(ordered):
+            samples = segments.pop(item.index, None)
+            if samples is not None:
+                timeline.place(samples, item.start_time_ms, max_ms=item.duration_ms)
+            if sink and pos + 1 < len(ordered):
+                # 后续字幕都不早于下一句的开始时间，此前的采样已经定稿，可以先行交给混流
+                ready = timeline.ms_to_frames(ordered[pos + 1].start_time_ms)
+                if ready > flushed:
+                    sink(timeline.samples[flushed:ready])
+                    flushed = ready
+        if sink and flushed < len(timeline.samples):
+            sink(timeline.samples[flushed:])
+
+    def render_timeline(self, subtitles: List[SubtitleItem], temp_dir: str, max_speed: float, progress_callback: Callable[[int, int], None] = None, sink: Callable[[np.ndarray], None] = None, manifest: Optional[RenderManifest] = None) -> TimelineBuffer:
+        """
+        合成并拼装整条配音音轨，返回内存中的时间轴缓冲区
+        :param sink: 可选的流式输出回调；拼装过程中每当一段采样不会再被后续字幕改写时，
+                     立即将其按时间顺序交给 sink (例如直接写入 ffmpeg 的 stdin)
+        :param manifest: 可选的渲染清单；清单中已有的对齐片段直接复用，只合成新增或改动的句子，
+                         新片段在对齐完成后立即写入清单，供下一次运行 (或崩溃后续跑) 复用
+        """
+        total = len(subtitles)
+        timeline = self.allocate_timeline(subtitles)
+
+        # 1. 先并发完成全部 TTS 调用，再按时间轴顺序拼装
+        with self._stage("synthesize"):
+            segments, stretch_jobs = self.synthesize_segments(subtitles, timeline, max_speed, progress_callback, manifest)
+
+        # 2. 统一变速 (默认进程池内 WSOLA，可回退为 ffmpeg atempo)
+        with self._stage("stretch"):
+            self._stretch_segments(stretch_jobs, segments, temp_dir, timeline)
+            if manifest is not None:
+                for item, _ in stretch_jobs:
+                    manifest.save_segment(manifest.segment_key(item), segments[item.index], timeline.frame_rate)
+
+        # 3. 写入时间轴 (流式模式下包含向 ffmpeg 管道写入的时间)
+        with self._stage("assemble"):
+            self.assemble(timeline, subtitles, segments, sink)
+        if manifest is not None:
+            manifest.commit(subtitles)
                 
         # 最终进度汇报 100%
         if progress_callback:
             progress_callback(total, total)
-                
-        # 4. 全部循环拼装完毕，导出单条合轨音频
+        return timeline
+
+    def process_subtitles(self, subtitles: List[SubtitleItem], temp_dir: str, max_speed: float, progress_callback: Callable[[int, int], None] = None, manifest: Optional[RenderManifest] = None) -> str:
+        """
+        核心处理：遍历字幕并生成整条拼装对齐好的新音轨
+        :param subtitles: 解析后的字幕列表
+        :param temp_dir: 临时文件存放目录
+        :param max_speed: 最大允许的加速倍率
+        :param progress_callback: UI 回调，报告进度 (已完成条数, 总条数)
+        :param manifest: 可选的渲染清单，用于增量重渲染 (见 render_timeline)
+        :return: 最终合成好的 wav 音频绝对路径
+        """
+        timeline = self.render_timeline(subtitles, temp_dir, max_speed, progress_callback, manifest=manifest)
+        # 全部拼装完毕，导出单条合轨音频
         output_path = os.path.join(temp_dir, "merged_vocal.wav")
-        final_audio.export(output_path, format="wav")
+        with self._stage("export"):
+            timeline.export_wav(output_path)
+        if self.metrics:
+            self.metrics.incr("vocal_bytes_written", os.path.getsize(output_path))
         return output_path
+
+    def stream_subtitles(self, subtitles: List[SubtitleItem], temp_dir: str, max_speed: float, sink: Callable[[np.ndarray], None], progress_callback: Callable[[int, int], None] = None, manifest: Optional[RenderManifest] = None):
+        """
+        与 process_subtitles 相同的处理流程，但不落盘 merged_vocal.wav，
+        而是把拼装好的 PCM 采样按时间顺序逐段交给 sink (通常为 VocalStream.write)
+        """
+        self.render_timeline(subtitles, temp_dir, max_speed, progress_callback, sink=sink, manifest=manifest)
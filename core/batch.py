@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Optional
+
+import config
+from .subtitle_parser import SubtitleParser
+from .tts_provider import get_tts_provider
+from .pipeline import run_dubbing_job
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm")
+
+@dataclass
+class BatchJob:
+    video_path: str
+    srt_path: str
+    output_path: str
+
+@dataclass
+class JobResult:
+    video_path: str
+    output_path: str
+    ok: bool
+    seconds: float
+    lines: int = 0
+    media_ms: int = 0
+    error: str = ""
+
+def _default_output(video_path: str, output_dir: Optional[str]) -> str:
+    name_part, _ = os.path.splitext(os.path.basename(video_path))
+    return os.path.join(output_dir or os.path.dirname(video_path), f"{name_part}_dubbed.mp4")
+
+def discover_jobs(source: str, output_dir: Optional[str] = None) -> List[BatchJob]:
+    """
+    发现待处理的 视频/字幕 对
+    :param source: 目录 (同名的 视频 + .srt 视为一对，缺少字幕的视频会被跳过)，
+                   或 JSON 清单文件：[{"video": ..., "srt": ..., "output": 可选}, ...]，相对路径以清单所在目录为基准
+    :param output_dir: 输出目录，缺省与视频同目录；清单中显式给出的 output 优先
+    """
+    jobs = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in VIDEO_EXTENSIONS:
+                continue
+            srt_path = os.path.join(source, stem + ".srt")
+            if not os.path.exists(srt_path):
+                print(f"跳过 {name}: 找不到同名字幕 {stem}.srt")
+                continue
+            video_path = os.path.join(source, name)
+            jobs.append(BatchJob(video_path, srt_path, _default_output(video_path, output_dir)))
+        return jobs
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        video_path = os.path.join(base_dir, entry["video"])
+        srt_path = os.path.join(base_dir, entry["srt"])
+        output = entry.get("output")
+        output_path = os.path.join(base_dir, output) if output else _default_output(video_path, output_dir)
+        jobs.append(BatchJob(video_path, srt_path, output_path))
+    return jobs
+
+# 工作进程内的全局状态，由 _init_worker 在进程启动时设置
+_worker_limiter = None
+_worker_workspace_root = None
+
+def _init_worker(limiter, workspace_root: Optional[str], parallel_jobs: int):
+    global _worker_limiter, _worker_workspace_root
+    _worker_limiter = limiter
+    _worker_workspace_root = workspace_root
+    if parallel_jobs > 1:
+        # 任务级并行已经占满 CPU，任务内部不再各自开启变速/本地 TTS 进程池或分段混流，避免超额订阅
+        config.TIME_STRETCH_WORKERS = 1
+        config.NATIVE_TTS_PROCESSES = 1
+        config.MIX_CHUNKS = 1
+
+def _run_job(job: BatchJob, params: dict) -> JobResult:
+    """在独立的工作区中执行单个任务；工作区在任务结束后删除，任务之间互不干扰"""
+    started = time.perf_counter()
+    if _worker_workspace_root:
+        os.makedirs(_worker_workspace_root, exist_ok=True)
+    workspace = tempfile.mkdtemp(prefix="lark_job_", dir=_worker_workspace_root)
+    tts = None
+    try:
+        subtitles = SubtitleParser(job.srt_path).parse()
+        tts = get_tts_provider(params, limiter=_worker_limiter)
+        os.makedirs(os.path.dirname(os.path.abspath(job.output_path)), exist_ok=True)
+        run_dubbing_job(job.video_path, job.srt_path, job.output_path, params,
+                        temp_dir=workspace, tts=tts, subtitles=subtitles)
+        return JobResult(job.video_path, job.output_path, True, time.perf_counter() - started,
+                         lines=len(subtitles), media_ms=max((item.end_time_ms for item in subtitles), default=0))
+    except Exception as e:
+        return JobResult(job.video_path, job.output_path, False, time.perf_counter() - started, error=str(e))
+    finally:
+        if tts is not None:
+            tts.close()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+def run_batch(jobs: List[BatchJob], params: dict, max_jobs: Optional[int] = None,
+              tts_concurrency: Optional[int] = None, use_tmpfs: bool = False,
+              on_result: Callable[[int, int, JobResult], None] = None) -> dict:
+    """
+    并行执行一批配音任务
+    :param max_jobs: 同时运行的任务 (进程) 数，缺省读取 config.BATCH_MAX_JOBS
+    :param tts_concurrency: 所有任务共享的 TTS 并发上限，缺省读取 config.BATCH_TTS_CONCURRENCY
+    :param use_tmpfs: 工作区放在内存文件系统 (config.BATCH_TMPFS_DIR) 上
+    :param on_result: 每个任务结束时回调 (已完成数, 总数, 结果)
+    :return: 汇总统计 (见 summarize)
+    """
+    max_jobs = max_jobs or config.BATCH_MAX_JOBS or os.cpu_count() or 1
+    max_jobs = max(1, min(max_jobs, len(jobs)))
+    tts_concurrency = tts_concurrency or config.BATCH_TTS_CONCURRENCY
+    workspace_root = config.BATCH_WORKSPACE_ROOT
+    if use_tmpfs:
+        if os.path.isdir(config.BATCH_TMPFS_DIR):
+            workspace_root = os.path.join(config.BATCH_TMPFS_DIR, "lark")
+        else:
+            print(f"内存文件系统 {config.BATCH_TMPFS_DIR} 不可用，工作区改用磁盘临时目录")
+
+    limiter = multiprocessing.BoundedSemaphore(tts_concurrency)
+    results = []
+    started = time.perf_counter()
+
+    def collect(result: JobResult):
+        results.append(result)
+        if on_result:
+            on_result(len(results), len(jobs), result)
+
+    if max_jobs <= 1:
+        _init_worker(limiter, workspace_root, 1)
+        for job in jobs:
+            collect(_run_job(job, params))
+    else:
+        with ProcessPoolExecutor(max_workers=max_jobs, initializer=_init_worker,
+                                 initargs=(limiter, workspace_root, max_jobs)) as pool:
+            futures = [pool.submit(_run_job, job, params) for job in jobs]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    return summarize(results, time.perf_counter() - started)
+
+def summarize(results: List[JobResult], wall_seconds: float) -> dict:
+    """汇总吞吐：任务数、句数与配音音轨总时长分别除以总墙钟时间"""
+    succeeded = [r for r in results if r.ok]
+    lines = sum(r.lines for r in succeeded)
+    media_seconds = sum(r.media_ms for r in succeeded) / 1000
+    wall = max(wall_seconds, 1e-9)
+    return {
+        "jobs": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_seconds": round(wall_seconds, 3),
+        "job_seconds": round(sum(r.seconds for r in results), 3),
+        "lines": lines,
+        "media_seconds": round(media_seconds, 3),
+        "jobs_per_minute": round(len(succeeded) * 60 / wall, 3),
+        "lines_per_second": round(lines / wall, 3),
+        "realtime_factor": round(media_seconds / wall, 3),
+        "results": [asdict(r) for r in results],
+    }
@@ -0,0 +1,198 @@
+"""
+常驻渲染服务：进程启动时只导入一次 pydub / pyttsx3 等依赖，按音色配置保持已初始化的 TTS 引擎，
+通过本机 HTTP 接口接收配音任务并提供状态查询 (客户端见 core.daemon_client)
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import config
+from .tts_provider import TTSProvider, get_tts_provider, provider_identity
+from .pipeline import run_dubbing_job, draft_params
+
+# 任务请求中允许透传给 run_dubbing_job 的可选参数
+JOB_OPTIONS = ("stream_vocal", "fresh", "start_ms", "end_ms", "draft")
+
+@dataclass
+class DaemonJob:
+    id: str
+    request: dict
+    state: str = "queued"  # queued / running / done / failed
+    messages: List[str] = field(default_factory=list)
+    progress: List[int] = field(default_factory=lambda: [0, 0])
+    error: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def report(self, current: int, total: int):
+        self.progress = [current, total]
+
+class RenderDaemon:
+    """
+    任务调度与引擎池：
+    - 引擎按 provider_identity 缓存，首次用到某个音色时初始化，之后所有任务复用；
+      本地引擎每个音色使用独立的工作进程 (同一进程内的 pyttsx3 引擎按驱动共享，不同音色只能轮流合成)
+    - 同一引擎同时只服务一个任务 (引擎上的输出采样率等状态属于单个任务)，不同音色的任务并行执行，
+      并行数上限为 config.DAEMON_MAX_JOBS
+    """
+    def __init__(self, max_jobs: Optional[int] = None):
+        self.max_jobs = max_jobs or config.DAEMON_MAX_JOBS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="lark_job")
+        self._providers: Dict[str, TTSProvider] = {}
+        self._provider_locks: Dict[str, threading.Lock] = {}
+        self._jobs: Dict[str, DaemonJob] = {}
+        self._lock = threading.Lock()
+
+    def _provider(self, params: dict):
+        """返回 (引擎, 该引擎的任务锁)；引擎初始化在锁外进行，不阻塞其他音色的任务"""
+        key = json.dumps(provider_identity(params), ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            lock = self._provider_locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._providers:
+                self._providers[key] = get_tts_provider(params, isolate_native=True)
+        return self._providers[key], lock
+
+    def submit(self, request: dict) -> DaemonJob:
+        """
+        :param request: {"video", "srt", "output", "params", 可选的 JOB_OPTIONS}，路径应为绝对路径
+        :raises ValueError: 请求缺少必需字段或引擎参数无效
+        """
+        missing = [key for key in ("video", "srt", "output", "params") if not request.get(key)]
+        if missing:
+            raise ValueError(f"任务缺少字段: {', '.join(missing)}")
+        try:
+            provider_identity(request["params"])
+        except KeyError as e:
+            raise ValueError(f"引擎参数缺少 {e}") from None
+        job = DaemonJob(id=uuid.uuid4().hex[:12], request=request)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - config.DAEMON_JOB_HISTORY)]:
+            del self._jobs[job.id]
+
+    def _run(self, job: DaemonJob):
+        request = job.request
+        params = request["params"]
+        options = {key: request[key] for key in JOB_OPTIONS if key in request}
+        workspace = tempfile.mkdtemp(prefix="lark_job_")
+        try:
+            tts, lock = self._provider(draft_params(params) if options.get("draft") else params)
+            with lock:
+                job.state = "running"
+                job.started_at = time.time()
+                os.makedirs(os.path.dirname(os.path.abspath(request["output"])), exist_ok=True)
+                run_dubbing_job(
+                    request["video"], request["srt"], request["output"], params,
+                    temp_dir=workspace, tts=tts,
+                    status_callback=job.messages.append,
+                    progress_callback=job.report,
+                    **options
+                )
+            job.state = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return asdict(job) if job else None
+
+    def health(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "providers": len(self._providers),
+            "running": sum(1 for job in jobs if job.state == "running"),
+            "queued": sum(1 for job in jobs if job.state == "queued"),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        for tts in self._providers.values():
+            tts.close()
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    GET  /health        服务状态
+    POST /jobs          提交任务，返回 202 {"id": ...}
+    GET  /jobs/<id>     任务状态 (state, messages, progress, error)
+    """
+    server_version = "LarkDaemon/1.0"
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        daemon = self.server.render_daemon
+        if self.path == "/health":
+            return self._send(200, daemon.health())
+        if self.path.startswith("/jobs/"):
+            status = daemon.status(self.path[len("/jobs/"):])
+            if status is None:
+                return self._send(404, {"error": "任务不存在"})
+            return self._send(200, status)
+        self._send(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            return self._send(404, {"error": "未知路径"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = self.server.render_daemon.submit(request)
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        self._send(202, {"id": job.id})
+
+    def log_message(self, format, *args):
+        pass  # 轮询请求很频繁，不逐条打印访问日志
+
+def make_server(daemon: RenderDaemon, host: Optional[str] = None, port: Optional[int] = None) -> ThreadingHTTPServer:
+    """创建监听本机地址的 HTTP 服务 (port 为 0 时由系统分配端口)"""
+    server = ThreadingHTTPServer((host or config.DAEMON_HOST, config.DAEMON_PORT if port is None else port), _Handler)
+    server.render_daemon = daemon
+    return server
+
+def serve(host: Optional[str] = None, port: Optional[int] = None, max_jobs: Optional[int] = None):
+    """前台运行常驻服务，Ctrl+C 退出 (等待进行中的任务结束)"""
+    daemon = RenderDaemon(max_jobs)
+    server = make_server(daemon, host, port)
+    address, bound_port = server.server_address[:2]
+    print(f"Lark 渲染服务已启动: http://{address}:{bound_port} (同时运行 {daemon.max_jobs} 个任务)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止渲染服务，等待进行中的任务结束...")
+    finally:
+        server.server_close()
+        daemon.shutdown()
@@ -0,0 +1,76 @@
+"""
+常驻渲染服务的轻量客户端：只依赖标准库，命令行在服务运行时无需导入音频与 TTS 依赖即可提交任务
+"""
+import json
+import time
+import http.client
+from typing import Callable, Optional, Tuple
+
+import config
+
+class DaemonClient:
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None):
+        self.host = host or config.DAEMON_HOST
+        self.port = config.DAEMON_PORT if port is None else port
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None,
+                 timeout: Optional[float] = None) -> Tuple[int, dict]:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout or config.DAEMON_REQUEST_TIMEOUT)
+        try:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+            headers = {"Content-Type": "application/json"} if payload is not None else {}
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+
+    def available(self) -> bool:
+        """服务是否在运行 (短超时探测，未运行时立即返回 False)"""
+        try:
+            status, body = self._request("GET", "/health", timeout=config.DAEMON_PROBE_TIMEOUT)
+        except (OSError, ValueError, http.client.HTTPException):
+            return False
+        return status == 200 and body.get("status") == "ok"
+
+    def submit(self, request: dict) -> str:
+        """提交任务，返回任务 ID；请求格式见 RenderDaemon.submit"""
+        status, body = self._request("POST", "/jobs", request)
+        if status != 202:
+            raise RuntimeError(body.get("error") or f"提交任务失败 (HTTP {status})")
+        return body["id"]
+
+    def status(self, job_id: str) -> dict:
+        status, body = self._request("GET", f"/jobs/{job_id}")
+        if status != 200:
+            raise RuntimeError(body.get("error") or f"查询任务失败 (HTTP {status})")
+        return body
+
+    def wait(self, job_id: str, status_callback: Callable[[str], None] = None,
+             progress_callback: Callable[[int, int], None] = None, interval: Optional[float] = None) -> dict:
+        """
+        轮询直到任务结束，期间把新的阶段提示与进度转交给回调
+        :raises RuntimeError: 任务失败 (异常信息为服务端的错误描述)
+        """
+        interval = interval or config.DAEMON_POLL_INTERVAL
+        shown = 0
+        last_progress = None
+        while True:
+            job = self.status(job_id)
+            if status_callback:
+                for message in job["messages"][shown:]:
+                    status_callback(message)
+            shown = len(job["messages"])
+            if progress_callback and job["progress"][1] and job["progress"] != last_progress:
+                last_progress = job["progress"]
+                progress_callback(*last_progress)
+            if job["state"] == "failed":
+                raise RuntimeError(job["error"])
+            if job["state"] == "done":
+                return job
+            time.sleep(interval)
+
+    def run(self, request: dict, status_callback: Callable[[str], None] = None,
+            progress_callback: Callable[[int, int], None] = None) -> dict:
+        """提交任务并等待其完成"""
+        return self.wait(self.submit(request), status_callback, progress_callback)
@@ -0,0 +1,109 @@
+import os
+import copy
+import json
+import math
+import threading
+import unicodedata
+from typing import Optional
+
+import config
+
+def speech_units(text: str) -> float:
+    """
+    估算朗读长度的"字数"：中日韩文字每字计 1，拉丁字母与数字按约三个字母一个音节折算，
+    句中停顿标点计半个字，空白与其他符号不计
+    """
+    units = 0.0
+    for ch in text:
+        if ch.isspace():
+            continue
+        if ch.isascii():
+            if ch.isalnum():
+                units += 0.35
+            elif ch in ",.;:!?":
+                units += 0.5
+        elif unicodedata.category(ch).startswith("P"):
+            units += 0.5
+        else:
+            units += 1.0
+    return units
+
+class DurationPredictor:
+    """
+    按音色估算朗读时长的在线模型：为每个音色 (引擎的 cache_identity) 维护按指数衰减加权的
+    "字数 / 毫秒" 累计量，每合成一句即更新 (时长折算回 1.0 倍速)，运行结束后持久化到 JSON，
+    下次运行直接沿用上次学到的语速
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.DURATION_MODEL_PATH
+        self._lock = threading.Lock()
+        self._voices = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._voices = json.load(f).get("voices", {})
+            except (OSError, ValueError) as e:
+                print(f"时长模型读取失败，将重新学习: {e}")
+
+    def snapshot(self) -> "DurationPredictor":
+        """复制当前状态 (不重新读取磁盘)：两次合成从同一状态开始学习时，规划出的语速也相同"""
+        clone = DurationPredictor.__new__(DurationPredictor)
+        clone.path = self.path
+        clone._lock = threading.Lock()
+        with self._lock:
+            clone._voices = copy.deepcopy(self._voices)
+        return clone
+
+    @staticmethod
+    def voice_key(identity: dict) -> str:
+        return json.dumps(identity, ensure_ascii=False, sort_keys=True)
+
+    def chars_per_second(self, voice: str) -> Optional[float]:
+        """样本不足 config.RATE_PLAN_MIN_SAMPLES 句时返回 None (不做预测)"""
+        with self._lock:
+            stats = self._voices.get(voice)
+            if not stats or stats["n"] < config.RATE_PLAN_MIN_SAMPLES or stats["ms"] <= 0:
+                return None
+            return stats["units"] / stats["ms"] * 1000
+
+    def predict_ms(self, voice: str, text: str) -> Optional[float]:
+        """预测 1.0 倍速下的朗读时长 (毫秒)"""
+        cps = self.chars_per_second(voice)
+        if cps is None:
+            return None
+        return speech_units(text) / cps * 1000
+
+    def observe(self, voice: str, text: str, duration_ms: int, speed: float = 1.0):
+        units = speech_units(text)
+        if units <= 0 or duration_ms <= 0:
+            return
+        decay = config.DURATION_MODEL_DECAY
+        with self._lock:
+            stats = self._voices.setdefault(voice, {"units": 0.0, "ms": 0.0, "n": 0})
+            stats["units"] = stats["units"] * decay + units
+            stats["ms"] = stats["ms"] * decay + duration_ms * speed
+            stats["n"] += 1
+
+    def plan_speed(self, voice: str, text: str, slot_ms: int) -> float:
+        """
+        为一句字幕选择合成语速倍率：预测时长 (留出 config.RATE_PLAN_MARGIN 余量) 超出字幕窗口时，
+        按 config.RATE_PLAN_STEP 向上取整到刚好放得下的倍率，最高 config.RATE_PLAN_MAX_SPEED；否则保持 1.0
+        """
+        predicted = self.predict_ms(voice, text)
+        if predicted is None or slot_ms <= 0:
+            return 1.0
+        needed = predicted * config.RATE_PLAN_MARGIN / slot_ms
+        if needed <= 1.0:
+            return 1.0
+        step = config.RATE_PLAN_STEP
+        return round(min(math.ceil(needed / step) * step, config.RATE_PLAN_MAX_SPEED), 3)
+
+    def save(self):
+        """先写临时文件再原子替换，并发任务同时保存时不会留下损坏的文件"""
+        with self._lock:
+            data = {"voices": self._voices}
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
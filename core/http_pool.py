@@ -0,0 +1,179 @@
+import time
+import queue
+import random
+import socket
+import threading
+import http.client
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import config
+
+# 可重试的瞬时错误：连接被拒/重置、复用的长连接已被服务端关闭、连接或读取超时
+TRANSIENT_ERRORS = (ConnectionError, http.client.RemoteDisconnected, http.client.BadStatusLine,
+                    http.client.IncompleteRead, socket.timeout)
+
+# 流式读取响应体时每次读取的最大字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+@dataclass
+class HTTPResult:
+    status: int
+    headers: Dict[str, str]
+    data: bytes
+
+@dataclass
+class PoolStats:
+    """连接池计数器，供排查性能问题时确认长连接是否真正被复用"""
+    connections_created: int = 0
+    connections_reused: int = 0
+    retries: int = 0
+    failures: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+class HTTPConnectionPool:
+    """
+    线程安全的 HTTP/1.1 长连接池 (单一 host)
+    - 空闲连接按后进先出复用，最多同时持有 max_connections 条连接
+    - 连接超时与读取超时分开配置，另有单次请求 (含全部重试) 的总截止时间
+    - 连接错误、超时与 5xx 响应按带抖动的指数退避重试
+    """
+    def __init__(self, url: str, max_connections: int = None, connect_timeout: float = None,
+                 read_timeout: float = None, max_retries: int = None, backoff: float = None):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.max_connections = max_connections or config.COSYVOICE_MAX_CONNECTIONS
+        self.connect_timeout = connect_timeout or config.COSYVOICE_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or config.COSYVOICE_READ_TIMEOUT
+        self.max_retries = config.COSYVOICE_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = config.COSYVOICE_RETRY_BACKOFF if backoff is None else backoff
+        self.stats = PoolStats()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        # 连接建立后切换为读取超时，避免一个卡死的请求长时间占住工作线程
+        conn.sock.settimeout(self.read_timeout)
+        self.stats.incr("connections_created")
+        return conn
+
+    def _acquire(self):
+        """取出一条连接，返回 (连接, 是否为复用的空闲连接)"""
+        try:
+            conn = self._idle.get_nowait()
+            self.stats.incr("connections_reused")
+            return conn, True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection, reusable: bool):
+        if reusable:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def _sleep_backoff(self, attempt: int, deadline: Optional[float]) -> bool:
+        """全抖动指数退避；若等待后会超过截止时间则返回 False 放弃重试"""
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None,
+                deadline: float = None,
+                stream_factory: Callable[[int, Dict[str, str]], Optional[Callable[[bytes], None]]] = None) -> HTTPResult:
+        """
+        发送请求并读取完整响应
+        :param deadline: 本次请求 (包含所有重试) 允许的总秒数，None 表示不限制
+        :param stream_factory: 可选的流式消费入口，收到响应头后以 (状态码, 响应头) 调用；
+                               若返回一个回调，则响应体按到达的分块依次交给该回调，而不在内存中拼接
+                               (此时 HTTPResult.data 为空)。已经交付过数据的请求失败后不再重试。
+        :return: HTTPResult；5xx 在重试用尽后同样原样返回，由调用方判断状态码
+        """
+        deadline_at = time.monotonic() + deadline if deadline else None
+        attempt = 0
+        while True:
+            result, error, stale, delivered = None, None, False, False
+            with self._slots:
+                conn, reused = None, False
+                try:
+                    conn, reused = self._acquire()
+                    if deadline_at is not None:
+                        remaining = deadline_at - time.monotonic()
+                        if remaining <= 0:
+                            raise socket.timeout("请求超过截止时间")
+                        conn.sock.settimeout(min(self.read_timeout, remaining))
+                    conn.request(method, path, body=body, headers=headers or {})
+                    response = conn.getresponse()
+                    response_headers = dict(response.getheaders())
+                    on_chunk = stream_factory(response.status, response_headers) if stream_factory else None
+                    if on_chunk is None:
+                        data = response.read()
+                    else:
+                        data = b""
+                        while True:
+                            chunk = response.read1(STREAM_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            delivered = True
+                            on_chunk(chunk)
+                    result = HTTPResult(response.status, response_headers, data)
+                    self._release(conn, reusable=not response.will_close)
+                except TRANSIENT_ERRORS as e:
+                    if conn is not None:
+                        conn.close()
+                    error = e
+                    # 空闲期间被服务端关闭的长连接，换一条连接立即重发，不计入重试次数
+                    stale = reused and not isinstance(e, socket.timeout)
+                except Exception:
+                    if conn is not None:
+                        conn.close()
+                    raise
+
+            if delivered and result is None:
+                # 部分数据已交给下游，重试会造成重复写入
+                self.stats.incr("failures")
+                raise error
+            if stale:
+                continue
+            if result is not None and result.status < 500:
+                return result
+
+            if attempt >= self.max_retries or not self._sleep_backoff(attempt, deadline_at):
+                self.stats.incr("failures")
+                if result is not None:
+                    return result
+                raise error
+            attempt += 1
+            self.stats.incr("retries")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pools: Dict[str, HTTPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(url: str) -> HTTPConnectionPool:
+    """按 scheme://host:port 共享连接池，同一服务的所有 HttpTTS 实例与工作线程复用同一组长连接"""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HTTPConnectionPool(url)
+        return pool
@@ -0,0 +1,61 @@
+import os
+import json
+import subprocess
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """ffprobe 探测到的媒体概要 (只取混流规划需要的字段)"""
+    duration_s: float
+    has_video: bool
+    has_audio: bool
+    audio_codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    audio_bitrate: Optional[int] = None  # 比特/秒，部分容器 (如 mkv) 不提供
+
+def probe_media(path: str) -> MediaInfo:
+    """
+    探测媒体文件的时长与首条音轨参数。
+    结果按 (绝对路径, 文件大小, 修改时间) 缓存在进程内：同一文件在一次任务中被多次探测
+    (规划混流、分段混流、批量任务复用同一素材) 时只启动一次 ffprobe，文件被替换后自动失效
+    """
+    stat = os.stat(path)
+    return _probe_cached(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+@lru_cache(maxsize=256)
+def _probe_cached(path: str, size: int, mtime_ns: int) -> MediaInfo:
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration:stream=codec_type,codec_name,sample_rate,channels,bit_rate",
+        "-of", "json",
+        path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return parse_probe_output(result.stdout)
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_probe_output(output: bytes) -> MediaInfo:
+    data = json.loads(output or b"{}")
+    streams = data.get("streams", [])
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    try:
+        duration = float(data.get("format", {}).get("duration", 0))
+    except ValueError:
+        duration = 0.0
+    return MediaInfo(
+        duration_s=duration,
+        has_video=any(s.get("codec_type") == "video" for s in streams),
+        has_audio=audio is not None,
+        audio_codec=audio.get("codec_name") if audio else None,
+        sample_rate=_to_int(audio.get("sample_rate")) if audio else None,
+        channels=_to_int(audio.get("channels")) if audio else None,
+        audio_bitrate=_to_int(audio.get("bit_rate")) if audio else None,
+    )
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块，峰值内存不可用
+    resource = None
+
+# 直方图分桶 (上界)，未列出的指标默认按耗时分桶
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATIO_BUCKETS = (1.05, 1.1, 1.2, 1.3, 1.4, 1.5, 2.0)
+HISTOGRAM_BUCKETS = {
+    "stretch_ratio": RATIO_BUCKETS,
+}
+
+def peak_rss_bytes() -> Optional[int]:
+    """当前进程的峰值常驻内存 (字节)"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return rss if sys.platform == "darwin" else rss * 1024
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))}
+
+class JobMetrics:
+    """
+    单个配音任务的指标记录器 (线程安全)
+    - stage(): 各阶段 (parse/synthesize/stretch/assemble/export/mux) 的墙钟耗时与阶段结束时的峰值内存
+    - observe(): 直方图 (单次 TTS 请求耗时、atempo 耗时、变速倍率等)
+    - incr(): 计数器 (合成句数、失败句数、写出字节数等)
+    - event(): 追加一行 JSON 事件到 events_path (JSON Lines)，可被外部实时 tail
+    close() (或 with 语句结束) 时把汇总写成 Prometheus 文本格式 (prometheus_path)，可直接交给 node_exporter 的 textfile 采集器
+    """
+    def __init__(self, job: str = "", events_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        self.job = job
+        self.events_path = events_path
+        self.prometheus_path = prometheus_path
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._events = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            rss = peak_rss_bytes()
+            if rss is not None:
+                self.set_gauge("peak_rss_bytes", rss)
+            self.event("stage", stage=name, seconds=round(seconds, 4), peak_rss_bytes=rss)
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS))
+            hist.observe(value)
+
+    def incr(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def event(self, kind: str, **fields):
+        if not self.events_path:
+            return
+        record = {"ts": round(time.time(), 3), "job": self.job, "event": kind}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._events is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.events_path)), exist_ok=True)
+                self._events = open(self.events_path, "a", encoding="utf-8")
+            self._events.write(line + "\n")
+            self._events.flush()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "job": self.job,
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: hist.to_dict() for name, hist in self.histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        job = self.job.replace("\\", "\\\\").replace('"', '\\"')
+        label = f'job="{job}"'
+        out = ["# HELP lark_stage_seconds Wall time spent in each pipeline stage",
+               "# TYPE lark_stage_seconds gauge"]
+        with self._lock:
+            for name, seconds in sorted(self.stages.items()):
+                out.append(f'lark_stage_seconds{{{label},stage="{name}"}} {seconds:.6f}')
+            for name, value in sorted(self.counters.items()):
+                out.append(f"# TYPE lark_{name}_total counter")
+                out.append(f"lark_{name}_total{{{label}}} {value}")
+            for name, value in sorted(self.gauges.items()):
+                out.append(f"# TYPE lark_{name} gauge")
+                out.append(f"lark_{name}{{{label}}} {value}")
+            for name, hist in sorted(self.histograms.items()):
+                out.append(f"# TYPE lark_{name} histogram")
+                cumulative = 0
+                for bound, count in zip([str(b) for b in hist.buckets] + ["+Inf"], hist.counts):
+                    cumulative += count
+                    out.append(f'lark_{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                out.append(f"lark_{name}_sum{{{label}}} {hist.sum:.6f}")
+                out.append(f"lark_{name}_count{{{label}}} {hist.count}")
+        return "\n".join(out) + "\n"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close(ok=True)
+        else:
+            self.close(ok=False, error=str(exc) or exc_type.__name__)
+        return False
+
+    def close(self, **fields):
+        """记录任务结束事件并写出 Prometheus 文件 (先写临时文件再原子替换，避免采集器读到半截内容)"""
+        self.event("job_end", **fields, **self.summary())
+        if self.prometheus_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.prometheus_path)), exist_ok=True)
+            tmp_path = f"{self.prometheus_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
+        with self._lock:
+            if self._events is not None:
+                self._events.close()
+                self._events = None
@@ -0,0 +1,315 @@
+import os
+import shutil
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import config
+from .subtitle_parser import SubtitleParser, SubtitleItem, select_range
+from .tts_provider import TTSProvider, get_tts_provider, provider_identity
+from .audio_processor import AudioProcessor
+from .render_manifest import RenderManifest
+from .metrics import JobMetrics
+from .duration_model import DurationPredictor
+from .video_mixer import VideoMixer
+
+def _default_metrics(output_path: str) -> Optional[JobMetrics]:
+    """config.METRICS_ENABLED 时在输出文件旁的 <输出文件>.lark/ 中记录任务指标"""
+    if not config.METRICS_ENABLED:
+        return None
+    root = f"{output_path}.lark"
+    return JobMetrics(
+        job=os.path.basename(output_path),
+        events_path=os.path.join(root, "metrics.jsonl"),
+        prometheus_path=os.path.join(root, "metrics.prom"),
+    )
+
+def _finish_rate_planning(processors: List[AudioProcessor], duration_model: Optional[DurationPredictor],
+                          status: Callable[[str], None]):
+    """保存本次学到的语速，并汇报语速规划免去的变速次数"""
+    if duration_model is None:
+        return
+    duration_model.save()
+    planned = sum(p.rate_report["planned"] for p in processors)
+    avoided = sum(p.rate_report["avoided"] for p in processors)
+    if planned:
+        status(f"   语速规划: 提前提高语速 {planned} 句，其中 {avoided} 句因此无需事后变速")
+
+def _report_silence_trim(processors: List[AudioProcessor], status: Callable[[str], None]):
+    """汇报静音裁剪去掉的总时长，以及因此免去的变速与截断次数"""
+    report = {key: sum(p.trim_report[key] for p in processors) for key in processors[0].trim_report}
+    if report["trimmed"]:
+        status(f"   静音裁剪: {report['trimmed']} 句共去掉 {report['trimmed_ms'] / 1000:.1f} 秒首尾静音，"
+               f"免去 {report['stretches_avoided']} 句变速、{report['truncations_avoided']} 句尾部截断")
+
+def preview_output_path(output_path: str) -> str:
+    """预览渲染 (--start/--end/--draft) 的输出路径：<名称>_preview<扩展名>，不覆盖正式成片"""
+    name, ext = os.path.splitext(output_path)
+    return f"{name}_preview{ext or '.mp4'}"
+
+def draft_params(params: dict) -> dict:
+    """草稿模式的引擎参数：同性别的本地引擎 (默认语速)，几乎即时出声，用于预听时间轴"""
+    return {
+        "mode": "native",
+        "gender": params["gender"],
+        "rate": config.TTS_ENGINE_CAPABILITIES["native"]["default_rate"],
+    }
+
+def variant_track(params: dict) -> dict:
+    """多版本输出中一组参数对应的音轨标注：名称取 params["label"]，语言代码取 params["track_language"] 或按朗读语言推断"""
+    if params["mode"] == "cosyvoice":
+        title = params.get("label") or f"{params['language']}-{params['gender']}-{params.get('style', '')}".rstrip("-")
+        language = params.get("track_language") or config.TRACK_LANGUAGE_CODES.get(params.get("language"))
+    else:
+        title = params.get("label") or f"{params['mode']}-{params['gender']}"
+        language = params.get("track_language") or config.TRACK_LANGUAGE_CODES["中文"]
+    return {"title": title, "language": language}
+
+def run_dubbing_job(video_path: str, srt_path: str, output_path: str, params: dict,
+                    temp_dir: Optional[str] = None,
+                    tts: Optional[TTSProvider] = None,
+                    status_callback: Callable[[str], None] = None,
+                    progress_callback: Callable[[int, int], None] = None,
+                    stream_vocal: Optional[bool] = None,
+                    incremental: Optional[bool] = None,
+                    fresh: bool = False,
+                    subtitles: Optional[List[SubtitleItem]] = None,
+                    metrics: Optional[JobMetrics] = None,
+                    start_ms: Optional[int] = None,
+                    end_ms: Optional[int] = None,
+                    draft: bool = False,
+                    duration_model: Optional[DurationPredictor] = None) -> str:
+    """
+    完整配音流程 (命令行与图形界面共用)：解析字幕 -> 合成对齐音轨 -> 与原视频混流
+    :param params: TTS 引擎参数，格式同 get_tts_provider
+    :param temp_dir: 本次任务的临时目录，缺省为 config.TEMP_DIR；任务前后都会被清空
+    :param tts: 已初始化的 TTS 引擎，缺省按 params 新建
+    :param status_callback: 阶段提示回调，参数为提示文本
+    :param progress_callback: 合成进度回调 (已完成条数, 总条数)
+    :param stream_vocal: 是否将配音 PCM 直接管道输入 ffmpeg 而不落盘，缺省读取 config.STREAM_VOCAL_TO_MIXER
+    :param incremental: 是否使用输出文件旁的渲染清单做增量渲染，缺省读取 config.RENDER_MANIFEST_ENABLED
+    :param fresh: 丢弃已有的渲染清单，完整重新渲染
+    :param subtitles: 已解析好的字幕，缺省从 srt_path 解析
+    :param metrics: 任务指标记录器，缺省在 config.METRICS_ENABLED 时写入 <输出文件>.lark/metrics.jsonl 与 metrics.prom
+    :param start_ms: 预览渲染的起点 (毫秒)；与 end_ms 任一给出时只合成与该区间重叠的字幕，
+                     并只截取、混流原视频的这一段 (区间向外扩展到首尾两句的完整时间轴)
+    :param end_ms: 预览渲染的终点 (毫秒)，缺省直到视频结尾
+    :param draft: 草稿模式：改用本地引擎合成 (几乎即时)，语速规划仍按 params 对应音色学到的语速进行，
+                  字幕窗口、变速上限与最终渲染一致
+    :param duration_model: 语速规划所用的时长模型，缺省在 config.RATE_PLANNING_ENABLED 时从磁盘加载；
+                           图形界面传入预合成开始时的状态，使两者规划出相同的语速、命中预合成的缓存
+    预览渲染 (给出 start_ms/end_ms 或 draft) 不读取也不提交渲染清单：清单提交时只保留本次渲染的句子，
+    若写入预览结果，下一次完整渲染就无法复用区间外 (或最终音色) 的片段
+    :return: 输出视频路径
+    """
+    temp_dir = temp_dir or config.TEMP_DIR
+    stream_vocal = config.STREAM_VOCAL_TO_MIXER if stream_vocal is None else stream_vocal
+    incremental = config.RENDER_MANIFEST_ENABLED if incremental is None else incremental
+    if start_ms is not None or end_ms is not None or draft:
+        incremental = False
+    status = status_callback or (lambda message: None)
+
+    manifest_root = f"{output_path}.lark"
+    if incremental and fresh and os.path.exists(manifest_root):
+        shutil.rmtree(manifest_root)
+    if metrics is None:
+        metrics = _default_metrics(output_path)
+    stage = metrics.stage if metrics else (lambda name: nullcontext())
+
+    with metrics if metrics else nullcontext():
+        # Step 1
+        status("1. 正在解析物理时间轴...")
+        if subtitles is None:
+            with stage("parse"):
+                subtitles = SubtitleParser(srt_path).parse()
+        if not subtitles:
+            raise ValueError("未提取到任何有效字幕！请检查文件格式。")
+        span = None
+        if start_ms is not None or end_ms is not None:
+            total = len(subtitles)
+            subtitles, span = select_range(subtitles, start_ms, end_ms)
+            if not subtitles:
+                raise ValueError("所选时间范围内没有字幕！")
+            status(f"   预览范围: {span[0] / 1000:.1f}s - "
+                   f"{'结尾' if span[1] is None else f'{span[1] / 1000:.1f}s'}，共 {len(subtitles)}/{total} 句")
+        if metrics:
+            metrics.set_gauge("subtitles", len(subtitles))
+
+        # Step 2
+        engine_params = draft_params(params) if draft else params
+        status(f"2. 正在初始化发音引擎({engine_params['mode']}{' 草稿' if draft else ''})...")
+        # 调用方传入的引擎由调用方负责关闭，这里只关闭自己创建的
+        owned_tts = None
+        if tts is None:
+            tts = owned_tts = get_tts_provider(engine_params)
+        # 草稿沿用最终音色的语速规划，保证两次渲染的加速决策一致
+        timing_identity = provider_identity(params) if draft and params["mode"] != "native" else None
+
+        try:
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+            os.makedirs(temp_dir, exist_ok=True)
+
+            # Step 3 (耗时最长，接入回调)
+            status("3. 音频合成与时间轴对齐处理 (耗时操作)...")
+            if duration_model is None and config.RATE_PLANNING_ENABLED:
+                duration_model = DurationPredictor()
+            video_mixer = VideoMixer(metrics=metrics)
+            # 配音按原视频音轨的格式拼装，混流时无需再转换
+            sample_rate, channels = video_mixer.vocal_format(video_path)
+            audio_processor = AudioProcessor(tts, metrics=metrics, duration_model=duration_model,
+                                             timing_identity=timing_identity, sample_rate=sample_rate, channels=channels)
+
+            manifest = None
+            if incremental:
+                manifest = RenderManifest(output_path)
+                manifest.begin(audio_processor.render_params(config.MAX_SPEED_UP_RATIO))
+                diff = manifest.diff(subtitles)
+                if diff["reusable"]:
+                    status(f"   增量渲染: 复用 {diff['reusable']}/{len(subtitles)} 句已渲染片段 "
+                           f"(改动 {diff['changed']} 句, 新增 {diff['added']} 句, 删除 {diff['removed']} 句)")
+
+            if stream_vocal and span is None and video_mixer.chunk_count(video_path) > 1:
+                # 长视频走分段并行混流，需要完整的配音文件
+                stream_vocal = False
+
+            if stream_vocal:
+                # ffmpeg 提前启动并开始解复用原视频，配音采样边拼装边写入其 stdin
+                stream = video_mixer.open_stream(video_path, output_path, sample_rate, channels, span=span)
+                try:
+                    audio_processor.stream_subtitles(
+                        subtitles,
+                        temp_dir=temp_dir,
+                        max_speed=config.MAX_SPEED_UP_RATIO,
+                        sink=stream.write,
+                        progress_callback=progress_callback,
+                        manifest=manifest
+                    )
+                except BaseException:
+                    stream.abort()
+                    raise
+                _finish_rate_planning([audio_processor], duration_model, status)
+                _report_silence_trim([audio_processor], status)
+                # Step 4
+                status("4. 正在执行底层音视频重混流装载...")
+                with stage("mux"):
+                    stream.close()
+            else:
+                merged_wav = audio_processor.process_subtitles(
+                    subtitles,
+                    temp_dir=temp_dir,
+                    max_speed=config.MAX_SPEED_UP_RATIO,
+                    progress_callback=progress_callback,
+                    manifest=manifest
+                )
+                _finish_rate_planning([audio_processor], duration_model, status)
+                _report_silence_trim([audio_processor], status)
+                # Step 4
+                status("4. 正在执行底层音视频重混流装载...")
+                with stage("mux"):
+                    video_mixer.mix(video_path, merged_wav, output_path, span=span)
+        finally:
+            if owned_tts is not None:
+                owned_tts.close()
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+
+    return output_path
+
+def run_variants_job(video_path: str, srt_path: str, output_path: str, variants: List[dict],
+                     temp_dir: Optional[str] = None,
+                     status_callback: Callable[[str], None] = None,
+                     progress_callback: Callable[[int, int], None] = None,
+                     subtitles: Optional[List[SubtitleItem]] = None,
+                     metrics: Optional[JobMetrics] = None) -> str:
+    """
+    多版本配音：同一视频与字幕按多组 TTS 参数 (如男声/女声、中文/英文) 各生成一条配音，
+    输出一个带多条音轨的视频。字幕只解析一次，各版本并发合成，原视频只解复用、背景音只解码一次。
+    :param variants: 参数列表，格式同 get_tts_provider，另可包含 "label" (音轨名称) 与 "track_language" (ISO 639-2 语言代码)；
+                     第一组为默认音轨
+    :param progress_callback: 合成进度回调 (全部版本已完成条数之和, 总条数 × 版本数)
+    其余参数同 run_dubbing_job；多版本模式不使用渲染清单 (各版本共用一个输出文件)，配音先落盘再统一混流
+    :return: 输出视频路径
+    """
+    if not variants:
+        raise ValueError("至少需要一组配音参数")
+    temp_dir = temp_dir or config.TEMP_DIR
+    status = status_callback or (lambda message: None)
+    if metrics is None:
+        metrics = _default_metrics(output_path)
+    stage = metrics.stage if metrics else (lambda name: nullcontext())
+
+    with metrics if metrics else nullcontext():
+        # Step 1
+        status("1. 正在解析物理时间轴...")
+        if subtitles is None:
+            with stage("parse"):
+                subtitles = SubtitleParser(srt_path).parse()
+        if not subtitles:
+            raise ValueError("未提取到任何有效字幕！请检查文件格式。")
+
+        # Step 2
+        status(f"2. 正在初始化 {len(variants)} 个发音引擎...")
+        providers = []
+        try:
+            for params in variants:
+                # 各版本的本地引擎放在各自的工作进程中并行合成：同一进程内的 pyttsx3 引擎按驱动共享，只能轮流使用
+                providers.append(get_tts_provider(params, isolate_native=True))
+            duration_model = DurationPredictor() if config.RATE_PLANNING_ENABLED else None
+            sample_rate, channels = VideoMixer().vocal_format(video_path)
+            processors = [AudioProcessor(tts, metrics=metrics, duration_model=duration_model,
+                                         sample_rate=sample_rate, channels=channels) for tts in providers]
+
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+            os.makedirs(temp_dir, exist_ok=True)
+
+            # Step 3
+            status("3. 多版本音频并发合成与时间轴对齐处理 (耗时操作)...")
+            total = len(subtitles) * len(variants)
+            done: Dict[int, int] = {}
+            lock = threading.Lock()
+
+            def report(index: int, current: int):
+                if progress_callback:
+                    with lock:
+                        done[index] = current
+                        finished = sum(done.values())
+                    progress_callback(finished, total)
+
+            def render(index: int) -> str:
+                variant_dir = os.path.join(temp_dir, f"variant_{index}")
+                os.makedirs(variant_dir, exist_ok=True)
+                return processors[index].process_subtitles(
+                    subtitles,
+                    temp_dir=variant_dir,
+                    max_speed=config.MAX_SPEED_UP_RATIO,
+                    progress_callback=lambda current, _total: report(index, current)
+                )
+
+            # 非线程安全的引擎 (如进程内 pyttsx3) 在当前线程中依次合成，其余版本同时在线程池中合成
+            parallel = [i for i, tts in enumerate(providers) if getattr(tts, "thread_safe", True)]
+            serial = [i for i in range(len(providers)) if i not in parallel]
+            vocal_paths = {}
+            with ThreadPoolExecutor(max_workers=max(1, len(parallel))) as pool:
+                futures = {i: pool.submit(render, i) for i in parallel}
+                for i in serial:
+                    vocal_paths[i] = render(i)
+                for i, future in futures.items():
+                    vocal_paths[i] = future.result()
+            _finish_rate_planning(processors, duration_model, status)
+            _report_silence_trim(processors, status)
+
+            # Step 4
+            status("4. 正在执行底层音视频重混流装载 (多音轨)...")
+            tracks = [dict(variant_track(params), path=vocal_paths[i]) for i, params in enumerate(variants)]
+            with stage("mux"):
+                VideoMixer(metrics=metrics).mix_variants(video_path, tracks, output_path)
+        finally:
+            for tts in providers:
+                tts.close()
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+
+    return output_path
@@ -0,0 +1,134 @@
+"""
+图形界面的后台预合成：选中字幕后立即按当前参数在后台合成并写入 TTS 缓存，
+用户还在挑选音色时合成就已开始；参数改变时放弃当前进度改按新参数合成，正式渲染直接命中缓存
+"""
+import os
+import json
+import threading
+from typing import Callable, List, Optional
+
+import config
+from .subtitle_parser import SubtitleParser, SubtitleItem
+from .tts_provider import TTSProvider, get_tts_provider, provider_identity
+from .audio_processor import AudioProcessor
+from .duration_model import DurationPredictor
+from .pipeline import draft_params
+
+class Presynthesizer:
+    def __init__(self, progress_callback: Callable[[int, int], None] = None):
+        """
+        :param progress_callback: 预合成进度回调 (已合成句数, 总句数)，在后台线程中调用
+        """
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._key = None
+        self._parsed = {}
+        # 只保留当前音色的一个引擎：音色改变时关闭旧引擎 (本地引擎各自持有工作进程)
+        self._provider_key = None
+        self._provider: Optional[TTSProvider] = None
+        # (预合成参数键, 预合成开始时的时长模型)：正式渲染从同一状态开始规划语速
+        self._timing_start = None
+
+    @staticmethod
+    def _engine(params: dict, draft: bool):
+        """与 run_dubbing_job 相同的引擎选择：返回 (实际合成参数, 语速规划所用音色)"""
+        if not draft:
+            return params, None
+        return draft_params(params), (provider_identity(params) if params["mode"] != "native" else None)
+
+    def subtitles(self, srt_path: str) -> List[SubtitleItem]:
+        """解析字幕 (按路径与修改时间缓存最近一个文件，正式渲染时不再重复解析)"""
+        path = os.path.abspath(srt_path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._parsed.get(path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        items = SubtitleParser(path).parse()
+        with self._lock:
+            self._parsed = {path: (mtime_ns, items)}
+        return items
+
+    def provider(self, params: dict, draft: bool = False) -> TTSProvider:
+        """按实际合成参数复用已初始化的引擎 (预合成与正式渲染共用同一实例)；参数改变时换用新引擎并关闭旧引擎"""
+        engine_params, _ = self._engine(params, draft)
+        key = json.dumps(provider_identity(engine_params), ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            if key != self._provider_key:
+                previous = self._provider
+                self._provider = get_tts_provider(engine_params)
+                self._provider_key = key
+                if previous is not None:
+                    previous.close()
+            return self._provider
+
+    def _job_key(self, srt_path: str, params: dict, draft: bool):
+        engine_params, timing_identity = self._engine(params, draft)
+        return (os.path.abspath(srt_path), json.dumps(provider_identity(engine_params), sort_keys=True),
+                json.dumps(timing_identity, sort_keys=True))
+
+    def duration_model(self, srt_path: str, params: dict, draft: bool = False) -> Optional[DurationPredictor]:
+        """
+        供正式渲染使用的时长模型：与最近一次预合成的参数相同时，返回预合成开始时的状态副本。
+        磁盘上的模型在此期间可能已被其他渲染更新，从磁盘重新加载会规划出不同的语速而错过缓存；
+        参数不同或未预合成时返回 None (由渲染自行加载)
+        """
+        with self._lock:
+            timing_start = self._timing_start
+        if timing_start is None or timing_start[0] != self._job_key(srt_path, params, draft):
+            return None
+        return timing_start[1].snapshot()
+
+    def start(self, srt_path: str, params: dict, draft: bool = False):
+        """
+        按 (字幕文件, 音色, 草稿) 开始预合成；与正在进行的预合成相同时什么也不做，否则先放弃旧的。
+        未启用 TTS 缓存时预合成的结果无处保存，只解析字幕
+        """
+        key = self._job_key(srt_path, params, draft)
+        if key == self._key:
+            return
+        # 不在调用线程 (界面主线程) 中等待旧任务：新线程先等旧线程合成完手头的一组再开始
+        self._cancel.set()
+        self._key = key
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._thread, srt_path, params, draft, self._cancel),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, keep_provider: bool = False):
+        """
+        放弃当前预合成并等待正在合成的一组句子结束 (已合成的句子保留在缓存中)
+        :param keep_provider: 保留已初始化的引擎供随后的正式渲染使用；否则一并关闭
+        """
+        self._cancel.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._key = None
+        if not keep_provider:
+            with self._lock:
+                previous, self._provider, self._provider_key = self._provider, None, None
+            if previous is not None:
+                previous.close()
+
+    def _run(self, previous: Optional[threading.Thread], srt_path: str, params: dict, draft: bool, cancel: threading.Event):
+        if previous is not None:
+            previous.join()
+        try:
+            subtitles = self.subtitles(srt_path)
+            if cancel.is_set() or not config.PRESYNTH_ENABLED or not config.TTS_CACHE_ENABLED:
+                return
+            _, timing_identity = self._engine(params, draft)
+            duration_model = None
+            if config.RATE_PLANNING_ENABLED:
+                initial = DurationPredictor()
+                with self._lock:
+                    self._timing_start = (self._job_key(srt_path, params, draft), initial)
+                duration_model = initial.snapshot()
+            processor = AudioProcessor(self.provider(params, draft), duration_model=duration_model,
+                                       timing_identity=timing_identity)
+            processor.presynthesize(subtitles, cancel.is_set, config.MAX_SPEED_UP_RATIO, self.progress_callback)
+        except Exception as e:
+            print(f"后台预合成失败: {e}")
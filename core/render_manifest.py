@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+
+from .audio_clip import AudioClip
+from .subtitle_parser import SubtitleItem
+from .tts_cache import normalize_text
+
+MANIFEST_VERSION = 1
+
+class RenderManifest:
+    """
+    与输出视频放在一起的任务清单 (<输出文件>.lark/)，用于增量重渲染与崩溃后续跑。
+    - segments/：每句已对齐 (变速完成) 的配音片段，按 (文本, 字幕时长, 渲染参数) 的哈希命名
+    - manifest.json：上一次完成的渲染中每句的序号、时间轴、文本与对应片段
+
+    片段在合成/变速完成后立即原子写入，因此中途崩溃的任务再次运行时，已完成的句子直接复用；
+    修改字幕后只有文本或时长发生变化的句子需要重新合成，其余片段按新的时间轴重新拼装。
+    """
+    def __init__(self, output_path: str):
+        self.root = f"{output_path}.lark"
+        self.segment_dir = os.path.join(self.root, "segments")
+        self.path = os.path.join(self.root, "manifest.json")
+        self.params = None
+        self.previous = self._load()
+
+    def _load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return None
+            return data
+        except (OSError, ValueError) as e:
+            print(f"读取渲染清单失败，将完整重新渲染: {e}")
+            return None
+
+    def begin(self, params: dict):
+        """
+        :param params: 影响片段内容的渲染参数 (引擎音色、语速、最大加速倍率、内部采样格式、变速引擎等)，
+                       任一参数变化都会使全部片段失效
+        """
+        self.params = params
+        os.makedirs(self.segment_dir, exist_ok=True)
+
+    def segment_key(self, item: SubtitleItem) -> str:
+        # 片段只取决于文本与字幕窗口长度，开始时间变化时无需重新合成，只需换个位置写入
+        raw = json.dumps({"params": self.params, "text": normalize_text(item.text), "duration_ms": item.duration_ms},
+                         ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _segment_path(self, key: str) -> str:
+        return os.path.join(self.segment_dir, f"{key}.wav")
+
+    def load_segment(self, key: str) -> Optional[AudioClip]:
+        path = self._segment_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return AudioClip.from_wav_file(path)
+        except Exception as e:
+            print(f"读取已渲染片段失败，将重新合成: {e}")
+            return None
+
+    def save_segment(self, key: str, samples: np.ndarray, frame_rate: int):
+        """先写临时文件再原子替换，崩溃时不会留下半截片段"""
+        path = self._segment_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            AudioClip(samples, frame_rate).write_wav(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"保存已渲染片段失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def diff(self, subtitles: List[SubtitleItem]) -> Dict[str, int]:
+        """
+        与上一次完成的渲染比较 (按字幕序号)
+        :return: {"unchanged", "changed", "added", "removed"} 各自的句数，
+                 以及 "reusable"：磁盘上已有对齐片段、无需重新合成的句数 (含崩溃前已完成的句子)
+        """
+        before = {}
+        if self.previous and self.previous.get("params") == self.params:
+            before = {line["index"]: line["segment"] for line in self.previous["lines"]}
+        stats = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0, "reusable": 0}
+        seen = set()
+        for item in subtitles:
+            seen.add(item.index)
+            if os.path.exists(self._segment_path(self.segment_key(item))):
+                stats["reusable"] += 1
+            if item.index not in before:
+                stats["added"] += 1
+            elif before[item.index] == self.segment_key(item):
+                stats["unchanged"] += 1
+            else:
+                stats["changed"] += 1
+        stats["removed"] = len(set(before) - seen)
+        return stats
+
+    def commit(self, subtitles: List[SubtitleItem]):
+        """所有片段写入完毕后记录本次渲染结果，并清理不再被引用的旧片段"""
+        lines = [{
+            "index": item.index,
+            "start_ms": item.start_time_ms,
+            "end_ms": item.end_time_ms,
+            "text": item.text,
+            "segment": self.segment_key(item),
+        } for item in subtitles]
+        data = {"version": MANIFEST_VERSION, "params": self.params, "lines": lines}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        self.previous = data
+
+        referenced = {f"{line['segment']}.wav" for line in lines}
+        for name in os.listdir(self.segment_dir):
+            if name not in referenced:
+                try:
+                    os.remove(os.path.join(self.segment_dir, name))
+                except OSError:
+                    pass
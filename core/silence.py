@@ -0,0 +1,29 @@
+import numpy as np
+
+def trim_silence(samples: np.ndarray, frame_rate: int, threshold_db: float = -45.0, pad_ms: int = 40, window_ms: int = 10) -> np.ndarray:
+    """
+    按短时能量去掉首尾静音：一次性算出每个分析窗的均方能量，找到首尾两个高于门限的窗口
+    :param samples: [帧数, 声道数] 的 int16 采样
+    :param frame_rate: 采样率
+    :param threshold_db: 静音门限 (相对满幅的 dBFS)，窗口均方根低于该值视为静音
+    :param pad_ms: 首尾有声窗口之外各保留的保护时长，避免切掉清辅音起始与尾音衰减
+    :param window_ms: 能量分析窗长 (毫秒)
+    :return: 原数组的切片 (不复制采样)；整段都低于门限时原样返回
+    """
+    n = len(samples)
+    win = max(1, int(frame_rate * window_ms / 1000))
+    windows = -(-n // win)
+    if windows == 0:
+        return samples
+    x = samples.reshape(n, -1).astype(np.float32)
+    # 末尾不足一窗的部分补零，按窗口整形后对 (窗内采样 x 声道) 求均方
+    x = np.pad(x, ((0, windows * win - n), (0, 0)))
+    energy = np.square(x).reshape(windows, -1).mean(axis=1)
+    threshold = (32768.0 * 10 ** (threshold_db / 20)) ** 2
+    voiced = np.flatnonzero(energy > threshold)
+    if voiced.size == 0:
+        return samples
+    pad = int(frame_rate * pad_ms / 1000)
+    start = max(0, int(voiced[0]) * win - pad)
+    end = min(n, (int(voiced[-1]) + 1) * win + pad)
+    return samples[start:end]
@@ -1,7 +1,10 @@
 import os
-import pysrt
+import re
+import codecs
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List, Optional, Tuple
+
+import config
 
 @dataclass
 class SubtitleItem:
@@ -12,46 +15,183 @@ class SubtitleItem:
     duration_ms: int     # 持续时间 (毫秒)
     text: str            # 字幕文本信息
 
+# 带 BOM 的文件直接按 BOM 确定编码 (UTF-32 需排在 UTF-16 之前，两者 BOM 前缀相同)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# chardet 对中文常给出 GB2312，实际字幕多含 GBK 扩展字，统一按超集 GB18030 解码
+_ENCODING_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "ascii": "utf-8"}
+
+_TIMESTAMP_SEPARATOR = "-->"
+_TIME_RE = re.compile(r"^\s*(\d+):(\d+):(\d+)[,.:](\d+)\s*$")
+_TIME_SEP_RE = re.compile(r"[:.,]")
+_LEADING_INT_RE = re.compile(r"^(\d+)")
+
+def detect_encoding(path: str, sample_bytes: int = None) -> str:
+    """
+    只读取文件开头的一段样本推测编码：BOM 优先，其次能按 UTF-8 解码即视为 UTF-8，
+    否则交给 chardet，仍无法判断时回退为 GBK 系编码
+    :param sample_bytes: 样本大小，缺省读取 config.SRT_ENCODING_SAMPLE_BYTES
+    """
+    sample_bytes = sample_bytes or config.SRT_ENCODING_SAMPLE_BYTES
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # 样本可能在多字节字符中间截断，未读完整个文件时不要求末尾完整
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) < sample_bytes)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    import chardet
+    guess = chardet.detect(sample)
+    encoding = (guess.get("encoding") or "gb18030").lower()
+    return _ENCODING_ALIASES.get(encoding, encoding)
+
+def _parse_time(value: str) -> int:
+    """HH:MM:SS,mmm -> 毫秒；与 pysrt 一致地容忍 '.'/':' 分隔与数字后的杂字符，无法解析的部分记为 0"""
+    match = _TIME_RE.match(value)
+    if match:
+        parts = [int(g) for g in match.groups()]
+    else:
+        items = _TIME_SEP_RE.split(value.strip())
+        if len(items) != 4:
+            raise ValueError(f"无效的时间戳: {value}")
+        parts = []
+        for item in items:
+            digits = _LEADING_INT_RE.match(item)
+            parts.append(int(digits.group()) if digits else 0)
+    hours, minutes, seconds, millis = parts
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + millis
+
+def parse_timecode(value: str) -> int:
+    """
+    解析命令行/界面输入的时间点，返回毫秒。支持秒数 ("90"、"90.5")、"MM:SS" 与 "HH:MM:SS[,.]mmm"
+    """
+    value = value.strip()
+    parts = value.replace(",", ".").split(":")
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f"无效的时间点: {value}")
+    try:
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"无效的时间点: {value}") from None
+    if seconds < 0:
+        raise ValueError(f"无效的时间点: {value}")
+    return int(round(seconds * 1000))
+
+def select_range(subtitles: List[SubtitleItem], start_ms: Optional[int] = None,
+                 end_ms: Optional[int] = None) -> Tuple[List[SubtitleItem], Tuple[int, Optional[int]]]:
+    """
+    选出与 [start_ms, end_ms) 有重叠的字幕，用于只渲染一段预览。
+    截取范围向外扩展到首尾两句的完整时间轴 (不会切掉半句)，选中的字幕时间改为相对截取起点，序号保持不变。
+    :param end_ms: 缺省表示直到视频结尾
+    :return: (平移后的字幕, (截取起点毫秒, 截取终点毫秒或 None))
+    """
+    start_ms = start_ms or 0
+    if end_ms is not None and end_ms <= start_ms:
+        raise ValueError("结束时间必须晚于开始时间")
+    selected = [item for item in subtitles
+                if item.end_time_ms > start_ms and (end_ms is None or item.start_time_ms < end_ms)]
+    if not selected:
+        return [], (start_ms, end_ms)
+    span_start = min(start_ms, min(item.start_time_ms for item in selected))
+    span_end = None if end_ms is None else max(end_ms, max(item.end_time_ms for item in selected))
+    shifted = [
+        SubtitleItem(
+            index=item.index,
+            start_time_ms=item.start_time_ms - span_start,
+            end_time_ms=item.end_time_ms - span_start,
+            duration_ms=item.duration_ms,
+            text=item.text
+        )
+        for item in selected
+    ]
+    return shifted, (span_start, span_end)
+
+def _parse_block(lines: List[str]):
+    """解析一个字幕块 (可选序号行 + 时间轴行 + 文本行)，返回 (开始, 结束, 文本)，格式无效时返回 None"""
+    if len(lines) < 2:
+        return None
+    if _TIMESTAMP_SEPARATOR not in lines[0]:
+        lines = lines[1:]
+    timestamps = lines[0].split(_TIMESTAMP_SEPARATOR)
+    if len(timestamps) != 2:
+        return None
+    # 结束时间后可能跟有位置信息 (X1:... Y1:...)
+    end = timestamps[1].strip().split(" ", 1)[0]
+    try:
+        return _parse_time(timestamps[0]), _parse_time(end), "\n".join(lines[1:])
+    except ValueError:
+        return None
+
 class SubtitleParser:
     def __init__(self, srt_path: str):
         if not os.path.exists(srt_path):
             raise FileNotFoundError(f"找不到字幕文件: {srt_path}")
         self.srt_path = srt_path
-        
+
+    def iter_items(self) -> Iterator[SubtitleItem]:
+        """
+        流式解析 SRT 文件：按采样推测的编码逐行读取，每解析完一个字幕块立即产出，
+        内存占用与文件大小无关，首条字幕无需等待整个文件读完。
+        多行文本合并为单行，无效时间轴与空字幕会被跳过 (序号仍按原始块计数，与 pysrt 行为一致)。
+        """
+        encoding = detect_encoding(self.srt_path)
+        ordinal = 0
+        block = []
+        # 仅样本参与了编码推测，样本之外的个别坏字节以替换字符处理，避免解析到一半中断
+        with open(self.srt_path, "r", encoding=encoding, errors="replace") as f:
+            for line in f:
+                line = line.rstrip()
+                if line:
+                    block.append(line)
+                    continue
+                if not block:
+                    continue
+                parsed, block = _parse_block(block), []
+                if parsed is None:
+                    continue
+                ordinal += 1
+                item = self._make_item(ordinal, *parsed)
+                if item is not None:
+                    yield item
+            parsed = _parse_block(block)
+            if parsed is not None:
+                item = self._make_item(ordinal + 1, *parsed)
+                if item is not None:
+                    yield item
+
+    @staticmethod
+    def _make_item(index: int, start_ms: int, end_ms: int, text: str):
+        duration_ms = end_ms - start_ms
+        if duration_ms <= 0:
+            return None # 忽略无效时间轴的字幕
+
+        # 文本清理：去掉换行和前后空格
+        clean_text = text.replace('\n', ' ').strip()
+        if not clean_text:
+            return None # 忽略空字幕
+
+        return SubtitleItem(
+            index=index,
+            start_time_ms=start_ms,
+            end_time_ms=end_ms,
+            duration_ms=duration_ms,
+            text=clean_text
+        )
+
     def parse(self) -> List[SubtitleItem]:
         """
-        解析 SRT 文件，返回结构化的字幕列表。
-        强制使用 UTF-8 编码读取，并将多行文本合并单行，利于 TTS 处理。
+        解析 SRT 文件，返回结构化的字幕列表 (iter_items 的完整结果)。
+        编码按文件开头的样本自动识别 (UTF-8 / GBK 等)，并将多行文本合并单行，利于 TTS 处理。
         """
-        # pysrt 会自动推测编码，但明确使用 utf-8 读取较安全
-        try:
-            subs = pysrt.open(self.srt_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            # 兼容其他如 gbk 编码
-            subs = pysrt.open(self.srt_path, encoding='gbk')
-            
-        parsed_items = []
-        for i, sub in enumerate(subs):
-            start_ms = sub.start.ordinal
-            end_ms = sub.end.ordinal
-            duration_ms = end_ms - start_ms
-            
-            if duration_ms <= 0:
-                continue # 忽略无效时间轴的字幕
-            
-            # 文本清理：去掉换行和前后空格
-            clean_text = sub.text.replace('\n', ' ').strip()
-            
-            if not clean_text:
-                continue # 忽略空字幕
-                
-            item = SubtitleItem(
-                index=i + 1,
-                start_time_ms=start_ms,
-                end_time_ms=end_ms,
-                duration_ms=duration_ms,
-                text=clean_text
-            )
-            parsed_items.append(item)
-            
-        return parsed_items
+        return list(self.iter_items())
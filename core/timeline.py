@@ -0,0 +1,63 @@
+from typing import TYPE_CHECKING
+import numpy as np
+from .audio_clip import AudioClip
+from .resample import resample, remix
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+class TimelineBuffer:
+    """
+    整条配音音轨的预分配采样缓冲区 (int16, 形状为 [帧数, 声道数])。
+    每个片段按其字幕开始时间直接写入对应的采样偏移，拼装总开销与音轨长度成线性关系；
+    时间轴相互重叠的片段按采样叠加 (饱和截断)，不会把后续字幕整体往后推。
+    """
+    def __init__(self, duration_ms: int, frame_rate: int, channels: int = 1):
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.samples = np.zeros((self.ms_to_frames(duration_ms), channels), dtype=np.int16)
+
+    def ms_to_frames(self, ms: int) -> int:
+        return int(round(ms * self.frame_rate / 1000))
+
+    @property
+    def duration_ms(self) -> int:
+        return int(round(len(self.samples) * 1000 / self.frame_rate))
+
+    def to_array(self, segment: "AudioSegment") -> np.ndarray:
+        """将 pydub 片段转换为缓冲区的采样率、声道数与 16bit 位深，返回 [帧数, 声道数] 数组"""
+        return self.clip_to_array(AudioClip.from_segment(segment))
+
+    def clip_to_array(self, clip: AudioClip) -> np.ndarray:
+        """
+        内存音频与缓冲区格式一致时直接复用其采样；否则用带限插值一次转换到缓冲区格式
+        (声道减少时先混缩再重采样，增加时先重采样再复制，重采样总是作用在较少的声道上)
+        """
+        samples = clip.samples
+        if clip.frame_rate != self.frame_rate:
+            if clip.channels > self.channels:
+                samples = remix(samples, self.channels)
+            samples = resample(samples, clip.frame_rate, self.frame_rate)
+        return remix(samples, self.channels)
+
+    def place(self, samples: np.ndarray, start_ms: int, max_ms: int = None):
+        """
+        将片段写入时间轴
+        :param samples: [帧数, 声道数] 的 int16 采样
+        :param start_ms: 片段在时间轴上的起始位置 (毫秒)
+        :param max_ms: 片段允许占用的最长时长，超出部分丢弃 (即字幕窗口长度)
+        """
+        offset = self.ms_to_frames(start_ms)
+        length = len(samples)
+        if max_ms is not None:
+            length = min(length, self.ms_to_frames(max_ms))
+        length = min(length, len(self.samples) - offset)
+        if length <= 0:
+            return
+        region = self.samples[offset:offset + length]
+        mixed = region.astype(np.int32) + samples[:length]
+        np.clip(mixed, -32768, 32767, out=mixed)
+        region[:] = mixed
+
+    def export_wav(self, output_path: str):
+        AudioClip(self.samples, self.frame_rate).write_wav(output_path)
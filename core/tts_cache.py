@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+
+import config
+from .audio_clip import AudioClip
+from .tts_provider import TTSProvider
+
+# 同文本并发合成去重所用的锁条数：键按哈希分到固定的一组锁上，常驻进程中锁的数量不随合成过的文本增长
+_KEY_LOCK_STRIPES = 64
+
+def normalize_text(text: str) -> str:
+    """缓存键使用的文本规范化：全半角统一 (NFKC)、折叠连续空白、去除首尾空格"""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+class TTSCache:
+    """
+    内容寻址的 TTS 磁盘缓存。
+    每个条目是一段音频文件，文件名为 (规范化文本 + 引擎参数) 的 sha256；
+    命中时刷新文件 mtime，容量超出上限时按 mtime 从旧到新淘汰 (LRU)。
+    """
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, fmt: str = None):
+        self.cache_dir = cache_dir or config.TTS_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else config.TTS_CACHE_MAX_BYTES
+        self.fmt = fmt or config.TTS_CACHE_FORMAT
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 首次写入时再扫描目录统计
+        self._scanned_at = 0.0
+
+    @staticmethod
+    def make_key(identity: dict, text: str) -> str:
+        raw = json.dumps({"engine": identity, "text": normalize_text(text)}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        # 按前两位分桶，避免单目录下文件过多
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{self.fmt}")
+
+    def fetch_clip(self, key: str) -> Optional[AudioClip]:
+        """若命中缓存，直接把条目解码为内存中的 AudioClip 返回"""
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            return None
+        try:
+            if self.fmt == "wav":
+                clip = AudioClip.from_wav_file(entry)
+            else:
+                from pydub import AudioSegment
+                clip = AudioClip.from_segment(AudioSegment.from_file(entry, format=self.fmt))
+            os.utime(entry)  # 刷新访问时间，供 LRU 淘汰参考
+            return clip
+        except Exception as e:
+            print(f"读取 TTS 缓存失败，将重新合成: {e}")
+            return None
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """若命中缓存，将条目还原为 wav 写入 output_path 并返回 True"""
+        clip = self.fetch_clip(key)
+        if clip is None:
+            return False
+        clip.write_wav(output_path)
+        return True
+
+    def store(self, key: str, clip: AudioClip):
+        """将合成好的音频写入缓存，先写临时文件再原子替换，避免并发读到半截文件"""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if self.fmt == "wav":
+                clip.write_wav(tmp_path)
+            else:
+                clip.to_segment().export(tmp_path, format=self.fmt)
+            os.replace(tmp_path, entry)
+        except Exception as e:
+            print(f"写入 TTS 缓存失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            # 累计值只包含本进程的写入，超过 TTS_CACHE_RESCAN_SECONDS 后重新扫描以计入其他进程的写入
+            if self._total_bytes is None or time.monotonic() - self._scanned_at >= config.TTS_CACHE_RESCAN_SECONDS:
+                self._total_bytes = self._scan_size()
+                self._scanned_at = time.monotonic()
+            else:
+                self._total_bytes += os.path.getsize(entry)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _list_entries(self):
+        """列出全部条目 (含其他存储格式的旧条目：切换格式后它们不再命中，但仍计入容量并按 LRU 淘汰)"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._list_entries())
+
+    def _evict(self):
+        """删除最久未使用的条目，直到总容量回落到上限以内 (调用方需持有 _lock)"""
+        entries = sorted(self._list_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+        self._scanned_at = time.monotonic()
+
+class CachedTTSProvider(TTSProvider):
+    """
+    包裹任意 TTSProvider 的缓存层：先查磁盘缓存，未命中再调用底层引擎并回写。
+    缓存以内存中的 AudioClip 为单位读写，文件接口 (generate_audio/generate_batch) 由其派生。
+    同一次运行中相同文本的并发请求只会真正合成一次，其余请求等待后直接命中缓存。
+    缓存键不含输出采样率：不同内部格式的任务可互相命中，采样率不同的条目在拼装时转换一次即可。
+    """
+    def __init__(self, provider: TTSProvider, cache: TTSCache = None):
+        self.provider = provider
+        self.cache = cache or TTSCache()
+        self.thread_safe = getattr(provider, "thread_safe", True)
+        self.supports_batch = getattr(provider, "supports_batch", False)
+        self.supports_speed = getattr(provider, "supports_speed", False)
+        self.hits = 0
+        self.misses = 0
+        self._locks_guard = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(_KEY_LOCK_STRIPES)]
+
+    def cache_identity(self) -> dict:
+        return self.provider.cache_identity()
+
+    def set_output_sample_rate(self, sample_rate):
+        self.output_sample_rate = sample_rate
+        self.provider.set_output_sample_rate(sample_rate)
+
+    def close(self):
+        self.provider.close()
+
+    @staticmethod
+    def _stripe(key: str) -> int:
+        return int(key[:8], 16) % _KEY_LOCK_STRIPES
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        return self._key_locks[self._stripe(key)]
+
+    def _identity(self, speed: float) -> dict:
+        # 1.0 倍速沿用原有缓存键，规划出的其他语速单独缓存
+        identity = self.provider.cache_identity()
+        return identity if speed == 1.0 else dict(identity, speed=speed)
+
+    def synthesize(self, text: str, speed: float = 1.0) -> Optional[AudioClip]:
+        key = self.cache.make_key(self._identity(speed), text)
+        with self._key_lock(key):
+            clip = self.cache.fetch_clip(key)
+            with self._locks_guard:
+                if clip is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if clip is not None:
+                return clip
+            clip = self.provider.synthesize(text, speed)
+            if clip is not None:
+                self.cache.store(key, clip)
+            return clip
+
+    def synthesize_batch(self, texts: List[str], speeds: Optional[List[float]] = None) -> List[Optional[AudioClip]]:
+        """
+        批量版本：缓存命中的句子直接还原，批内重复的文本 (且语速相同) 只合成一次，
+        其余未命中的句子合并为一次底层批量调用
+        """
+        speeds = speeds or [1.0] * len(texts)
+        keys = [self.cache.make_key(self._identity(speed), text) for text, speed in zip(texts, speeds)]
+        # 按锁序号排序后依次加锁 (同一把锁只取一次)，避免多个批次交叉持锁造成死锁
+        locks = [self._key_locks[i] for i in sorted({self._stripe(key) for key in keys})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            clips = {}
+            pending = []
+            for key, text, speed in zip(keys, texts, speeds):
+                if key in clips:
+                    continue
+                clips[key] = self.cache.fetch_clip(key)
+                if clips[key] is None:
+                    pending.append((key, text, speed))
+
+            with self._locks_guard:
+                self.hits += len(texts) - len(pending)
+                self.misses += len(pending)
+
+            if pending:
+                generated = self.provider.synthesize_batch([text for _, text, _ in pending],
+                                                           [speed for _, _, speed in pending])
+                for (key, _, _), clip in zip(pending, generated):
+                    clips[key] = clip
+                    if clip is not None:
+                        self.cache.store(key, clip)
+
+            # 批内重复的句子共享首次出现的结果
+            return [clips[key] for key in keys]
+        finally:
+            for lock in locks:
+                lock.release()
+
+    def generate_audio(self, text: str, output_path: str) -> bool:
+        clip = self.synthesize(text)
+        if clip is None:
+            return False
+        clip.write_wav(output_path)
+        return True
+
+    def generate_batch(self, items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+        clips = self.synthesize_batch([text for text, _ in items], speeds)
+        for clip, (_, output_path) in zip(clips, items):
+            if clip is not None:
+                clip.write_wav(output_path)
+        return [clip is not None for clip in clips]
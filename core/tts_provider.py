@@ -1,18 +1,45 @@
 import os
 import sys
 import json
-import urllib.request
+import tempfile
+import threading
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
 import config
+from .audio_clip import AudioClip
+from .http_pool import get_connection_pool
+from .wav_stream import WavStreamWriter, pcm_wav_header
 
-# 尝试导入 pyttsx3，如果失败不报错，而是留给具体实现的构造函数去处理
-try:
-    import pyttsx3
-except ImportError:
-    pyttsx3 = None
+# pyttsx3 导入时即加载平台驱动，推迟到首次初始化本地引擎时再导入 (见 _load_pyttsx3)
+pyttsx3 = None
+
+def _require_pyttsx3():
+    """只检查 pyttsx3 是否可用而不导入，未安装时由本地引擎的构造函数直接报错"""
+    if pyttsx3 is None and importlib.util.find_spec("pyttsx3") is None:
+        raise ImportError("Windows/Linux 下运行 Native 模式需安装 pyttsx3")
+
+def _load_pyttsx3():
+    global pyttsx3
+    if pyttsx3 is None:
+        import pyttsx3 as module
+        pyttsx3 = module
+    return pyttsx3
 
 class TTSProvider(ABC):
     """TTS 语音生成接口基类，提供可插拔设计"""
+
+    # 是否允许多个线程同时调用 generate_audio，AudioProcessor 据此决定是否并发合成
+    thread_safe = True
+    # 是否实现了真正的批量合成 (一次调用摊薄多句的开销)，AudioProcessor 据此决定是否分批调度
+    supports_batch = False
+    # 是否支持逐句指定语速倍率 (synthesize/synthesize_batch 的 speed 参数)，AudioProcessor 据此决定是否做语速规划
+    supports_speed = False
+    # 可选的期望输出采样率 (当前任务的内部格式)：能按指定采样率输出的引擎据此直接返回该采样率的音频，
+    # 其余引擎忽略，由 TimelineBuffer 统一转换
+    output_sample_rate = None
     
     @abstractmethod
     def generate_audio(self, text: str, output_path: str) -> bool:
@@ -24,30 +51,153 @@ class TTSProvider(ABC):
         """
         pass
 
+    def generate_batch(self, items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+        """
+        批量生成语音，默认实现逐句调用 generate_audio；支持批处理的引擎应覆盖此方法
+        :param items: [(文本, 输出路径), ...]
+        :param speeds: 逐句语速倍率，仅 supports_speed 的引擎需要处理，默认实现忽略
+        :return: 与 items 一一对应的成功标记
+        """
+        return [self.generate_audio(text, output_path) for text, output_path in items]
+
+    def synthesize(self, text: str, speed: float = 1.0) -> Optional[AudioClip]:
+        """
+        合成语音并直接返回内存中的 PCM 音频，时长由采样数得出，无需再次解码。
+        默认实现经由临时 wav 文件中转；能直接拿到音频数据的引擎应覆盖此方法
+        :param speed: 语速倍率，仅 supports_speed 的引擎生效
+        :return: 成功返回 AudioClip, 失败返回 None
+        """
+        return self.synthesize_batch([text], [speed])[0]
+
+    def synthesize_batch(self, texts: List[str], speeds: Optional[List[float]] = None) -> List[Optional[AudioClip]]:
+        """
+        synthesize 的批量版本，默认实现经由 generate_batch 写出的临时文件中转
+        :param speeds: 与 texts 一一对应的语速倍率，缺省均为 1.0
+        :return: 与 texts 一一对应的 AudioClip (失败为 None)
+        """
+        with tempfile.TemporaryDirectory(prefix="lark_tts_") as tmp:
+            paths = [os.path.join(tmp, f"{i}.wav") for i in range(len(texts))]
+            if self.supports_speed and speeds and any(speed != 1.0 for speed in speeds):
+                flags = self.generate_batch(list(zip(texts, paths)), speeds)
+            elif len(texts) == 1:
+                flags = [self.generate_audio(texts[0], paths[0])]
+            else:
+                flags = self.generate_batch(list(zip(texts, paths)))
+            return [self._read_clip(path) if ok else None for ok, path in zip(flags, paths)]
+
+    @staticmethod
+    def _read_clip(path: str) -> Optional[AudioClip]:
+        if not os.path.exists(path):
+            return None
+        try:
+            return AudioClip.from_wav_file(path)
+        except Exception as e:
+            print(f"读取合成音频失败: {e}")
+            return None
+
+    def set_output_sample_rate(self, sample_rate: Optional[int]):
+        self.output_sample_rate = sample_rate
+
+    def close(self):
+        """释放引擎持有的资源 (如工作进程)；默认无需释放。调用方创建的引擎在任务结束时应调用此方法"""
+
+    def cache_identity(self) -> dict:
+        """
+        返回影响合成结果的引擎参数 (模式、音色、语速/风格等)，用作 TTS 缓存键的一部分。
+        子类应覆盖此方法，确保参数不同的合成结果不会互相命中。
+        """
+        return {"provider": type(self).__name__}
+
+def _native_platform() -> str:
+    if sys.platform == "darwin":
+        return "mac"
+    return "win" if sys.platform.startswith("win") else "linux"
+
+def _native_identity(gender: str, rate: int) -> dict:
+    platform = _native_platform()
+    return {
+        "mode": "native",
+        "backend": "say" if platform == "mac" else "pyttsx3",
+        "voice": config.TTS_ENGINE_CAPABILITIES["native"]["voices"][gender][platform],
+        "rate": rate,
+    }
+
+def _cosyvoice_voice(params: dict) -> str:
+    lang = params["language"]
+    gender = params["gender"]
+    style = params["style"]
+
+    cap = config.TTS_ENGINE_CAPABILITIES["cosyvoice"]
+    try:
+        return cap["voices"][lang][gender][style]
+    except KeyError:
+        print(f"Warning: Voice not found for {lang}/{gender}/{style}. Fallback.")
+        return "中文女"
+
+def provider_identity(params: dict) -> dict:
+    """不创建引擎，直接按参数得出 get_tts_provider(params).cache_identity() 的结果"""
+    mode = params["mode"]
+    if mode == "native":
+        return _native_identity(params["gender"], params.get("rate", config.TTS_ENGINE_CAPABILITIES["native"]["default_rate"]))
+    if mode == "cosyvoice":
+        return {"mode": "cosyvoice", "voice": _cosyvoice_voice(params)}
+    raise ValueError(f"不支持的 TTS 模式: {mode}")
+
+# pyttsx3.init() 在同一进程内按驱动返回同一个引擎实例，进程内的所有 Pyttsx3TTS 实际共用一个引擎：
+# 每次使用都持有此锁，并先设置自己的音色与语速
+_pyttsx3_lock = threading.Lock()
+
 class Pyttsx3TTS(TTSProvider):
-    """基于系统自带接口的本地 TTS 引擎实现 (Mac: say, Windows: sapi5)"""
+    """基于系统自带接口的本地 TTS 引擎实现 (Mac: say, Windows: sapi5, Linux: espeak-ng)"""
     def __init__(self, gender="female", rate=180):
         self.is_mac = sys.platform == "darwin"
         self.gender = gender
         self.rate = rate
-        self.engine = None
+        self._engine = None
+        # Mac 下每句独立启动 say 子进程，可并发；pyttsx3 引擎实例不可跨线程共享
+        self.thread_safe = self.is_mac
+        # pyttsx3 可在一次 runAndWait 中连续处理多个 save_to_file，驱动循环只进出一次
+        self.supports_batch = not self.is_mac
+        # 语速倍率折算为 say -r / pyttsx3 rate (单词/分钟)
+        self.supports_speed = True
         
-        cap = config.TTS_ENGINE_CAPABILITIES["native"]
-        self.voice_name = cap["voices"][gender]["win" if not self.is_mac else "mac"]
+        self.voice_name = _native_identity(gender, rate)["voice"]
+        self._voice_id = self.voice_name
+        self._engine_ready = self.is_mac
 
         if not self.is_mac:
-            if pyttsx3 is None:
-                raise ImportError("Windows 下运行 Native 模式需安装 pyttsx3")
+            _require_pyttsx3()
+
+    @property
+    def engine(self):
+        """
+        驱动初始化与音色扫描推迟到首次合成 (只查询 cache_identity 或全部命中缓存时不初始化)。
+        返回的引擎可能与其他实例共用，须在 _pyttsx3_lock 内经 _apply_voice 设置音色与语速后再使用
+        """
+        if not self._engine_ready:
+            self._engine_ready = True
             try:
-                self.engine = pyttsx3.init()
-                self.engine.setProperty('rate', rate)
-                voices = self.engine.getProperty('voices')
+                self._engine = _load_pyttsx3().init()
+                voices = self._engine.getProperty('voices')
                 for v in voices:
                     if self.voice_name.lower() in v.name.lower():
-                        self.engine.setProperty('voice', v.id)
+                        self._voice_id = v.id
                         break
+                # 未找到同名音色时 espeak-ng 按标识符 (可带变体，如 cmn+f3) 直接设置
             except Exception as e:
                 print(f"初始化 pyttsx3 失败: {e}")
+        return self._engine
+
+    def _apply_voice(self):
+        """把共用引擎切换为本实例的音色与语速 (调用方持有 _pyttsx3_lock)"""
+        self.engine.setProperty('voice', self._voice_id)
+        self.engine.setProperty('rate', self.rate)
+
+    def cache_identity(self) -> dict:
+        return _native_identity(self.gender, self.rate)
+
+    def _rate_for(self, speed: float) -> int:
+        return int(round(self.rate * speed))
 
     def generate_audio(self, text: str, output_path: str) -> bool:
         if self.is_mac:
@@ -66,61 +216,394 @@ class Pyttsx3TTS(TTSProvider):
                 print(f"Mac say 命令生成失败: {e}")
                 return False
         else:
+            with _pyttsx3_lock:
+                if not self.engine:
+                    return False
+                try:
+                    self._apply_voice()
+                    self.engine.save_to_file(text, output_path)
+                    self.engine.runAndWait()
+                    return True
+                except Exception as e:
+                    print(f"Pyttsx3 生成失败: {e}")
+                    return False
+
+    def generate_batch(self, items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+        """
+        先为整批句子排队 save_to_file，再只调用一次 runAndWait，避免每句都阻塞并重入驱动循环
+        :param speeds: 逐句语速倍率；pyttsx3 的 setProperty 同样进入命令队列，可与 save_to_file 交替排队
+        """
+        if self.is_mac or (len(items) <= 1 and not speeds):
+            return super().generate_batch(items)
+        with _pyttsx3_lock:
             if not self.engine:
-                return False
+                return [False] * len(items)
             try:
-                self.engine.save_to_file(text, output_path)
+                self._apply_voice()
+                for i, (text, output_path) in enumerate(items):
+                    if speeds:
+                        self.engine.setProperty('rate', self._rate_for(speeds[i]))
+                    self.engine.save_to_file(text, output_path)
                 self.engine.runAndWait()
-                return True
             except Exception as e:
-                print(f"Pyttsx3 生成失败: {e}")
-                return False
+                print(f"Pyttsx3 批量生成失败: {e}")
+                return [False] * len(items)
+        return [os.path.exists(output_path) for _, output_path in items]
+
+    def synthesize_batch(self, texts: List[str], speeds: Optional[List[float]] = None) -> List[Optional[AudioClip]]:
+        if not self.is_mac:
+            return super().synthesize_batch(texts, speeds)
+        return [self.synthesize(text, speed) for text, speed in zip(texts, speeds or [1.0] * len(texts))]
+
+    def synthesize(self, text: str, speed: float = 1.0) -> Optional[AudioClip]:
+        if not self.is_mac:
+            return super().synthesize(text, speed)
+        # say 可直接输出 16bit wav，省去 aiff 中转与 ffmpeg 转码子进程
+        import subprocess
+        fd, wav_path = tempfile.mkstemp(prefix="lark_say_", suffix=".wav")
+        os.close(fd)
+        try:
+            subprocess.run(["say", "-v", self.voice_name, "-r", str(self._rate_for(speed)),
+                            "--file-format=WAVE", f"--data-format=LEI16@{self.output_sample_rate or config.VOCAL_SAMPLE_RATE}",
+                            "-o", wav_path, text], check=True)
+            return AudioClip.from_wav_file(wav_path)
+        except Exception as e:
+            print(f"Mac say 命令生成失败: {e}")
+            return None
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+
+# 进程池工作进程内独占的本地引擎，由 _init_native_worker 在进程启动时创建
+_native_worker = None
+
+def _init_native_worker(gender: str, rate: int):
+    global _native_worker
+    _native_worker = Pyttsx3TTS(gender, rate)
+
+def _native_worker_batch(items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+    return _native_worker.generate_batch(items, speeds)
+
+class NativeProcessPoolTTS(TTSProvider):
+    """
+    多进程本地 TTS：pyttsx3 引擎不可跨线程共享，改为每个工作进程持有一个独立引擎，
+    各批句子分发到不同进程并行合成 (进程内仍按批一次 runAndWait)
+    """
+    supports_batch = True
+    supports_speed = True
+
+    def __init__(self, gender="female", rate=180, processes: Optional[int] = None):
+        _require_pyttsx3()
+        self.gender = gender
+        self.rate = rate
+        self.processes = processes or os.cpu_count() or 1
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def cache_identity(self) -> dict:
+        return _native_identity(self.gender, self.rate)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # 首次合成时才启动进程池，各进程在启动时初始化自己的引擎
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    initializer=_init_native_worker,
+                    initargs=(self.gender, self.rate)
+                )
+            return self._executor
+
+    def generate_audio(self, text: str, output_path: str) -> bool:
+        return self.generate_batch([(text, output_path)])[0]
+
+    def generate_batch(self, items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+        try:
+            return self._get_executor().submit(_native_worker_batch, items, speeds).result()
+        except Exception as e:
+            print(f"本地 TTS 工作进程生成失败: {e}")
+            return [False] * len(items)
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+def _confirmed_pcm_rate(headers: dict) -> Optional[int]:
+    """
+    服务端声明的裸 PCM 采样率：X-Sample-Rate 响应头，或 Content-Type 的 rate 参数 (如 audio/L16; rate=48000)。
+    未声明时返回 None (不能假定服务端采纳了请求中的 sample_rate)
+    """
+    headers = {k.lower(): v for k, v in headers.items()}
+    candidates = [headers.get("x-sample-rate", "")]
+    candidates += [param.split("=", 1)[1] for param in headers.get("content-type", "").split(";")[1:]
+                   if param.strip().lower().startswith(("rate=", "sample_rate="))]
+    for value in candidates:
+        if value.strip().isdigit():
+            return int(value)
+    return None
+
+def _rejects_format(response) -> bool:
+    """响应是否明确表示不支持所请求的输出格式 (415，或错误信息中指出 response_format/sample_rate 无效的 400/422)"""
+    if response.status == 415:
+        return True
+    if response.status not in (400, 422):
+        return False
+    body = response.data[:2048].decode("utf-8", "ignore").lower()
+    return any(field in body for field in ("response_format", "sample_rate", "pcm"))
 
 class HttpTTS(TTSProvider):
     """用于对接本地 CosyVoice 或其他 AI 模型 API 服务"""
+    # 请求体的 speed 字段 (OpenAI 兼容接口，1.0 为正常语速)
+    supports_speed = True
+
     def __init__(self, params):
         self.api_url = config.COSYVOICE_URL
-        mode = params["mode"]
-        lang = params["language"]
-        gender = params["gender"]
-        style = params["style"]
-        
-        cap = config.TTS_ENGINE_CAPABILITIES[mode]
-        try:
-            self.http_voice = cap["voices"][lang][gender][style]
-        except KeyError:
-            print(f"Warning: Voice not found for {lang}/{gender}/{style}. Fallback.")
-            self.http_voice = "中文女"
+        self.api_path = urlsplit(self.api_url).path or "/"
+        # 同一服务地址的所有实例、所有并发工作线程共享一组 HTTP/1.1 长连接
+        self.pool = get_connection_pool(self.api_url)
+        self.batch_url = config.COSYVOICE_BATCH_URL
+        # 服务端未提供批量接口时 (404/405/501) 自动关闭，之后退化为逐句请求
+        self.batch_available = bool(self.batch_url)
+        # 未配置批量接口时不必按批调度，各句独立请求、各自尽早完成
+        self.supports_batch = self.batch_available
+        # 服务端明确拒绝 response_format=pcm / sample_rate，或返回的裸 PCM 未声明采样率时关闭，之后改回请求 wav
+        self.pcm_available = config.COSYVOICE_REQUEST_PCM
+        self.http_voice = _cosyvoice_voice(params)
+
+    def cache_identity(self) -> dict:
+        return {"mode": "cosyvoice", "voice": self.http_voice}
+
+    def _request_audio(self, text: str, speed: float = 1.0, output_path: Optional[str] = None) -> Optional[bytes]:
+        """
+        请求单句音频
+        :param speed: 语速倍率，1.0 时不发送该字段
+        :param output_path: 给出时响应边接收边写入该文件，返回空字节串；
+                            否则整段响应留在内存中，直接返回 wav 数据 (不经过额外的缓冲区拷贝)
+        :return: 失败返回 None
+        """
+        writer = None
+        # 已知任务内部格式时直接请求该采样率的裸 PCM (16bit 单声道)，本地无需再重采样
+        pcm_rate = self.output_sample_rate if self.pcm_available else None
+
+        def start_stream(status, headers):
+            # 收到 200 响应头后立即开始边接收边写入文件
+            nonlocal writer
+            if status != 200:
+                return None
+            if pcm_rate and _confirmed_pcm_rate(headers) != pcm_rate:
+                # 服务端未确认采样率：整段接收后再判断是否为带头部的 wav
+                return None
+            if writer is not None:
+                writer.close()  # 上一次尝试在交付数据前失败，丢弃其空输出
+            length = {k.lower(): v for k, v in headers.items()}.get("content-length")
+            writer = WavStreamWriter(
+                output_path,
+                pcm_format=(1, 2, pcm_rate or config.COSYVOICE_PCM_SAMPLE_RATE),
+                content_length=int(length) if length else None
+            )
+            return writer.feed
 
-    def generate_audio(self, text: str, output_path: str) -> bool:
         try:
             payload = {
                 "model": "cosyvoice",
                 "input": text,
                 "voice": self.http_voice, 
-                "response_format": "wav"
+                "response_format": "pcm" if pcm_rate else "wav"
             }
+            if pcm_rate:
+                payload["sample_rate"] = pcm_rate
+            if speed != 1.0:
+                payload["speed"] = speed
             data = json.dumps(payload).encode('utf-8')
-            req = urllib.request.Request(self.api_url, data=data, headers={'Content-Type': 'application/json'})
-            
-            with urllib.request.urlopen(req, timeout=300) as response:
-                if response.status == 200:
+            response = self.pool.request(
+                "POST", self.api_path, body=data,
+                headers={'Content-Type': 'application/json'},
+                deadline=config.COSYVOICE_REQUEST_DEADLINE,
+                stream_factory=start_stream if config.COSYVOICE_STREAMING and output_path else None
+            )
+            if pcm_rate and _rejects_format(response):
+                print("CosyVoice 服务不支持指定采样率的 PCM 输出，改为请求 wav")
+                self.pcm_available = False
+                return self._request_audio(text, speed, output_path)
+            if response.status == 200:
+                if writer is None:
+                    body = response.data
+                    if pcm_rate and not body.startswith(b"RIFF"):
+                        if _confirmed_pcm_rate(response.headers) != pcm_rate:
+                            # 服务端可能忽略了 sample_rate 而按自身采样率输出，无法确定这段裸 PCM 的采样率
+                            print("CosyVoice 服务未确认 PCM 采样率，改为请求 wav")
+                            self.pcm_available = False
+                            return self._request_audio(text, speed, output_path)
+                        # 非流式接收的裸 PCM 补上 wav 头，与流式写出的结果一致
+                        body = pcm_wav_header(1, 2, pcm_rate, len(body)) + body
+                    if not output_path:
+                        return body
                     with open(output_path, 'wb') as f:
-                        f.write(response.read())
-                    return True
-                else:
-                    return False
+                        f.write(body)
+                return b""
+            else:
+                print(f"CosyVoice 服务返回错误状态: {response.status}")
+                return None
         except Exception as e:
             print(f"连接 CosyVoice 服务失败: {e}")
-            return False
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def generate_audio(self, text: str, output_path: str) -> bool:
+        return self._request_audio(text, output_path=output_path) is not None
+
+    def synthesize(self, text: str, speed: float = 1.0) -> Optional[AudioClip]:
+        """响应体直接留在内存中按 wav 头部取出 PCM 采样，不经过临时文件"""
+        wav = self._request_audio(text, speed)
+        if wav is None:
+            return None
+        try:
+            return AudioClip.from_wav_bytes(wav)
+        except Exception as e:
+            print(f"CosyVoice 返回的音频无法解析: {e}")
+            return None
+
+    def _request_batch(self, texts: List[str], speed: float = 1.0) -> Optional[List[AudioClip]]:
+        """
+        一次请求合成多句：服务端返回一个拼接好的 wav，
+        并在响应头 X-Segment-Frames 中给出每句的采样帧数 (逗号分隔)，据此切分回逐句音频
+        :param speed: 整批共用的语速倍率
+        :return: 逐句的 AudioClip；批量接口不可用或响应无效时返回 None，由调用方改为逐句请求
+        """
+        if len(texts) <= 1 or not self.batch_available:
+            return None
+        try:
+            payload = {
+                "model": "cosyvoice",
+                "inputs": texts,
+                "voice": self.http_voice,
+                "response_format": "wav"
+            }
+            pcm_rate = self.output_sample_rate if self.pcm_available else None
+            if pcm_rate:
+                # 拼接结果仍为 wav (需要按帧数切分)，只要求按任务内部格式的采样率输出
+                payload["sample_rate"] = pcm_rate
+            if speed != 1.0:
+                payload["speed"] = speed
+            data = json.dumps(payload).encode('utf-8')
+            response = get_connection_pool(self.batch_url).request(
+                "POST", urlsplit(self.batch_url).path or "/", body=data,
+                headers={'Content-Type': 'application/json'},
+                deadline=config.COSYVOICE_REQUEST_DEADLINE
+            )
+            if pcm_rate and _rejects_format(response):
+                print("CosyVoice 服务不支持指定采样率输出，改为逐句请求 wav")
+                self.pcm_available = False
+                return None
+            if response.status in (404, 405, 501):
+                print("CosyVoice 服务不支持批量接口，改为逐句请求")
+                self.batch_available = False
+                return None
+            if response.status != 200:
+                print(f"CosyVoice 批量请求返回错误状态: {response.status}，改为逐句请求")
+                return None
+
+            frame_header = {k.lower(): v for k, v in response.headers.items()}.get("x-segment-frames", "")
+            frame_counts = [int(n) for n in frame_header.split(",") if n.strip()]
+            if len(frame_counts) != len(texts):
+                print("CosyVoice 批量响应缺少有效的分段信息，改为逐句请求")
+                return None
+            merged = AudioClip.from_wav_bytes(response.data)
+            clips, offset = [], 0
+            for frames in frame_counts:
+                clips.append(AudioClip(merged.samples[offset:offset + frames], merged.frame_rate))
+                offset += frames
+            return clips
+        except Exception as e:
+            print(f"CosyVoice 批量请求失败，改为逐句请求: {e}")
+            return None
+
+    def generate_batch(self, items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+        speeds = speeds or [1.0] * len(items)
+        # 与 synthesize_batch 相同：只有整批语速一致时才走批量接口
+        clips = self._request_batch([text for text, _ in items], speeds[0]) if len(set(speeds)) == 1 else None
+        if clips is None:
+            return [self._request_audio(text, speed, output_path) is not None
+                    for (text, output_path), speed in zip(items, speeds)]
+        for clip, (_, output_path) in zip(clips, items):
+            clip.write_wav(output_path)
+        return [True] * len(items)
 
-def get_tts_provider(params: dict) -> TTSProvider:
+    def synthesize_batch(self, texts: List[str], speeds: Optional[List[float]] = None) -> List[Optional[AudioClip]]:
+        speeds = speeds or [1.0] * len(texts)
+        # 批量接口只接受整批统一的语速，语速不一致的批次逐句请求
+        clips = self._request_batch(texts, speeds[0]) if len(set(speeds)) == 1 else None
+        if clips is None:
+            return [self.synthesize(text, speed) for text, speed in zip(texts, speeds)]
+        return clips
+
+class ThrottledTTSProvider(TTSProvider):
+    """
+    用一个共享的信号量限制底层引擎的并发调用数 (一次批量请求计为一次调用)。
+    信号量可以是 multiprocessing 的跨进程信号量，从而在多个并行任务之间共享同一个上限
+    """
+    def __init__(self, provider: TTSProvider, limiter):
+        self.provider = provider
+        self.limiter = limiter
+        self.thread_safe = getattr(provider, "thread_safe", True)
+        self.supports_batch = getattr(provider, "supports_batch", False)
+        self.supports_speed = getattr(provider, "supports_speed", False)
+
+    def cache_identity(self) -> dict:
+        return self.provider.cache_identity()
+
+    def set_output_sample_rate(self, sample_rate):
+        self.output_sample_rate = sample_rate
+        self.provider.set_output_sample_rate(sample_rate)
+
+    def close(self):
+        self.provider.close()
+
+    def generate_audio(self, text: str, output_path: str) -> bool:
+        with self.limiter:
+            return self.provider.generate_audio(text, output_path)
+
+    def generate_batch(self, items: List[Tuple[str, str]], speeds: Optional[List[float]] = None) -> List[bool]:
+        with self.limiter:
+            return self.provider.generate_batch(items, speeds)
+
+    def synthesize(self, text: str, speed: float = 1.0) -> Optional[AudioClip]:
+        with self.limiter:
+            return self.provider.synthesize(text, speed)
+
+    def synthesize_batch(self, texts: List[str], speeds: Optional[List[float]] = None) -> List[Optional[AudioClip]]:
+        with self.limiter:
+            return self.provider.synthesize_batch(texts, speeds)
+
+def get_tts_provider(params: dict, limiter=None, isolate_native: bool = False) -> TTSProvider:
+    """
+    :param limiter: 可选的并发上限 (threading/multiprocessing 信号量)，只约束真正发往引擎的调用，缓存命中不占名额
+    :param isolate_native: 本地引擎即使只用一个进程也放到独立的工作进程中。进程内的 Pyttsx3TTS 共用
+                           pyttsx3 的同一个引擎，只能轮流合成；同一进程中多个音色需要同时合成时 (守护进程、多版本配音) 开启
+    """
     mode = params["mode"]
     if mode == "native":
         # 获取可选的 rate，如果不存在则使用默认值
         rate = params.get("rate", config.TTS_ENGINE_CAPABILITIES["native"]["default_rate"])
-        return Pyttsx3TTS(params["gender"], rate)
+        processes = config.NATIVE_TTS_PROCESSES or os.cpu_count() or 1
+        if sys.platform != "darwin" and (processes > 1 or isolate_native):
+            provider = NativeProcessPoolTTS(params["gender"], rate, processes)
+        else:
+            provider = Pyttsx3TTS(params["gender"], rate)
     elif mode == "cosyvoice":
-        return HttpTTS(params)
+        provider = HttpTTS(params)
     else:
         raise ValueError(f"不支持的 TTS 模式: {mode}")
+
+    if limiter is not None:
+        provider = ThrottledTTSProvider(provider, limiter)
+
+    if config.TTS_CACHE_ENABLED:
+        # 延迟导入，避免 tts_cache 与本模块循环引用
+        from .tts_cache import CachedTTSProvider
+        provider = CachedTTSProvider(provider)
+    return provider
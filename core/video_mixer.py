@@ -1,46 +1,384 @@
 import os
+import time
+import shutil
+import wave
+import tempfile
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import config
+from .metrics import JobMetrics
+from .media_probe import MediaInfo, probe_media
+from .adts import AAC_FRAME_SAMPLES, append_frames, chunk_windows
+
+# 让 ffmpeg 把机器可读的进度块 (key=value，每块以 progress=continue/end 结尾) 写到 stdout
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+def parse_ffmpeg_progress(lines: Iterable) -> Iterable[Dict[str, str]]:
+    """解析 ffmpeg -progress 输出，逐块产出 {key: value}"""
+    block = {}
+    for raw in lines:
+        line = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key == "progress":
+            yield block
+            block = {}
+
+def _progress_record(block: Dict[str, str]) -> dict:
+    """把原始进度块转换为事件字段：已封装时长 (秒)、输出大小、编码速度、是否结束"""
+    record = {"done": block.get("progress") == "end"}
+    out_time_us = block.get("out_time_us") or block.get("out_time_ms")  # 旧版 ffmpeg 的 out_time_ms 实为微秒
+    if out_time_us and out_time_us.lstrip("-").isdigit():
+        record["out_seconds"] = max(0, int(out_time_us)) / 1e6
+    if block.get("total_size", "").isdigit():
+        record["total_size"] = int(block["total_size"])
+    speed = block.get("speed", "").rstrip("x")
+    try:
+        record["speed"] = float(speed)
+    except ValueError:
+        pass
+    return record
+
+_CHANNEL_LAYOUTS = {1: "mono", 2: "stereo", 6: "5.1"}
+# 分段编码时每段向前多编码的帧数，使段首帧的 MDCT 重叠窗口与上一段的真实信号衔接
+CHUNK_PREROLL_FRAMES = 2
+
+@dataclass
+class MixPlan:
+    """混流前一次性确定的方案：滤镜图、输出采样率/声道与音频编码参数，保证每次混流只跑一遍 ffmpeg"""
+    filter_complex: Optional[str]
+    maps: List[str]
+    sample_rate: int
+    channels: int
+    audio_bitrate: str
+
+    def output_args(self) -> list:
+        args = ["-filter_complex", self.filter_complex] if self.filter_complex else []
+        return args + self.maps + [
+            "-c:v", "copy",
+            "-c:a", "aac", "-b:a", self.audio_bitrate,
+            "-ar", str(self.sample_rate), "-ac", str(self.channels),
+        ]
+
+def vocal_format(info: MediaInfo) -> Tuple[int, int]:
+    """
+    任务内部配音格式 (采样率, 声道数)：与原视频音轨一致时混流只需混音，不必再重采样或改声道布局。
+    原视频无音轨、超过两个声道 (配音不应铺满环绕声道) 或未启用 config.VOCAL_MATCH_SOURCE_FORMAT 时沿用缺省格式
+    """
+    if not config.VOCAL_MATCH_SOURCE_FORMAT or not info.has_audio or not info.sample_rate:
+        return config.VOCAL_SAMPLE_RATE, config.VOCAL_CHANNELS
+    channels = info.channels or config.VOCAL_CHANNELS
+    return info.sample_rate, channels if channels <= 2 else config.VOCAL_CHANNELS
+
+def plan_mix(info: MediaInfo, vocal_rate: int, vocal_channels: int, variants: int = 1) -> MixPlan:
+    """
+    根据原视频的探测结果规划混流：
+    - 有音轨：背景音压低音量后与配音混合，配音重采样并上混到原音轨的采样率与声道布局 (格式已一致时直接混音)，
+      输出保持原音轨规格
+    - 无音轨：配音直接作为唯一音轨，不再先试 amix 失败后重跑
+    码率取 config.MIX_AUDIO_BITRATE 与原音轨码率中较高者，避免二次编码进一步劣化
+    :param variants: 配音版本数 (输入 1..N)；多于 1 个时背景音只解码、压低一次，再用 asplit 分给每条音轨
+    """
+    bitrate = config.MIX_AUDIO_BITRATE
+    if not info.has_audio:
+        maps = ["-map", "0:v"]
+        for i in range(variants):
+            maps += ["-map", f"{i + 1}:a"]
+        return MixPlan(None, maps + ["-shortest"], vocal_rate, vocal_channels, bitrate)
+
+    rate = info.sample_rate or vocal_rate
+    channels = info.channels or vocal_channels
+    layout = _CHANNEL_LAYOUTS.get(channels, f"{channels}c")
+    bg_vol = config.BACKGROUND_VOLUME_RATIO
+    # 单版本沿用 [bg]/[vo]/[aout] 标签，多版本按序号区分
+    suffixes = [""] if variants == 1 else [str(i) for i in range(variants)]
+    bg_split = "" if variants == 1 else f",asplit={variants}"
+    chains = [f"[0:a]volume={bg_vol}{bg_split}" + "".join(f"[bg{s}]" for s in suffixes)]
+    matched = (vocal_rate, vocal_channels) == (rate, channels)
+    for i, s in enumerate(suffixes):
+        vocal = f"[{i + 1}:a]"
+        if not matched:
+            chains.append(f"{vocal}aresample={rate},aformat=sample_rates={rate}:channel_layouts={layout}[vo{s}]")
+            vocal = f"[vo{s}]"
+        chains.append(f"[bg{s}]{vocal}amix=inputs=2:duration=first:dropout_transition=0[aout{s}]")
+    maps = ["-map", "0:v"]
+    for s in suffixes:
+        maps += ["-map", f"[aout{s}]"]
+    if info.audio_bitrate and info.audio_bitrate > _parse_bitrate(bitrate):
+        bitrate = str(info.audio_bitrate)
+    return MixPlan(";".join(chains), maps, rate, channels, bitrate)
+
+def span_input_args(span: Optional[Tuple[int, Optional[int]]]) -> list:
+    """
+    只读取原视频 [起点, 终点) 毫秒区间的输入选项 (放在 -i 之前，ffmpeg 直接定位而不解码前面的内容)。
+    视频流 stream copy 时从起点之前最近的关键帧开始复制，MP4 以编辑列表隐藏多出的画面，音画保持对齐
+    """
+    if span is None:
+        return []
+    start_ms, end_ms = span
+    args = ["-ss", f"{start_ms / 1000:.3f}"] if start_ms else []
+    if end_ms is not None:
+        args += ["-t", f"{(end_ms - start_ms) / 1000:.3f}"]
+    return args
+
+def _parse_bitrate(value: str) -> int:
+    value = value.lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]) * 1000)
+    if value.endswith("m"):
+        return int(float(value[:-1]) * 1000000)
+    return int(value)
+
+def _wav_format(path: str):
+    """从 WAV 文件头读取 (采样率, 声道数)，非 WAV 文件交给 ffprobe"""
+    try:
+        with wave.open(path, "rb") as wf:
+            return wf.getframerate(), wf.getnchannels()
+    except (wave.Error, EOFError):
+        info = probe_media(path)
+        return info.sample_rate or config.VOCAL_SAMPLE_RATE, info.channels or config.VOCAL_CHANNELS
+
+class VocalStream:
+    """
+    正在运行的流式混流 ffmpeg 进程：配音 PCM 通过 stdin 以原始采样写入，
+    ffmpeg 同时在解复用原视频，配音音轨全程不落盘
+    """
+    def __init__(self, process: subprocess.Popen, cmd: list, on_progress: Optional[Callable[[dict], None]] = None,
+                 metrics: Optional[JobMetrics] = None):
+        self.process = process
+        self.cmd = cmd
+        self.metrics = metrics
+        self.bytes_written = 0
+        # 后台线程持续消费 ffmpeg 的进度输出，避免 stdout 管道写满阻塞 ffmpeg
+        self._progress_thread = None
+        if process.stdout is not None:
+            self._progress_thread = threading.Thread(target=self._read_progress, args=(on_progress,), daemon=True)
+            self._progress_thread.start()
+
+    def _read_progress(self, on_progress):
+        try:
+            for block in parse_ffmpeg_progress(self.process.stdout):
+                if on_progress:
+                    on_progress(_progress_record(block))
+        except (OSError, ValueError):
+            pass  # 进程被终止后管道关闭
+
+    def write(self, samples: np.ndarray):
+        """写入一段 int16 交错采样 ([帧数, 声道数])"""
+        try:
+            self.process.stdin.write(samples.tobytes())
+            self.bytes_written += samples.nbytes
+        except BrokenPipeError:
+            # ffmpeg 已提前退出，等待并抛出其退出码
+            self.close()
+
+    def close(self):
+        """结束输入并等待 ffmpeg 封装完成，失败时抛出 CalledProcessError"""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        if self._progress_thread is not None:
+            self._progress_thread.join()
+        if self.metrics:
+            self.metrics.incr("vocal_bytes_written", self.bytes_written)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.cmd)
+
+    def abort(self):
+        """上游处理失败时终止 ffmpeg，避免留下半成品进程"""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
 
 class VideoMixer:
-    def mix(self, video_path: str, vocal_audio_path: str, output_path: str):
+    def __init__(self, metrics: Optional[JobMetrics] = None):
+        """
+        :param metrics: 可选的任务指标记录器；提供时混流进度 (ffmpeg -progress) 以 mux_progress 事件写出，
+                        结束时记录输出文件大小与混流速度
+        """
+        self.metrics = metrics
+
+    def _on_progress(self, record: dict):
+        if not self.metrics:
+            return
+        self.metrics.event("mux_progress", **record)
+        if record["done"]:
+            if "total_size" in record:
+                self.metrics.set_gauge("output_bytes", record["total_size"])
+            if "speed" in record:
+                self.metrics.set_gauge("mux_speed", record["speed"])
+
+    def _run_ffmpeg(self, cmd: list, report: bool = True):
+        """运行 ffmpeg 并逐块解析 -progress 输出，失败时抛出 CalledProcessError"""
+        process = subprocess.Popen(cmd[:1] + PROGRESS_ARGS + cmd[1:], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        with process:
+            for block in parse_ffmpeg_progress(process.stdout):
+                if report:
+                    self._on_progress(_progress_record(block))
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+
+    def has_audio_stream(self, video_path: str) -> bool:
+        """使用 ffprobe 判断原视频是否包含音轨 (探测结果按文件缓存)"""
+        return probe_media(video_path).has_audio
+
+    def plan(self, video_path: str, vocal_rate: int, vocal_channels: int) -> MixPlan:
+        return plan_mix(probe_media(video_path), vocal_rate, vocal_channels)
+
+    def vocal_format(self, video_path: str) -> Tuple[int, int]:
+        """按原视频音轨确定本次任务的配音内部格式；探测失败时沿用缺省格式 (混流阶段会再报告具体错误)"""
+        try:
+            return vocal_format(probe_media(video_path))
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return config.VOCAL_SAMPLE_RATE, config.VOCAL_CHANNELS
+
+    def chunk_count(self, video_path: str) -> int:
+        """
+        混流分段数：config.MIX_CHUNKS (缺省为 CPU 核数)；
+        视频短于 config.MIX_CHUNK_MIN_SECONDS 时分段收益抵不过额外进程开销，返回 1 (单遍混流)
+        """
+        chunks = config.MIX_CHUNKS or os.cpu_count() or 1
+        if chunks <= 1 or probe_media(video_path).duration_s < config.MIX_CHUNK_MIN_SECONDS:
+            return 1
+        return chunks
+
+    def mix(self, video_path: str, vocal_audio_path: str, output_path: str,
+            span: Optional[Tuple[int, Optional[int]]] = None):
         """
         核心混流：
-        1. 读取原视频，压低原音频音量
-        2. 读取合成的新 vocal 音频
-        3. 两者混音，并保留原视频流，输出新视频
+        1. 探测原视频 (是否带音轨、采样率、声道、码率)，确定滤镜图与编码参数
+        2. 读取原视频，压低原音频音量 (无音轨时直接以配音替换)
+        3. 与合成的新 vocal 音频混音，并保留原视频流，单遍输出新视频
+        :param span: 只截取原视频的 (起点毫秒, 终点毫秒或 None) 区间 (预览渲染)，配音音轨已从起点开始
         """
-        bg_vol = config.BACKGROUND_VOLUME_RATIO
-        
-        # 判断视频流输入是否有音频，用 ffmpeg amix 合并
+        plan = self.plan(video_path, *_wav_format(vocal_audio_path))
+        chunks = 1 if span else self.chunk_count(video_path)
+        if chunks > 1:
+            self._mix_chunked(video_path, vocal_audio_path, output_path, plan, chunks)
+            return
         cmd = [
-            "ffmpeg", "-y", 
-            "-i", video_path,
+            "ffmpeg", "-y",
+            *span_input_args(span), "-i", video_path,
             "-i", vocal_audio_path,
-            "-filter_complex", 
-            f"[0:a]volume={bg_vol}[bg];[bg][1:a]amix=inputs=2:duration=first:dropout_transition=0[aout]",
-            "-map", "0:v",
-            "-map", "[aout]",
-            "-c:v", "copy",
-            "-c:a", "aac",
+            *plan.output_args(),
             output_path
         ]
-        
+        # 屏蔽详细输出 (只读取进度)，若出错则抛出异常
+        self._run_ffmpeg(cmd)
+
+    def mix_variants(self, video_path: str, tracks: List[dict], output_path: str):
+        """
+        多版本混流：一次 ffmpeg 调用输出带多条配音音轨的单个视频。
+        原视频只解复用一次，背景音只解码、压低一次后分给每条音轨，视频流 stream copy。
+        :param tracks: [{"path": 配音 wav, "title": 音轨名称, "language": ISO 639-2 语言代码}, ...]，
+                       第一条为默认音轨
+        """
+        plan = plan_mix(probe_media(video_path), *_wav_format(tracks[0]["path"]), variants=len(tracks))
+        cmd = ["ffmpeg", "-y", "-i", video_path]
+        for track in tracks:
+            cmd += ["-i", track["path"]]
+        cmd += plan.output_args()
+        for i, track in enumerate(tracks):
+            cmd += [f"-metadata:s:a:{i}", f"title={track['title']}"]
+            if track.get("language"):
+                cmd += [f"-metadata:s:a:{i}", f"language={track['language']}"]
+            cmd += [f"-disposition:a:{i}", "default" if i == 0 else "0"]
+        cmd.append(output_path)
+        self._run_ffmpeg(cmd)
+
+    def _mix_chunked(self, video_path: str, vocal_audio_path: str, output_path: str, plan: MixPlan, chunks: int):
+        """
+        分段并行混流 (长视频)：
+        1. 把时间轴按 AAC 帧长对齐切成 N 个窗口，每个窗口由独立的 ffmpeg 进程解码、混音并编码为 ADTS，
+           每段向前多编码 CHUNK_PREROLL_FRAMES 帧作为预热
+        2. 丢弃每段的编码器延迟帧、预热帧与末尾冲刷帧后按顺序拼接成完整音轨，段与段之间按帧无缝衔接
+        3. 视频流与拼接好的音轨都以 stream copy 封装进最终容器，不再重新编码
+        """
+        rate = plan.sample_rate
+        total_samples = int(round(probe_media(video_path).duration_s * rate))
+        windows = chunk_windows(total_samples, chunks)
+        work_dir = tempfile.mkdtemp(prefix="mix_", dir=os.path.dirname(os.path.abspath(vocal_audio_path)))
         try:
-            # 屏蔽详细输出，若出错则抛出异常
-            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-        except subprocess.CalledProcessError:
-            # 兼容原视频完全没有音轨的情况，会导致 [0:a] 查找失败
-            # 此时直接替换原视频默认音轨为新配音音轨
-            cmd_fallback = [
+            jobs = []
+            for i, (start, end) in enumerate(windows):
+                preroll = min(start, CHUNK_PREROLL_FRAMES * AAC_FRAME_SAMPLES)
+                chunk_path = os.path.join(work_dir, f"chunk_{i}.aac")
+                cmd = self._chunk_cmd(video_path, vocal_audio_path, plan, start - preroll, end, chunk_path)
+                jobs.append((cmd, chunk_path, preroll))
+
+            with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+                list(pool.map(self._run_chunk, [cmd for cmd, _, _ in jobs]))
+
+            audio_path = os.path.join(work_dir, "audio.aac")
+            with open(audio_path, "wb") as out:
+                for i, ((start, end), (_, chunk_path, preroll)) in enumerate(zip(windows, jobs)):
+                    # 首帧为编码器延迟 (priming) 帧，其后为预热帧；最后一段保留末尾的冲刷帧以完整收尾
+                    skip = 1 + preroll // AAC_FRAME_SAMPLES
+                    keep = None if i == len(windows) - 1 else (end - start) // AAC_FRAME_SAMPLES
+                    append_frames(out, chunk_path, skip, keep)
+
+            cmd = [
                 "ffmpeg", "-y",
                 "-i", video_path,
-                "-i", vocal_audio_path,
-                "-map", "0:v",
-                "-map", "1:a",
-                "-c:v", "copy",
-                "-c:a", "aac",
-                "-shortest",
+                "-i", audio_path,
+                "-map", "0:v", "-map", "1:a",
+                "-c", "copy", "-bsf:a", "aac_adtstoasc",
                 output_path
             ]
-            subprocess.run(cmd_fallback, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            self._run_ffmpeg(cmd)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _chunk_cmd(video_path: str, vocal_audio_path: str, plan: MixPlan, first: int, end: int, chunk_path: str) -> list:
+        """编码 [first, end) 采样区间的混音音轨；输入端精确定位，输出端按采样数裁剪"""
+        rate, channels = plan.sample_rate, plan.channels
+        graph = plan.filter_complex
+        if graph is None:
+            # 原视频无音轨：配音补静音到窗口长度，保证每段帧数确定
+            layout = _CHANNEL_LAYOUTS.get(channels, f"{channels}c")
+            graph = f"[1:a]aresample={rate},aformat=sample_rates={rate}:channel_layouts={layout},apad[aout]"
+        graph += f";[aout]atrim=end_sample={end - first}[cut]"
+        seek = ["-ss", f"{first / rate:.6f}"] if first else []
+        return [
+            "ffmpeg", "-y",
+            *seek, "-i", video_path,
+            *seek, "-i", vocal_audio_path,
+            "-filter_complex", graph,
+            "-map", "[cut]",
+            "-c:a", "aac", "-b:a", plan.audio_bitrate, "-ar", str(rate), "-ac", str(channels),
+            "-f", "adts", chunk_path
+        ]
+
+    def _run_chunk(self, cmd: list):
+        start = time.perf_counter()
+        self._run_ffmpeg(cmd, report=False)
+        if self.metrics:
+            self.metrics.observe("mux_chunk_seconds", time.perf_counter() - start)
+
+    def open_stream(self, video_path: str, output_path: str, sample_rate: int, channels: int,
+                    span: Optional[Tuple[int, Optional[int]]] = None) -> VocalStream:
+        """
+        启动流式混流：ffmpeg 立即开始读取原视频，配音音轨以 s16le 原始 PCM 从 stdin 输入。
+        混流方案与 mix 相同，由事先的探测结果确定。
+        :param span: 同 mix，只截取原视频的一段
+        """
+        plan = self.plan(video_path, sample_rate, channels)
+        cmd = [
+            "ffmpeg", "-y", *PROGRESS_ARGS,
+            *span_input_args(span), "-i", video_path,
+            "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels),
+            "-i", "pipe:0",
+        ]
+        cmd += [*plan.output_args(), output_path]
+
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return VocalStream(process, cmd, on_progress=self._on_progress, metrics=self.metrics)
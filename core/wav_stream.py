@@ -0,0 +1,117 @@
+import os
+import struct
+from typing import Optional, Tuple
+
+# 流式输出的 wav 在总长度未知时，头部的长度字段通常写 0 或 0xFFFFFFFF
+_UNKNOWN_SIZES = (0, 0xFFFFFFFF)
+# 超过该长度仍未找到 data 块则放弃解析头部，按原样透传
+_MAX_HEADER_BYTES = 64 * 1024
+
+def pcm_wav_header(channels: int, sample_width: int, frame_rate: int, data_size: int = 0) -> bytes:
+    """构造 44 字节的标准 PCM wav 头"""
+    byte_rate = frame_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, frame_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_size
+    )
+
+class WavStreamWriter:
+    """
+    边接收边落盘的音频写入器，用于消费分块 (chunked) 返回的 TTS 响应
+    - 响应为 wav：解析到 data 块头部后，若长度字段有效即可立即得知总时长
+    - 响应为裸 PCM：按 pcm_format 补写 wav 头，总长度可由 Content-Length 推算
+    - 长度字段为占位值时，在 close() 时按实际写入的字节数回填
+    总时长 (毫秒) 一旦可知即记录在 duration_ms 中
+    """
+    def __init__(self, output, pcm_format: Tuple[int, int, int] = (1, 2, 22050),
+                 content_length: Optional[int] = None):
+        """
+        :param output: 输出路径，或可写可 seek 的二进制文件对象 (如 io.BytesIO，调用方负责关闭)
+        :param pcm_format: 裸 PCM 响应的 (声道数, 位宽字节数, 采样率)
+        :param content_length: 响应头中的 Content-Length (分块传输时为 None)
+        """
+        self.pcm_format = pcm_format
+        self.content_length = content_length
+        self.duration_ms = None
+        self.byte_rate = None
+        self.data_offset = None
+        self.bytes_received = 0
+        self._head = bytearray()
+        self._header_done = False
+        self._patch_sizes = False
+        self._owns_file = isinstance(output, (str, os.PathLike))
+        self._file = open(output, "wb") if self._owns_file else output
+
+    def feed(self, chunk: bytes):
+        self.bytes_received += len(chunk)
+        if self._header_done:
+            self._file.write(chunk)
+            return
+        self._head += chunk
+        self._parse_header()
+        if self._header_done:
+            self._file.write(bytes(self._head))
+            self._head = None
+
+    def _set_duration(self, data_bytes: int):
+        if self.duration_ms is None and self.byte_rate:
+            self.duration_ms = int(data_bytes * 1000 / self.byte_rate)
+
+    def _parse_header(self):
+        head = self._head
+        if len(head) < 12:
+            return
+        if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            # 裸 PCM：先写入一个长度待回填的 wav 头
+            channels, sample_width, frame_rate = self.pcm_format
+            self._file.write(pcm_wav_header(channels, sample_width, frame_rate))
+            self.byte_rate = channels * sample_width * frame_rate
+            self.data_offset = 44
+            self._header_done = True
+            self._patch_sizes = True
+            if self.content_length is not None:
+                self._set_duration(self.content_length)
+            return
+
+        pos = 12
+        while pos + 8 <= len(head):
+            chunk_id, size = struct.unpack_from("<4sI", head, pos)
+            if chunk_id == b"fmt ":
+                if pos + 8 + 16 > len(head):
+                    return
+                (byte_rate,) = struct.unpack_from("<I", head, pos + 16)
+                self.byte_rate = byte_rate or None
+            elif chunk_id == b"data":
+                self.data_offset = pos + 8
+                self._header_done = True
+                if size not in _UNKNOWN_SIZES:
+                    self._set_duration(size)
+                else:
+                    self._patch_sizes = True
+                    if self.content_length is not None:
+                        self._set_duration(self.content_length - self.data_offset)
+                return
+            pos += 8 + size + (size & 1)
+
+        if len(head) > _MAX_HEADER_BYTES:
+            self._header_done = True
+
+    def close(self):
+        """写入剩余数据，并在需要时回填 RIFF/data 长度字段"""
+        if not self._header_done and self._head:
+            self._file.write(bytes(self._head))
+            self._head = None
+        if self._patch_sizes:
+            end = self._file.tell()
+            data_start = self.data_offset
+            self._file.seek(4)
+            self._file.write(struct.pack("<I", end - 8))
+            self._file.seek(data_start - 4)
+            self._file.write(struct.pack("<I", end - data_start))
+            self._set_duration(end - data_start)
+        elif self.data_offset is not None:
+            self._set_duration(self._file.tell() - self.data_offset)
+        if self._owns_file:
+            self._file.close()
@@ -1,21 +1,19 @@
 import os
-import shutil
 import threading
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 
 import config
-from core.subtitle_parser import SubtitleParser
-from core.tts_provider import get_tts_provider
-from core.audio_processor import AudioProcessor
-from core.video_mixer import VideoMixer
+from core.pipeline import run_dubbing_job, preview_output_path
+from core.presynth import Presynthesizer
+from core.subtitle_parser import parse_timecode
 
 
 class LarkDubbingApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Lark 离线视频配音引擎")
-        self.root.geometry("500x350")
+        self.root.geometry("500x390")
         self.root.resizable(False, False)
         
         # 定义存储变量
@@ -28,9 +26,33 @@ class LarkDubbingApp:
         self.style_var = tk.StringVar(value="broadcaster")
         self.language_var = tk.StringVar(value="中文")
         self.rate_var = tk.IntVar(value=180) # 针对 Native 的语速
+
+        # 预览渲染: 起止时间留空表示完整渲染
+        self.start_var = tk.StringVar()
+        self.end_var = tk.StringVar()
+        self.draft_var = tk.BooleanVar(value=False)
+
+        # 后台线程的进度汇报先记在这里，由主线程按固定间隔合并刷新，避免快速渲染时淹没 Tk 事件队列
+        self._progress_lock = threading.Lock()
+        self._pending_status = None
+        self._flush_scheduled = False
+        self._running = False
+
+        # 选中字幕后即按当前参数在后台预合成，参数停止变动一段时间后才重新开始
+        self.presynth = Presynthesizer(progress_callback=self.presynth_progress)
+        self._presynth_after = None
+        for var in (self.srt_path_var, self.tts_mode_var, self.gender_var, self.style_var,
+                    self.language_var, self.rate_var, self.draft_var):
+            var.trace_add("write", lambda *args: self.schedule_presynth())
         
         self.create_widgets()
         self.refresh_params_ui() # 初始化参数显示
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # 关闭预合成引擎 (本地引擎的工作进程)；渲染仍在进行时引擎正被使用，随进程退出即可
+        self.presynth.stop(keep_provider=self._running)
+        self.root.destroy()
 
     def create_widgets(self):
         pad_options = {'padx': 10, 'pady': 5}
@@ -63,7 +85,16 @@ class LarkDubbingApp:
         self.param_frame.pack(fill=tk.X, **pad_options)
         # 具体内容在 refresh_params_ui 中动态生成
 
-        # 5. 进度条与状态显示
+        # 5. 预览范围 (只渲染一段，便于试听某句附近的效果)
+        frame_preview = tk.Frame(self.root)
+        frame_preview.pack(fill=tk.X, **pad_options)
+        tk.Label(frame_preview, text="预览范围:").pack(side=tk.LEFT)
+        tk.Entry(frame_preview, textvariable=self.start_var, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Label(frame_preview, text="至").pack(side=tk.LEFT)
+        tk.Entry(frame_preview, textvariable=self.end_var, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Checkbutton(frame_preview, text="草稿 (本地引擎快速试听)", variable=self.draft_var).pack(side=tk.LEFT)
+
+        # 6. 进度条与状态显示
         frame_progress = tk.Frame(self.root)
         frame_progress.pack(fill=tk.X, pady=10, padx=10)
         self.progress_bar = ttk.Progressbar(frame_progress, orient=tk.HORIZONTAL, mode='determinate')
@@ -71,7 +102,7 @@ class LarkDubbingApp:
         self.status_label = tk.Label(frame_progress, text="准备就绪", fg="gray")
         self.status_label.pack(anchor=tk.W, pady=5)
 
-        # 6. 底部操作按钮
+        # 7. 底部操作按钮
         frame_actions = tk.Frame(self.root)
         frame_actions.pack(pady=10)
         self.btn_run = tk.Button(frame_actions, text="🚀 启动自动混流渲染", bg="#4CAF50", fg="white", width=20, height=2, command=self.start_processing)
@@ -124,19 +155,39 @@ class LarkDubbingApp:
             self.progress_bar['value'] = progress
         self.root.update_idletasks()
 
+    def post_status(self, message, progress=None):
+        """
+        供后台线程调用：只记录最新的提示与进度，至多每 config.GUI_PROGRESS_INTERVAL_MS 毫秒
+        在主线程刷新一次 (状态栏只显示最新一条，中间的汇报无需逐条绘制)
+        """
+        with self._progress_lock:
+            _, last_progress = self._pending_status or (None, None)
+            self._pending_status = (message, last_progress if progress is None else progress)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        # 使用 after 保证 UI 线程安全更新
+        self.root.after(config.GUI_PROGRESS_INTERVAL_MS, self._flush_status)
+
+    def _flush_status(self):
+        with self._progress_lock:
+            pending, self._pending_status = self._pending_status, None
+            self._flush_scheduled = False
+        if pending:
+            self.update_status(*pending)
+
     def progress_callback(self, current, total):
         """传递给 AudioProcessor 的回调，换算成 0 - 100 进度"""
         if total > 0:
             percentage = int((current / total) * 100)
-            # 使用 after 保证 UI 线程安全更新
-            self.root.after(0, self.update_status, f"音频时间轴对齐处理中... ({current}/{total} 句)", percentage)
+            self.post_status(f"音频时间轴对齐处理中... ({current}/{total} 句)", percentage)
 
-    def start_processing(self):
-        video_path = self.video_path_var.get()
-        srt_path = self.srt_path_var.get()
-        
-        # 收集所有当前参数
-        params = {
+    def presynth_progress(self, current, total):
+        if not self._running:
+            self.post_status(f"准备就绪 (后台已预合成 {current}/{total} 句)")
+
+    def _current_params(self):
+        return {
             "mode": self.tts_mode_var.get(),
             "gender": self.gender_var.get(),
             "style": self.style_var.get(),
@@ -144,75 +195,91 @@ class LarkDubbingApp:
             "rate": self.rate_var.get()
         }
 
+    def schedule_presynth(self):
+        if self._presynth_after is not None:
+            self.root.after_cancel(self._presynth_after)
+        self._presynth_after = self.root.after(config.PRESYNTH_DEBOUNCE_MS, self._start_presynth)
+
+    def _start_presynth(self):
+        self._presynth_after = None
+        srt_path = self.srt_path_var.get()
+        if self._running or not config.PRESYNTH_ENABLED or not srt_path or not os.path.isfile(srt_path):
+            return
+        try:
+            self.presynth.start(srt_path, self._current_params(), draft=self.draft_var.get())
+        except (KeyError, ValueError, tk.TclError):
+            pass  # 参数尚未填写完整 (如语速输入中途)，等下一次改动再开始
+
+    def start_processing(self):
+        video_path = self.video_path_var.get()
+        srt_path = self.srt_path_var.get()
+        
+        # 收集所有当前参数
+        params = self._current_params()
+
         if not video_path or not os.path.exists(video_path):
             messagebox.showerror("错误", "请选择有效的视频文件！")
             return
         if not srt_path or not os.path.exists(srt_path):
             messagebox.showerror("错误", "请选择有效的字幕文件！")
             return
+        try:
+            preview = {
+                "start_ms": parse_timecode(self.start_var.get()) if self.start_var.get().strip() else None,
+                "end_ms": parse_timecode(self.end_var.get()) if self.end_var.get().strip() else None,
+                "draft": self.draft_var.get(),
+            }
+        except ValueError as e:
+            messagebox.showerror("错误", f"预览范围格式有误: {e}")
+            return
 
         # 禁用按钮防止重复点击
         self.btn_run.config(state=tk.DISABLED)
         self.progress_bar['value'] = 0
+        self._running = True
         
         # 挂载后台工作线程
-        threading.Thread(target=self._worker_thread, args=(video_path, srt_path, params), daemon=True).start()
+        threading.Thread(target=self._worker_thread, args=(video_path, srt_path, params, preview), daemon=True).start()
 
-    def _worker_thread(self, video_path, srt_path, params):
+    def _worker_thread(self, video_path, srt_path, params, preview):
         try:
-            mode = params["mode"]
-            # Step 1
-            self.root.after(0, self.update_status, "1. 正在解析物理时间轴...")
-            parser = SubtitleParser(srt_path)
-            subtitles = parser.parse()
-            if not subtitles:
-                raise ValueError("未提取到任何有效字幕！请检查文件格式。")
-
-            # Step 2
-            self.root.after(0, self.update_status, f"2. 正在初始化发音引擎({mode})...")
-            tts = get_tts_provider(params)
-
-            
-            if os.path.exists(config.TEMP_DIR):
-                shutil.rmtree(config.TEMP_DIR)
-            os.makedirs(config.TEMP_DIR, exist_ok=True)
-
-            # Step 3 (耗时最长，接入回调)
-            audio_processor = AudioProcessor(tts)
-            merged_wav = audio_processor.process_subtitles(
-                subtitles, 
-                temp_dir=config.TEMP_DIR, 
-                max_speed=config.MAX_SPEED_UP_RATIO,
-                progress_callback=self.progress_callback
-            )
-
-            # Step 4
-            self.root.after(0, self.update_status, "4. 正在执行底层音视频重混流装载...")
-            video_mixer = VideoMixer()
-            
             # 使用源文件名构造输出名
             base_dir = os.path.dirname(video_path)
             original_name = os.path.basename(video_path)
             name_part, ext_part = os.path.splitext(original_name)
-            output_path = os.path.join(base_dir, f"{name_part}_dubbed_{gender}_{style}.mp4")
-            
-            video_mixer.mix(video_path, merged_wav, output_path)
+            output_path = os.path.join(base_dir, f"{name_part}_dubbed_{params['gender']}_{params['style']}.mp4")
+            if preview["start_ms"] is not None or preview["end_ms"] is not None or preview["draft"]:
+                output_path = preview_output_path(output_path)
+
+            # 停止预合成 (等待手头的一组合成完)，复用已解析的字幕与已初始化的引擎，已合成的句子直接命中缓存
+            self.presynth.stop(keep_provider=True)
+            run_dubbing_job(
+                video_path,
+                srt_path,
+                output_path,
+                params,
+                temp_dir=config.TEMP_DIR,
+                tts=self.presynth.provider(params, preview["draft"]),
+                subtitles=self.presynth.subtitles(srt_path),
+                duration_model=self.presynth.duration_model(srt_path, params, preview["draft"]),
+                status_callback=self.post_status,
+                progress_callback=self.progress_callback,
+                **preview
+            )
 
-            self.root.after(0, self.update_status, "🎉 全部任务完成！", 100)
+            # 状态提示同样经合并刷新，保证不会被尚未刷新的旧进度覆盖
+            self.post_status("🎉 全部任务完成！", 100)
             self.root.after(0, lambda: messagebox.showinfo("成功", f"混合视频导出成功！\n文件保存在:\n{output_path}"))
 
         except Exception as e:
-            self.root.after(0, self.update_status, f"❌ 任务失败: {str(e)}", 0)
+            self.post_status(f"❌ 任务失败: {str(e)}", 0)
             self.root.after(0, lambda: messagebox.showerror("发生错误", str(e)))
             
         finally:
-            self.root.after(0, self.update_status, "正在清理临时缓存区...")
-            if os.path.exists(config.TEMP_DIR):
-                shutil.rmtree(config.TEMP_DIR)
             # 恢复按钮
+            self._running = False
             self.root.after(0, lambda: self.btn_run.config(state=tk.NORMAL))
-            self.root.after(0, self.update_status, "准备就绪")
-
+            self.post_status("准备就绪")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,62 +1,153 @@
 import os
-import shutil
+import sys
+import json
 import argparse
 import config
-from core.subtitle_parser import SubtitleParser
-from core.tts_provider import Pyttsx3TTS, HttpTTS
-from core.audio_processor import AudioProcessor
-from core.video_mixer import VideoMixer
+from core.subtitle_parser import parse_timecode
+
+def _add_engine_args(parser: argparse.ArgumentParser):
+    native_cap = config.TTS_ENGINE_CAPABILITIES["native"]
+    cosy_cap = config.TTS_ENGINE_CAPABILITIES["cosyvoice"]
+    parser.add_argument("--tts", "-t", choices=["local", "http"], default="local", help="TTS引擎选择 (local: pyttsx3, http: 离线大模型接口)")
+    parser.add_argument("--gender", "-g", choices=cosy_cap["genders"], default="male", help="选择性别")
+    parser.add_argument("--style", "-style", choices=cosy_cap["styles"], default="broadcaster", help="选择朗读风格 (仅 http)")
+    parser.add_argument("--language", "-l", choices=cosy_cap["languages"], default="中文", help="选择语言 (仅 http)")
+    parser.add_argument("--rate", "-r", type=int, default=native_cap["default_rate"], help="语速 (仅 local)")
+
+def _engine_params(args) -> dict:
+    return {
+        "mode": "native" if args.tts == "local" else "cosyvoice",
+        "gender": args.gender,
+        "style": args.style,
+        "language": args.language,
+        "rate": args.rate
+    }
+
+def batch_main(argv):
+    """批量模式: python main.py batch <目录或清单.json> [选项]"""
+    from core.batch import discover_jobs, run_batch
+
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Lark 批量配音: 处理目录或清单中的全部 视频/字幕 对")
+    parser.add_argument("source", help="包含同名 视频 + .srt 的目录，或 JSON 清单 ([{\"video\", \"srt\", \"output\"}])")
+    parser.add_argument("--output-dir", "-o", default=None, help="输出目录 (缺省与视频同目录)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="同时运行的任务数 (缺省为 CPU 核数)")
+    parser.add_argument("--tts-concurrency", type=int, default=None, help=f"所有任务共享的 TTS 并发上限 (缺省 {config.BATCH_TTS_CONCURRENCY})")
+    parser.add_argument("--tmpfs", action="store_true", help=f"任务工作区放在内存文件系统 ({config.BATCH_TMPFS_DIR}) 上")
+    parser.add_argument("--summary", default=None, help="将汇总统计写入该 JSON 文件")
+    _add_engine_args(parser)
+    args = parser.parse_args(argv)
+
+    jobs = discover_jobs(args.source, args.output_dir)
+    if not jobs:
+        print("❌ 没有找到可处理的 视频/字幕 对")
+        return
+    print(f"共发现 {len(jobs)} 个任务，开始批量处理...")
+
+    def on_result(done, total, result):
+        mark = "✅" if result.ok else f"❌ {result.error}"
+        print(f"[{done}/{total}] {mark} {result.video_path} ({result.seconds:.1f}s)")
+
+    summary = run_batch(jobs, _engine_params(args), max_jobs=args.jobs,
+                        tts_concurrency=args.tts_concurrency, use_tmpfs=args.tmpfs, on_result=on_result)
+
+    print(f"\n批量任务结束: 成功 {summary['succeeded']} / 失败 {summary['failed']}，总耗时 {summary['wall_seconds']:.1f}s")
+    print(f"吞吐: {summary['jobs_per_minute']:.2f} 个视频/分钟, {summary['lines_per_second']:.2f} 句/秒, "
+          f"配音时长 {summary['media_seconds']:.1f}s ({summary['realtime_factor']:.2f}x 实时)")
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+def daemon_main(argv):
+    """常驻服务模式: python main.py daemon [选项]"""
+    from core.daemon import serve
+
+    parser = argparse.ArgumentParser(prog="main.py daemon", description="Lark 常驻渲染服务: 保持 TTS 引擎常驻，接收本机提交的配音任务")
+    parser.add_argument("--host", default=config.DAEMON_HOST, help="监听地址 (仅建议本机地址)")
+    parser.add_argument("--port", type=int, default=config.DAEMON_PORT, help="监听端口")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help=f"同时运行的任务数 (缺省 {config.DAEMON_MAX_JOBS})")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.jobs)
+
+def _daemon_request(args, params: dict) -> dict:
+    """命令行参数转换为服务端任务请求 (路径转为绝对路径，服务进程的工作目录可能不同)"""
+    request = {
+        "video": os.path.abspath(args.video),
+        "srt": os.path.abspath(args.srt),
+        "output": os.path.abspath(args.output),
+        "params": params,
+        "fresh": args.fresh,
+        "draft": args.draft,
+    }
+    if args.no_stream:
+        request["stream_vocal"] = False
+    if args.start is not None:
+        request["start_ms"] = args.start
+    if args.end is not None:
+        request["end_ms"] = args.end
+    return request
 
 def main():
-    parser = argparse.ArgumentParser(description="Lark 视频配音工具")
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        return batch_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "daemon":
+        return daemon_main(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description="Lark 视频配音工具 (批量处理请使用: python main.py batch <目录>，常驻服务: python main.py daemon)")
     parser.add_argument("--video", "-v", required=True, help="输入的原视频路径 (.mp4)")
     parser.add_argument("--srt", "-s", required=True, help="输入的字幕路径 (.srt)")
     parser.add_argument("--output", "-o", default="output.mp4", help="输出的新视频路径")
-    parser.add_argument("--tts", "-t", choices=["local", "http"], default="local", help="TTS引擎选择 (local: pyttsx3, http: 离线大模型接口)")
-    parser.add_argument("--gender", "-g", choices=config.GENDERS, default="male", help="选择性别")
-    parser.add_argument("--style", "-style", choices=config.STYLES, default="broadcaster", help="选择朗读风格")
+    _add_engine_args(parser)
+    parser.add_argument("--no-stream", action="store_true", help="先导出 merged_vocal.wav 再混流，而不是直接管道输入 ffmpeg")
+    parser.add_argument("--fresh", action="store_true", help="忽略输出文件旁已有的渲染清单，完整重新渲染")
+    parser.add_argument("--variants", default=None,
+                        help="多版本输出: JSON 文件，内容为参数列表 (如 [{\"gender\": \"male\"}, {\"gender\": \"female\", \"label\": \"女声\"}])，"
+                             "未给出的参数沿用命令行选项；输出一个每个版本一条音轨的视频")
+    parser.add_argument("--start", type=parse_timecode, default=None, help="预览渲染的起点 (秒数或 HH:MM:SS.mmm)，只合成并混流与区间重叠的字幕")
+    parser.add_argument("--end", type=parse_timecode, default=None, help="预览渲染的终点 (秒数或 HH:MM:SS.mmm)，缺省直到视频结尾")
+    parser.add_argument("--draft", action="store_true", help="草稿模式: 用本地引擎快速试听，语速规划与最终渲染一致")
+    parser.add_argument("--no-daemon", action="store_true", help="即使常驻渲染服务在运行，也在当前进程中完成渲染")
     args = parser.parse_args()
+    if args.variants and (args.start is not None or args.end is not None or args.draft):
+        parser.error("--variants 不能与 --start/--end/--draft 同时使用")
 
-    print(f"1. 正在解析字幕: {args.srt}")
-    parser_module = SubtitleParser(args.srt)
-    subtitles = parser_module.parse()
-    if not subtitles:
-        print("未提取到任何有效字幕。")
-        return
-
-    print(f"2. 初始化 TTS 引擎 (性别: {args.gender}, 风格: {args.style})...")
-    if args.tts == "local":
-        tts = Pyttsx3TTS(rate=150, gender=args.gender, style=args.style)
-    else:
-        tts = HttpTTS(gender=args.gender, style=args.style)
-
-    if os.path.exists(config.TEMP_DIR):
-        shutil.rmtree(config.TEMP_DIR)
-    os.makedirs(config.TEMP_DIR, exist_ok=True)
+    params = _engine_params(args)
+    if args.start is not None or args.end is not None or args.draft:
+        # 预览单独输出，不覆盖同一 -o 下的正式成片 (同 core.pipeline.preview_output_path，此处不导入流水线)
+        name, ext = os.path.splitext(args.output)
+        args.output = f"{name}_preview{ext or '.mp4'}"
 
-    print("3. 音频合成与时间轴对齐处理 (耗时操作)...")
-    audio_processor = AudioProcessor(tts)
     try:
-        merged_wav = audio_processor.process_subtitles(
-            subtitles, 
-            temp_dir=config.TEMP_DIR, 
-            max_speed=config.MAX_SPEED_UP_RATIO
-        )
-    except Exception as e:
-        print(f"音频处理失败: {e}")
-        return
+        if not args.variants and not args.no_daemon:
+            from core.daemon_client import DaemonClient
+            client = DaemonClient()
+            if client.available():
+                print(f"检测到常驻渲染服务 ({client.host}:{client.port})，任务已提交...")
+                client.run(_daemon_request(args, params), status_callback=print)
+                print(f"\n🎉 任务全部完成！最终配音视频已保存至: {args.output}")
+                return
 
-    print("4. 视频音频混流封装...")
-    video_mixer = VideoMixer()
-    try:
-        video_mixer.mix(args.video, merged_wav, args.output)
+        from core.pipeline import run_dubbing_job, run_variants_job
+        if args.variants:
+            with open(args.variants, "r", encoding="utf-8") as f:
+                variants = [{**params, **variant} for variant in json.load(f)]
+            run_variants_job(args.video, args.srt, args.output, variants, status_callback=print)
+            print(f"\n🎉 任务全部完成！{len(variants)} 条配音音轨已保存至: {args.output}")
+            return
+        run_dubbing_job(
+            args.video,
+            args.srt,
+            args.output,
+            params,
+            status_callback=print,
+            stream_vocal=False if args.no_stream else None,
+            fresh=args.fresh,
+            start_ms=args.start,
+            end_ms=args.end,
+            draft=args.draft
+        )
         print(f"\n🎉 任务全部完成！最终配音视频已保存至: {args.output}")
     except Exception as e:
-        print(f"\n❌ 混流拼接失败: {e}")
-    finally:
-        print("5. 清理临时缓存文件...")
-        if os.path.exists(config.TEMP_DIR):
-            shutil.rmtree(config.TEMP_DIR)
+        print(f"\n❌ 任务失败: {e}")
 
 if __name__ == "__main__":
     main()
@@ -1,60 +1,325 @@
+import os
+import shutil
+import tempfile
 import unittest
+from concurrent.futures import Future
 from unittest.mock import patch, MagicMock
+import numpy as np
+from pydub import AudioSegment
+from pydub.generators import Sine
 from core.audio_processor import AudioProcessor
+from core.audio_clip import AudioClip
+from core.metrics import JobMetrics
+from core.duration_model import DurationPredictor
+from benchmarks.synthetic import FakeTTSProvider
 from core.subtitle_parser import SubtitleItem
+from core.timeline import TimelineBuffer
+
+class _InlineExecutor:
+    """在提交时同步执行任务的线程池替身"""
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def _tone(duration_ms, frame_rate=22050):
+    return Sine(440, sample_rate=frame_rate).to_audio_segment(duration=duration_ms).set_channels(1)
+
+def _clip(duration_ms, frame_rate=22050):
+    return AudioClip.from_segment(_tone(duration_ms, frame_rate))
+
+def _padded_clip(silence_ms, speech_ms, frame_rate=22050):
+    """首尾各带 silence_ms 静音的语音片段"""
+    silence = np.zeros((silence_ms * frame_rate // 1000, 1), dtype=np.int16)
+    return AudioClip(np.concatenate([silence, _clip(speech_ms, frame_rate).samples, silence]), frame_rate)
+
+def _read_samples(wav_path):
+    audio = AudioSegment.from_wav(wav_path)
+    return audio, np.frombuffer(audio.raw_data, dtype=np.int16)
 
 class TestAudioProcessor(unittest.TestCase):
     def setUp(self):
         # Mock internal TTS logic
         self.mock_tts = MagicMock()
-        self.mock_tts.generate_audio.return_value = True
+        self.mock_tts.synthesize.return_value = _clip(1000)
+        self.mock_tts.supports_batch = False
         self.processor = AudioProcessor(self.mock_tts)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
     
-    @patch('core.audio_processor.AudioSegment')
-    @patch('core.audio_processor.os.path.exists', return_value=True)
-    def test_process_padding_when_audio_is_short(self, mock_exists, mock_audio_segment):
-        # Mock the segment duration to be shorter than Subtitle duration
-        mock_segment = MagicMock()
-        mock_segment.__len__.return_value = 1000  # 1 second audio generated by TTS
-        
-        mock_audio_segment.from_wav.return_value = mock_segment
-        mock_audio_segment.silent.return_value = mock_segment
-        
-        # Subtitle wants 2000 ms duration
+    def test_process_padding_when_audio_is_short(self):
+        # 1 second audio generated by TTS, subtitle wants 2000 ms duration
         subtitles = [
             SubtitleItem(index=1, start_time_ms=0, end_time_ms=2000, duration_ms=2000, text="Test padding")
         ]
         
-        self.processor.process_subtitles(subtitles, temp_dir="/tmp", max_speed=1.5)
+        merged = self.processor.process_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5)
         
-        # It should calculate diff: 2000 target - 1000 generated = 1000 diff padded silent track
-        mock_audio_segment.silent.assert_any_call(duration=1000)
+        audio, samples = _read_samples(merged)
+        self.assertEqual(len(audio), 2000)
+        # 前 1 秒为语音，后 1 秒为补齐的静音
+        self.assertTrue(np.any(samples[:22050] != 0))
+        self.assertFalse(np.any(samples[22050:]))
 
-    @patch('core.audio_processor.AudioSegment')
-    @patch('core.audio_processor.os.path.exists', return_value=True)
     @patch('core.audio_processor.subprocess.run')
-    def test_process_atempo_when_audio_is_long(self, mock_run, mock_exists, mock_audio_segment):
-        # Mock the segment duration to be longer than Subtitle duration
-        mock_segment = MagicMock()
-        mock_segment.__len__.return_value = 3000  # 3 seconds audio generated by TTS
-        mock_segment.__add__.return_value = mock_segment  # For concatenation compatibility
-        mock_segment.__getitem__.return_value = mock_segment # For slicing segment[:target_dur]
-        
-        mock_audio_segment.from_wav.return_value = mock_segment
-        mock_audio_segment.silent.return_value = mock_segment
-        
-        # Subtitle wants only 2000 ms duration
+    def test_process_atempo_when_audio_is_long(self, mock_run):
+        # 3 seconds audio generated by TTS, subtitle wants only 2000 ms duration
         subtitles = [
             SubtitleItem(index=1, start_time_ms=0, end_time_ms=2000, duration_ms=2000, text="Test padding")
         ]
         
-        self.processor.process_subtitles(subtitles, temp_dir="/tmp", max_speed=1.5)
+        self.mock_tts.synthesize.return_value = _clip(3000)
+        processor = AudioProcessor(self.mock_tts, stretch_engine="ffmpeg")
+        # ffmpeg 回退路径会把片段落盘交给 atempo，再读回处理结果
+        with patch.object(AudioSegment, 'from_wav', return_value=_tone(3000)):
+            merged = processor.process_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5)
         
         # Required speed ratio is 3000 / 2000 = 1.5, which does not exceed max_speed.
-        # It should run ffmpeg atempo
+        # With the ffmpeg fallback engine it should run ffmpeg atempo
         self.assertTrue(mock_run.called)
         args_ffmpeg = mock_run.call_args[0][0]
         self.assertIn('atempo=1.5', args_ffmpeg)
+        # 输出长度严格等于时间轴长度，超出窗口的尾部被裁剪
+        audio, _ = _read_samples(merged)
+        self.assertEqual(len(audio), 2000)
+
+    @patch('core.audio_processor.subprocess.run')
+    def test_process_wsola_stretch_in_process(self, mock_run):
+        subtitles = [
+            SubtitleItem(index=1, start_time_ms=0, end_time_ms=2000, duration_ms=2000, text="Test stretch")
+        ]
+        self.mock_tts.synthesize.return_value = _clip(3000)
+        processor = AudioProcessor(self.mock_tts, stretch_engine="wsola")
+        merged = processor.process_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5)
+
+        # WSOLA 在进程内完成变速，不会启动 ffmpeg 子进程，且压缩后的语音填满整个窗口
+        self.assertFalse(mock_run.called)
+        audio, samples = _read_samples(merged)
+        self.assertEqual(len(audio), 2000)
+        self.assertTrue(np.any(samples[-2000:] != 0))
+
+    def test_metrics_record_tts_stretch_and_export(self):
+        subtitles = [
+            SubtitleItem(index=1, start_time_ms=0, end_time_ms=2000, duration_ms=2000, text="long"),
+            SubtitleItem(index=2, start_time_ms=3000, end_time_ms=5000, duration_ms=2000, text="short"),
+        ]
+        self.mock_tts.synthesize.side_effect = [_clip(2500), _clip(1000)]
+        metrics = JobMetrics()
+        processor = AudioProcessor(self.mock_tts, max_workers=1, metrics=metrics)
+        merged = processor.process_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5)
+
+        summary = metrics.summary()
+        self.assertEqual(set(summary["stages"]), {"synthesize", "stretch", "assemble", "export"})
+        self.assertEqual(summary["histograms"]["tts_request_seconds"]["count"], 2)
+        self.assertEqual(summary["histograms"]["stretch_ratio"]["sum"], 1.25)
+        self.assertEqual(summary["counters"]["vocal_bytes_written"], os.path.getsize(merged))
+
+    def test_rate_planning_avoids_stretch(self):
+        tts = FakeTTSProvider(chars_per_second=4.0)
+        model = DurationPredictor(os.path.join(self.temp_dir, "model.json"))
+        for _ in range(5):
+            model.observe(DurationPredictor.voice_key(tts.cache_identity()), "一二三四", 1000)
+        # 4 个字按 1.0 倍速需要 1000ms，窗口只有 900ms
+        subtitles = [SubtitleItem(index=1, start_time_ms=0, end_time_ms=900, duration_ms=900, text="五六七八")]
+        processor = AudioProcessor(tts, duration_model=model)
+        timeline = processor.allocate_timeline(subtitles)
+        _, stretch_jobs = processor.synthesize_segments(subtitles, timeline, max_speed=1.5)
+
+        self.assertEqual(stretch_jobs, [])
+        self.assertEqual(processor.rate_report, {"planned": 1, "avoided": 1})
+        self.assertIn("rate_plan", processor.render_params(1.5))
+
+    def test_silence_trim_before_fit_ratio(self):
+        # 1600ms 的合成结果中只有 1000ms 是语音：裁掉首尾静音后能直接放进 1200ms 的窗口
+        subtitles = [
+            SubtitleItem(index=1, start_time_ms=0, end_time_ms=1200, duration_ms=1200, text="留白"),
+            SubtitleItem(index=2, start_time_ms=2000, end_time_ms=2600, duration_ms=600, text="截断"),
+        ]
+        self.mock_tts.synthesize.side_effect = lambda text, speed=1.0: _padded_clip(300, 1000 if text == "留白" else 800)
+        metrics = JobMetrics()
+        processor = AudioProcessor(self.mock_tts, max_workers=1, metrics=metrics)
+        timeline = processor.allocate_timeline(subtitles)
+        segments, stretch_jobs = processor.synthesize_segments(subtitles, timeline, max_speed=1.5)
+
+        # 第 2 句原长 1400ms 超过 600ms x 1.5 会被截尾，裁剪后约 880ms (语音加两侧保护余量) 只需变速
+        self.assertEqual([(item.index, round(ratio, 2)) for item, ratio in stretch_jobs], [(2, 1.48)])
+        self.assertAlmostEqual(len(segments[1]), timeline.ms_to_frames(1080), delta=timeline.ms_to_frames(10))
+        self.assertEqual(processor.trim_report, {"trimmed": 2, "trimmed_ms": 1024,
+                                                 "stretches_avoided": 1, "truncations_avoided": 1})
+        self.assertEqual(metrics.summary()["counters"]["trim_stretches_avoided"], 1)
+
+        with patch('config.SILENCE_TRIM_ENABLED', False):
+            processor = AudioProcessor(self.mock_tts, max_workers=1)
+            _, stretch_jobs = processor.synthesize_segments(subtitles, timeline, max_speed=1.5)
+        self.assertEqual(len(stretch_jobs), 2)
+
+    @patch('config.SILENCE_TRIM_ENABLED', False)
+    def test_same_text_lines_use_their_own_ratio(self):
+        tts = FakeTTSProvider(chars_per_second=4.0)
+        model = DurationPredictor(os.path.join(self.temp_dir, "model.json"))
+        for _ in range(5):
+            model.observe(DurationPredictor.voice_key(tts.cache_identity()), "一二三四", 1000)
+        # 相同文本：900ms 窗口的一句提前加速后放得下，2000ms 窗口的一句按原语速合成
+        subtitles = [
+            SubtitleItem(index=1, start_time_ms=0, end_time_ms=900, duration_ms=900, text="五六七八"),
+            SubtitleItem(index=2, start_time_ms=1000, end_time_ms=3000, duration_ms=2000, text="五六七八"),
+        ]
+        processor = AudioProcessor(tts, max_workers=1, duration_model=model)
+        timeline = processor.allocate_timeline(subtitles)
+        _, stretch_jobs = processor.synthesize_segments(subtitles, timeline, max_speed=1.5)
+        self.assertEqual(stretch_jobs, [])
+
+    def test_draft_plans_with_final_voice_without_learning(self):
+        tts = FakeTTSProvider(chars_per_second=4.0)
+        final_voice = {"mode": "cosyvoice", "voice": "中文女"}
+        model = DurationPredictor(os.path.join(self.temp_dir, "model.json"))
+        for _ in range(5):
+            model.observe(DurationPredictor.voice_key(final_voice), "一二三四", 1000)
+        subtitles = [SubtitleItem(index=1, start_time_ms=0, end_time_ms=900, duration_ms=900, text="五六七八")]
+        processor = AudioProcessor(tts, duration_model=model, timing_identity=final_voice)
+        timeline = processor.allocate_timeline(subtitles)
+        processor.synthesize_segments(subtitles, timeline, max_speed=1.5)
+
+        # 按最终音色规划了语速，但草稿引擎的时长不写入任何音色的模型
+        self.assertEqual(processor.rate_report["planned"], 1)
+        self.assertEqual(model._voices[DurationPredictor.voice_key(final_voice)]["n"], 5)
+        self.assertEqual(len(model._voices), 1)
+
+    def test_concurrent_synthesis_longest_first(self):
+        subtitles = [
+            SubtitleItem(index=1, start_time_ms=0, end_time_ms=1000, duration_ms=1000, text="短"),
+            SubtitleItem(index=2, start_time_ms=1000, end_time_ms=2000, duration_ms=1000, text="这是最长的一句字幕"),
+            SubtitleItem(index=3, start_time_ms=2000, end_time_ms=3000, duration_ms=1000, text="中等长度"),
+        ]
+        progress = []
+        processor = AudioProcessor(self.mock_tts, max_workers=2)
+        # 用同步执行的线程池替身观察提交顺序，避免线程调度带来的不确定性
+        self.mock_tts.synthesize.return_value = _clip(500)
+        with patch('core.audio_processor.ThreadPoolExecutor', _InlineExecutor):
+            processor.process_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5,
+                                        progress_callback=lambda c, t: progress.append((c, t)))
+
+        # 所有字幕都被合成，且首个提交的是最长的句子
+        self.assertEqual(self.mock_tts.synthesize.call_count, 3)
+        first_text = self.mock_tts.synthesize.call_args_list[0][0][0]
+        self.assertEqual(first_text, "这是最长的一句字幕")
+        # 进度单调递增并以 (total, total) 结束
+        self.assertEqual(progress[0], (0, 3))
+        self.assertEqual(progress[-1], (3, 3))
+        self.assertEqual([c for c, _ in progress], sorted(c for c, _ in progress))
+
+    def test_non_thread_safe_provider_runs_serially(self):
+        self.mock_tts.thread_safe = False
+        processor = AudioProcessor(self.mock_tts, max_workers=8)
+        self.assertEqual(processor._effective_workers(10), 1)
+
+    def test_serial_synthesis_survives_provider_error(self):
+        # 串行路径与线程池路径一致：引擎异常只让该句静音，其余句子照常合成
+        self.mock_tts.thread_safe = False
+        self.mock_tts.synthesize.side_effect = [_clip(500), RuntimeError("引擎崩溃"), _clip(500)]
+        subtitles = [
+            SubtitleItem(index=i, start_time_ms=(i - 1) * 1000, end_time_ms=i * 1000, duration_ms=1000, text=str(i))
+            for i in range(1, 4)
+        ]
+        merged = self.processor.process_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5)
+        self.assertEqual(self.mock_tts.synthesize.call_count, 3)
+        _, samples = _read_samples(merged)
+        self.assertFalse(np.any(samples[22050:44100]))
+        self.assertTrue(np.any(samples[44100:]))
+
+    def test_stream_flushes_in_timeline_order(self):
+        subtitles = [
+            SubtitleItem(index=1, start_time_ms=0, end_time_ms=1000, duration_ms=1000, text="一"),
+            SubtitleItem(index=2, start_time_ms=1500, end_time_ms=2500, duration_ms=1000, text="二"),
+        ]
+        chunks = []
+        self.mock_tts.synthesize.return_value = _clip(800)
+        self.processor.stream_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5,
+                                        sink=lambda samples: chunks.append(samples.copy()))
+
+        # 第一句写完后立即输出到第二句开始前的定稿部分，剩余部分在结尾一次性输出
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(len(chunks[0]), 22050 * 1500 // 1000)
+        merged = np.concatenate(chunks)
+        self.assertEqual(len(merged), 22050 * 2500 // 1000)
+        self.assertNotIn("merged_vocal.wav", os.listdir(self.temp_dir))
+
+    def test_batches_respect_size_and_char_budget(self):
+        self.mock_tts.supports_batch = True
+        items = [SubtitleItem(index=i, start_time_ms=0, end_time_ms=1, duration_ms=1, text="字" * n)
+                 for i, n in enumerate([100, 100, 100, 50, 10, 10], start=1)]
+        with patch('core.audio_processor.config.TTS_BATCH_SIZE', 3), \
+                patch('core.audio_processor.config.TTS_BATCH_MAX_CHARS', 250):
+            batches = self.processor._make_batches(items)
+        self.assertEqual([[it.index for it in b] for b in batches], [[1, 2], [3, 4, 5], [6]])
+
+    def test_batch_synthesis_uses_synthesize_batch(self):
+        self.mock_tts.supports_batch = True
+        self.mock_tts.synthesize_batch.side_effect = lambda texts: [_clip(100)] * len(texts)
+        items = [SubtitleItem(index=i, start_time_ms=0, end_time_ms=1, duration_ms=1, text="句子")
+                 for i in range(1, 4)]
+        results = self.processor._synthesize_all(items)
+        self.assertEqual(results, {1: True, 2: True, 3: True})
+        self.assertEqual(self.mock_tts.synthesize_batch.call_count, 1)
+        self.assertFalse(self.mock_tts.synthesize.called)
+
+    def test_synthesis_stays_in_memory(self):
+        # 时长直接由采样数得出，不写 tts_*.wav 临时文件，也不调用 pydub 解码
+        subtitles = [SubtitleItem(index=1, start_time_ms=0, end_time_ms=2000, duration_ms=2000, text="内存")]
+        with patch.object(AudioSegment, 'from_wav') as mock_from_wav:
+            self.processor.stream_subtitles(subtitles, temp_dir=self.temp_dir, max_speed=1.5, sink=lambda samples: None)
+        self.assertFalse(mock_from_wav.called)
+        self.assertFalse(self.mock_tts.generate_audio.called)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_clip_resampled_to_timeline_format(self):
+        timeline = TimelineBuffer(1000, 22050)
+        samples = timeline.clip_to_array(_clip(500, frame_rate=16000))
+        self.assertEqual(samples.shape[1], 1)
+        self.assertAlmostEqual(len(samples), 22050 // 2, delta=2)
+
+    def test_job_format_converts_each_clip_once(self):
+        tts = FakeTTSProvider()
+        rates = []
+        synthesize = tts.synthesize
+        tts.synthesize = lambda text, speed=1.0: rates.append(tts.output_sample_rate) or synthesize(text, speed)
+        subtitles = [SubtitleItem(index=1, start_time_ms=0, end_time_ms=1000, duration_ms=1000, text="一二")]
+        processor = AudioProcessor(tts, sample_rate=48000, channels=2)
+        timeline = processor.allocate_timeline(subtitles)
+        segments, _ = processor.synthesize_segments(subtitles, timeline, max_speed=1.5)
+
+        # 引擎在合成期间得知任务的内部采样率，结束后复位
+        self.assertEqual(rates, [48000])
+        self.assertIsNone(tts.output_sample_rate)
+        self.assertEqual(segments[1].shape, (19200, 2))
+        self.assertTrue((segments[1][:, 0] == segments[1][:, 1]).all())
+        self.assertEqual(processor.render_params(1.5)["frame_rate"], 48000)
+
+    def test_timeline_overlap_does_not_drift(self):
+        timeline = TimelineBuffer(3000, 1000)
+        ones = np.full((1000, 1), 100, dtype=np.int16)
+        timeline.place(ones, 0)
+        # 第二句与第一句重叠 500ms，仍然写在自己的绝对位置
+        timeline.place(ones, 500)
+        timeline.place(ones, 2000, max_ms=500)
+        flat = timeline.samples[:, 0]
+        self.assertEqual(timeline.duration_ms, 3000)
+        self.assertTrue(np.all(flat[:500] == 100))
+        self.assertTrue(np.all(flat[500:1000] == 200))
+        self.assertTrue(np.all(flat[1000:1500] == 100))
+        self.assertTrue(np.all(flat[2000:2500] == 100))
+        self.assertFalse(np.any(flat[2500:]))
 
 if __name__ == '__main__':
     unittest.main()
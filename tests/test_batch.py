@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from core.batch import discover_jobs, run_batch
+from core.tts_provider import TTSProvider, ThrottledTTSProvider
+
+SRT = "1\n00:00:00,000 --> 00:00:01,500\n你好\n\n2\n00:00:02,000 --> 00:00:03,000\n世界\n"
+
+class _SlowTTS(TTSProvider):
+    """记录同时在途调用数峰值的假引擎"""
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_audio(self, text, output_path):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self._lock:
+            self.active -= 1
+        return True
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _touch(self, name, content=""):
+        path = os.path.join(self.work_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_discover_pairs_in_directory(self):
+        self._touch("a.mp4")
+        self._touch("a.srt", SRT)
+        self._touch("b.mkv")
+        self._touch("b.srt", SRT)
+        self._touch("orphan.mp4")
+        jobs = discover_jobs(self.work_dir, output_dir="/out")
+        self.assertEqual([os.path.basename(j.video_path) for j in jobs], ["a.mp4", "b.mkv"])
+        self.assertEqual(jobs[0].output_path, os.path.join("/out", "a_dubbed.mp4"))
+
+    def test_discover_from_manifest(self):
+        manifest = self._touch("jobs.json", json.dumps([
+            {"video": "v/ep1.mp4", "srt": "s/ep1.srt", "output": "done/ep1.mp4"},
+            {"video": "v/ep2.mp4", "srt": "s/ep2.srt"},
+        ]))
+        jobs = discover_jobs(manifest)
+        self.assertEqual(jobs[0].output_path, os.path.join(self.work_dir, "done", "ep1.mp4"))
+        self.assertEqual(jobs[1].srt_path, os.path.join(self.work_dir, "s", "ep2.srt"))
+        self.assertEqual(jobs[1].output_path, os.path.join(self.work_dir, "v", "ep2_dubbed.mp4"))
+
+    def test_throttle_limits_concurrent_calls(self):
+        inner = _SlowTTS()
+        tts = ThrottledTTSProvider(inner, threading.BoundedSemaphore(2))
+        threads = [threading.Thread(target=tts.generate_audio, args=("x", "x.wav")) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(inner.peak, 2)
+
+    def test_jobs_get_private_workspaces_and_summary(self):
+        for name in ("a", "b"):
+            self._touch(f"{name}.mp4")
+            self._touch(f"{name}.srt", SRT)
+        workspaces = []
+
+        def fake_job(video_path, srt_path, output_path, params, temp_dir=None, **kwargs):
+            if "b.mp4" in video_path:
+                raise RuntimeError("boom")
+            workspaces.append(temp_dir)
+            self.assertTrue(os.path.isdir(temp_dir))
+            self.assertEqual(len(kwargs["subtitles"]), 2)
+            return output_path
+
+        jobs = discover_jobs(self.work_dir)
+        with patch('core.batch.run_dubbing_job', side_effect=fake_job), \
+                patch('core.batch.get_tts_provider'):
+            summary = run_batch(jobs, {"mode": "native", "gender": "male"}, max_jobs=1)
+
+        self.assertEqual((summary["succeeded"], summary["failed"]), (1, 1))
+        self.assertEqual(summary["lines"], 2)
+        self.assertEqual(summary["media_seconds"], 3.0)
+        self.assertIn("boom", summary["results"][1]["error"])
+        # 工作区为任务私有目录，且任务结束后已清理
+        self.assertNotEqual(os.path.basename(workspaces[0]), "temp")
+        self.assertFalse(os.path.exists(workspaces[0]))
+
+if __name__ == '__main__':
+    unittest.main()
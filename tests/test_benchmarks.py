@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from benchmarks.synthetic import generate_srt, FakeTTSProvider
+from core.subtitle_parser import SubtitleParser
+
+class TestSyntheticInputs(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_srt_generator_is_reproducible(self):
+        a, b = os.path.join(self.work_dir, "a.srt"), os.path.join(self.work_dir, "b.srt")
+        generate_srt(a, 200, seed=7, min_chars=5, max_chars=10, overlap=0.3)
+        generate_srt(b, 200, seed=7, min_chars=5, max_chars=10, overlap=0.3)
+        with open(a, encoding="utf-8") as fa, open(b, encoding="utf-8") as fb:
+            self.assertEqual(fa.read(), fb.read())
+
+        items = SubtitleParser(a).parse()
+        self.assertEqual(len(items), 200)
+        self.assertTrue(all(5 <= len(item.text) <= 10 for item in items))
+        overlapping = sum(1 for prev, cur in zip(items, items[1:]) if cur.start_time_ms < prev.end_time_ms)
+        self.assertGreater(overlapping, 20)
+
+    def test_fake_tts_duration_follows_text_length(self):
+        tts = FakeTTSProvider(chars_per_second=4.0, frame_rate=16000)
+        clip = tts.synthesize("一二三四五六七八")
+        self.assertEqual(clip.duration_ms, 2000)
+        np.testing.assert_array_equal(clip.samples, tts.synthesize("一二三四五六七八").samples)
+        path = os.path.join(self.work_dir, "x.wav")
+        self.assertTrue(tts.generate_audio("一二", path))
+        self.assertTrue(os.path.getsize(path) > 0)
+
+if __name__ == '__main__':
+    unittest.main()
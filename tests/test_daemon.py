@@ -0,0 +1,78 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from benchmarks.synthetic import FakeTTSProvider
+from core.daemon import RenderDaemon, make_server
+from core.daemon_client import DaemonClient
+from core.tts_provider import NativeProcessPoolTTS
+
+NATIVE = {"mode": "native", "gender": "male", "rate": 180}
+
+class TestRenderDaemon(unittest.TestCase):
+    def setUp(self):
+        self.daemon = RenderDaemon(max_jobs=2)
+        self.server = make_server(self.daemon, "127.0.0.1", 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = DaemonClient("127.0.0.1", self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.daemon.shutdown()
+
+    def _request(self, output, **options):
+        return {"video": "/in.mp4", "srt": "/in.srt", "output": output, "params": NATIVE, **options}
+
+    def test_jobs_reuse_warm_provider(self):
+        calls = []
+
+        def fake_job(video, srt, output, params, temp_dir=None, tts=None,
+                     status_callback=None, progress_callback=None, **options):
+            calls.append((tts, options))
+            status_callback("1. 正在解析物理时间轴...")
+            progress_callback(2, 2)
+            return output
+
+        messages = []
+        with patch('core.daemon.get_tts_provider', return_value=FakeTTSProvider()) as mock_provider, \
+                patch('core.daemon.run_dubbing_job', side_effect=fake_job):
+            self.assertTrue(self.client.available())
+            first = self.client.run(self._request("/tmp/a.mp4", start_ms=1000), status_callback=messages.append)
+            second = self.client.run(self._request("/tmp/b.mp4"))
+
+        # 同一音色的引擎只初始化一次，之后的任务直接复用
+        self.assertEqual(mock_provider.call_count, 1)
+        self.assertIs(calls[0][0], calls[1][0])
+        self.assertEqual(calls[0][1], {"start_ms": 1000})
+        self.assertEqual(messages, ["1. 正在解析物理时间轴..."])
+        self.assertEqual((first["state"], first["progress"]), ("done", [2, 2]))
+        self.assertEqual(second["state"], "done")
+        self.assertEqual(self.client._request("GET", "/health")[1]["providers"], 1)
+
+    def test_failed_job_and_invalid_request(self):
+        with patch('core.daemon.get_tts_provider', return_value=FakeTTSProvider()), \
+                patch('core.daemon.run_dubbing_job', side_effect=ValueError("未提取到任何有效字幕！")):
+            with self.assertRaisesRegex(RuntimeError, "未提取到任何有效字幕"):
+                self.client.run(self._request("/tmp/a.mp4"))
+        with self.assertRaisesRegex(RuntimeError, "srt"):
+            self.client.submit({"video": "/in.mp4", "output": "/tmp/a.mp4", "params": NATIVE})
+        with self.assertRaises(RuntimeError):
+            self.client.status("missing")
+
+    @patch('sys.platform', 'linux')
+    @patch('core.tts_provider.pyttsx3', MagicMock())
+    def test_native_voices_get_separate_engine_processes(self):
+        # 单进程配置下 pyttsx3 在同一进程内只有一个引擎，不同音色必须各自放到独立的工作进程
+        with patch('config.NATIVE_TTS_PROCESSES', 1), patch('config.TTS_CACHE_ENABLED', False):
+            male, _ = self.daemon._provider(NATIVE)
+            female, _ = self.daemon._provider({**NATIVE, "gender": "female"})
+        self.assertIsInstance(male, NativeProcessPoolTTS)
+        self.assertIsInstance(female, NativeProcessPoolTTS)
+        self.assertNotEqual(male.cache_identity(), female.cache_identity())
+        self.assertEqual(male.processes, 1)
+
+    def test_client_reports_unavailable(self):
+        self.assertFalse(DaemonClient("127.0.0.1", 1).available())
+
+if __name__ == '__main__':
+    unittest.main()
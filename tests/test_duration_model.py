@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from core.duration_model import DurationPredictor, speech_units
+
+class TestDurationPredictor(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, "model.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_speech_units(self):
+        self.assertEqual(speech_units("你好世界"), 4)
+        self.assertEqual(speech_units("你好，世界"), 4.5)
+        self.assertAlmostEqual(speech_units("hello"), 1.75)
+
+    def test_learns_and_persists_per_voice(self):
+        model = DurationPredictor(self.path)
+        voice = DurationPredictor.voice_key({"voice": "A"})
+        self.assertIsNone(model.predict_ms(voice, "一二三四"))
+        for _ in range(5):
+            # 以 1.25 倍速合成时长 800ms，折算回 1.0 倍速为 4 字 / 秒
+            model.observe(voice, "一二三四", 800, speed=1.25)
+        self.assertAlmostEqual(model.chars_per_second(voice), 4.0)
+        model.save()
+
+        reloaded = DurationPredictor(self.path)
+        self.assertAlmostEqual(reloaded.predict_ms(voice, "一二"), 500)
+        self.assertIsNone(reloaded.predict_ms(DurationPredictor.voice_key({"voice": "B"}), "一二"))
+
+    def test_plan_speed_quantized_and_capped(self):
+        model = DurationPredictor(self.path)
+        for _ in range(5):
+            model.observe("v", "一二三四", 1000)
+        with patch('config.RATE_PLAN_MARGIN', 1.0):
+            self.assertEqual(model.plan_speed("v", "一二三四", 1000), 1.0)
+            self.assertEqual(model.plan_speed("v", "一二三四", 900), 1.15)
+            self.assertEqual(model.plan_speed("v", "一二三四", 500), 1.3)
+
+if __name__ == '__main__':
+    unittest.main()
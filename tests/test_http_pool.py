@@ -0,0 +1,90 @@
+import time
+import socket
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from core.http_pool import HTTPConnectionPool
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持长连接
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        server.requests += 1
+        if server.fail_first > 0:
+            server.fail_first -= 1
+            status, body = 503, b"busy"
+        else:
+            if server.delay:
+                time.sleep(server.delay)
+            status, body = 200, b"RIFFdata"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestHTTPConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = 0
+        self.server.fail_first = 0
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/audio/speech"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        pool = HTTPConnectionPool(self.url, max_connections=2, backoff=0)
+        for _ in range(5):
+            result = pool.request("POST", "/v1/audio/speech", body=b"{}")
+            self.assertEqual(result.status, 200)
+            self.assertEqual(result.data, b"RIFFdata")
+        self.assertEqual(pool.stats.connections_created, 1)
+        self.assertEqual(pool.stats.connections_reused, 4)
+        pool.close()
+
+    def test_retries_5xx_then_succeeds(self):
+        self.server.fail_first = 2
+        pool = HTTPConnectionPool(self.url, max_retries=3, backoff=0.001)
+        result = pool.request("POST", "/", body=b"{}")
+        self.assertEqual(result.status, 200)
+        self.assertEqual(pool.stats.retries, 2)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.fail_first = 10
+        pool = HTTPConnectionPool(self.url, max_retries=1, backoff=0.001)
+        result = pool.request("POST", "/", body=b"{}")
+        self.assertEqual(result.status, 503)
+        self.assertEqual(pool.stats.failures, 1)
+
+    def test_stream_factory_receives_body_in_chunks(self):
+        pool = HTTPConnectionPool(self.url)
+        received, statuses = [], []
+
+        def factory(status, headers):
+            statuses.append(status)
+            return received.append
+
+        result = pool.request("POST", "/", body=b"{}", stream_factory=factory)
+        self.assertEqual(statuses, [200])
+        self.assertEqual(b"".join(received), b"RIFFdata")
+        self.assertEqual(result.data, b"")
+
+    def test_read_deadline(self):
+        self.server.delay = 1.0
+        pool = HTTPConnectionPool(self.url, read_timeout=0.2, max_retries=0)
+        start = time.monotonic()
+        with self.assertRaises(socket.timeout):
+            pool.request("POST", "/", body=b"{}")
+        self.assertLess(time.monotonic() - start, 0.9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import importlib
+import subprocess
+import unittest
+from unittest.mock import patch
+import config
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# `main.py --help` 与参数错误路径的导入耗时上限 (微秒，按 -X importtime 顶层模块累计耗时计)；
+# 当前约 25ms，预留余量给较慢的机器，但足以发现重新在启动时导入 numpy / pydub 等音频栈的回归
+HELP_IMPORT_BUDGET_US = 100_000
+# 只有真正合成、处理音频时才需要的重量级模块
+HEAVY_MODULES = ("numpy", "pydub", "pyttsx3", "core.pipeline", "core.audio_processor")
+
+def _importtime(*args):
+    """在子进程中以 -X importtime 运行，返回 {模块名: 累计耗时(微秒)} 与各顶层模块累计耗时之和"""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return modules, total
+
+class TestImportTime(unittest.TestCase):
+    def test_help_stays_within_import_budget(self):
+        modules, total = _importtime("main.py", "--help")
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules)
+        self.assertLess(total, HELP_IMPORT_BUDGET_US)
+
+    def test_provider_module_defers_audio_backends(self):
+        modules, _ = _importtime("-c", "import core.tts_provider, core.tts_cache, core.timeline")
+        self.assertNotIn("pydub", modules)
+        self.assertNotIn("pyttsx3", modules)
+
+    def test_config_import_has_no_filesystem_side_effects(self):
+        with patch('os.makedirs') as mock_makedirs:
+            importlib.reload(config)
+        mock_makedirs.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
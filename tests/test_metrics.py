@@ -0,0 +1,66 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from core.metrics import JobMetrics, Histogram
+from core.video_mixer import parse_ffmpeg_progress, _progress_record
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_histogram_buckets(self):
+        hist = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            hist.observe(value)
+        self.assertEqual(hist.counts, [2, 1, 1])
+        self.assertAlmostEqual(hist.sum, 3.65)
+
+    def test_events_and_prometheus_file(self):
+        events = os.path.join(self.work_dir, "out.mp4.lark", "metrics.jsonl")
+        prom = os.path.join(self.work_dir, "out.mp4.lark", "metrics.prom")
+        with JobMetrics(job="out.mp4", events_path=events, prometheus_path=prom) as metrics:
+            with metrics.stage("parse"):
+                pass
+            metrics.observe("stretch_ratio", 1.15)
+            metrics.observe("tts_request_seconds", 0.3)
+            metrics.incr("tts_lines", 4)
+
+        records = [json.loads(line) for line in open(events, encoding="utf-8")]
+        self.assertEqual([r["event"] for r in records], ["stage", "job_end"])
+        self.assertEqual(records[0]["stage"], "parse")
+        self.assertTrue(records[1]["ok"])
+        self.assertEqual(records[1]["counters"], {"tts_lines": 4})
+
+        text = open(prom, encoding="utf-8").read()
+        self.assertIn('lark_stage_seconds{job="out.mp4",stage="parse"}', text)
+        self.assertIn('lark_tts_lines_total{job="out.mp4"} 4', text)
+        # 变速倍率按倍率分桶，且 bucket 为累计计数
+        self.assertIn('lark_stretch_ratio_bucket{job="out.mp4",le="1.1"} 0', text)
+        self.assertIn('lark_stretch_ratio_bucket{job="out.mp4",le="1.2"} 1', text)
+        self.assertIn('lark_tts_request_seconds_bucket{job="out.mp4",le="+Inf"} 1', text)
+        self.assertFalse(os.path.exists(prom + ".tmp"))
+
+    def test_failed_job_is_recorded(self):
+        events = os.path.join(self.work_dir, "metrics.jsonl")
+        with self.assertRaises(RuntimeError):
+            with JobMetrics(job="x", events_path=events):
+                raise RuntimeError("boom")
+        last = json.loads(open(events, encoding="utf-8").read().splitlines()[-1])
+        self.assertEqual((last["ok"], last["error"]), (False, "boom"))
+
+    def test_parse_ffmpeg_progress(self):
+        output = [
+            b"frame=10\n", b"out_time_us=1500000\n", b"total_size=4096\n", b"speed=2.5x\n", b"progress=continue\n",
+            b"out_time_us=3000000\n", b"total_size=N/A\n", b"speed=N/A\n", b"progress=end\n",
+        ]
+        records = [_progress_record(block) for block in parse_ffmpeg_progress(output)]
+        self.assertEqual(records[0], {"done": False, "out_seconds": 1.5, "total_size": 4096, "speed": 2.5})
+        self.assertEqual(records[1], {"done": True, "out_seconds": 3.0})
+
+if __name__ == '__main__':
+    unittest.main()
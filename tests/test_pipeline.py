@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from benchmarks.synthetic import FakeTTSProvider
+from core.pipeline import run_dubbing_job, run_variants_job, variant_track, preview_output_path
+from core.subtitle_parser import SubtitleParser
+
+SRT = "1\n00:00:00,000 --> 00:00:01,500\n你好\n\n2\n00:00:02,000 --> 00:00:03,000\n世界\n"
+SRT_LONG = "".join(f"{i}\n00:00:{i:02d},000 --> 00:00:{i:02d},800\n第{i}句\n\n" for i in range(1, 11))
+
+class TestVariantsJob(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.srt_path = os.path.join(self.work_dir, "a.srt")
+        with open(self.srt_path, "w", encoding="utf-8") as f:
+            f.write(SRT)
+        model_patch = patch('config.DURATION_MODEL_PATH', os.path.join(self.work_dir, "duration_model.json"))
+        model_patch.start()
+        self.addCleanup(model_patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_variant_track_labels(self):
+        self.assertEqual(variant_track({"mode": "native", "gender": "female"}), {"title": "native-female", "language": "chi"})
+        self.assertEqual(
+            variant_track({"mode": "cosyvoice", "gender": "male", "language": "English", "style": "standard", "label": "EN"}),
+            {"title": "EN", "language": "eng"}
+        )
+
+    def test_variants_share_parse_and_mux_once(self):
+        variants = [
+            {"mode": "native", "gender": "male"},
+            {"mode": "cosyvoice", "gender": "female", "language": "English", "style": "standard", "label": "EN"},
+        ]
+        providers = [FakeTTSProvider(chars_per_second=2.0), FakeTTSProvider(chars_per_second=4.0)]
+        for tts in providers:
+            tts.close = MagicMock()
+        progress = []
+        captured = {}
+
+        def fake_mix(video_path, tracks, output_path):
+            captured["tracks"] = tracks
+            self.assertTrue(all(os.path.exists(track["path"]) for track in tracks))
+
+        output = os.path.join(self.work_dir, "out.mp4")
+        with patch('core.pipeline.get_tts_provider', side_effect=providers) as mock_provider, \
+                patch('core.pipeline.VideoMixer.mix_variants', side_effect=fake_mix) as mock_mix, \
+                patch.object(SubtitleParser, 'parse', autospec=True,
+                             side_effect=lambda parser: list(parser.iter_items())) as mock_parse:
+            run_variants_job("in.mp4", self.srt_path, output, variants,
+                             temp_dir=os.path.join(self.work_dir, "temp"),
+                             progress_callback=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(mock_mix.call_count, 1)
+        self.assertEqual([t["title"] for t in captured["tracks"]], ["native-male", "EN"])
+        self.assertEqual(progress[-1], (4, 4))
+        self.assertFalse(os.path.exists(os.path.join(self.work_dir, "temp")))
+        # 并发合成的各版本不能共用进程内的 pyttsx3 引擎
+        self.assertTrue(all(c[1]["isolate_native"] for c in mock_provider.call_args_list))
+        # 任务自己创建的引擎在结束时关闭，不留下常驻的工作进程
+        for tts in providers:
+            tts.close.assert_called_once_with()
+
+    def test_range_draft_renders_slice_with_native_engine(self):
+        with open(self.srt_path, "w", encoding="utf-8") as f:
+            f.write(SRT_LONG)
+        captured = {}
+
+        def fake_mix(video_path, vocal_path, output_path, span=None):
+            captured["span"] = span
+
+        output = os.path.join(self.work_dir, "preview.mp4")
+        params = {"mode": "cosyvoice", "gender": "female", "language": "中文", "style": "standard"}
+        tts = FakeTTSProvider()
+        tts.close = MagicMock()
+        with patch('core.pipeline.get_tts_provider', return_value=tts) as mock_provider, \
+                patch('core.pipeline.VideoMixer.mix', side_effect=fake_mix), \
+                patch('core.pipeline.AudioProcessor.process_subtitles', autospec=True,
+                      return_value="vocal.wav") as mock_process:
+            run_dubbing_job("in.mp4", self.srt_path, output, params,
+                            temp_dir=os.path.join(self.work_dir, "temp"),
+                            stream_vocal=False, incremental=False,
+                            start_ms=3500, end_ms=6000, draft=True)
+
+        self.assertEqual(mock_provider.call_args[0][0]["mode"], "native")
+        processor, subtitles = mock_process.call_args[0][:2]
+        self.assertEqual(processor.timing_identity, {"mode": "cosyvoice", "voice": "中文女"})
+        self.assertEqual([item.index for item in subtitles], [3, 4, 5])
+        self.assertEqual(subtitles[0].start_time_ms, 0)
+        self.assertEqual(captured["span"], (3000, 6000))
+        tts.close.assert_called_once_with()
+
+        # 调用方传入的引擎 (如守护进程中的常驻引擎) 由调用方管理，任务结束时不关闭
+        with patch('core.pipeline.VideoMixer.mix'), \
+                patch('core.pipeline.AudioProcessor.process_subtitles', autospec=True, return_value="vocal.wav"):
+            run_dubbing_job("in.mp4", self.srt_path, output, params, temp_dir=os.path.join(self.work_dir, "temp"),
+                            tts=tts, stream_vocal=False, incremental=False, start_ms=3500, end_ms=6000, draft=True)
+        tts.close.assert_called_once_with()
+
+    def test_preview_keeps_full_render_manifest(self):
+        with open(self.srt_path, "w", encoding="utf-8") as f:
+            f.write(SRT_LONG)
+        output = os.path.join(self.work_dir, "out.mp4")
+        params = {"mode": "native", "gender": "male", "rate": 180}
+
+        def render(**options):
+            messages = []
+            tts = FakeTTSProvider()
+            tts.synthesize = MagicMock(side_effect=tts.synthesize)
+            with patch('core.pipeline.get_tts_provider', return_value=tts), \
+                    patch('core.pipeline.VideoMixer.mix'), \
+                    patch('config.TTS_CACHE_ENABLED', False):
+                run_dubbing_job("in.mp4", self.srt_path, output, params,
+                                temp_dir=os.path.join(self.work_dir, "temp"), status_callback=messages.append,
+                                stream_vocal=False, incremental=True, **options)
+            return tts.synthesize.call_count, messages
+
+        render()
+        # 预览既不读取也不改写清单，之后的完整渲染仍复用全部句子
+        self.assertEqual(render(start_ms=3500, end_ms=6000)[0], 3)
+        synthesized, messages = render()
+        self.assertEqual(synthesized, 0)
+        self.assertIn("复用 10/10", "".join(messages))
+
+    def test_preview_output_path(self):
+        self.assertEqual(preview_output_path("/out/movie.mp4"), "/out/movie_preview.mp4")
+
+if __name__ == '__main__':
+    unittest.main()
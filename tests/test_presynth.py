@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from benchmarks.synthetic import FakeTTSProvider
+from core.audio_processor import AudioProcessor
+from core.duration_model import DurationPredictor
+from core.presynth import Presynthesizer
+from core.tts_cache import CachedTTSProvider, TTSCache
+
+PARAMS = {"mode": "native", "gender": "male", "rate": 180}
+
+def _srt(lines):
+    return "".join(f"{i}\n00:00:{i:02d},000 --> 00:00:{i:02d},900\n第{i}句字幕\n\n" for i in range(1, lines + 1))
+
+class TestPresynthesizer(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.srt_path = os.path.join(self.work_dir, "a.srt")
+        with open(self.srt_path, "w", encoding="utf-8") as f:
+            f.write(_srt(40))
+        self.engine = FakeTTSProvider()
+        self.engine.synthesize = MagicMock(side_effect=self.engine.synthesize)
+        cache = TTSCache(os.path.join(self.work_dir, "cache"), 10 ** 9, fmt="wav")
+        self.provider = CachedTTSProvider(self.engine, cache)
+        for target, value in (('core.presynth.get_tts_provider', MagicMock(return_value=self.provider)),
+                              ('config.DURATION_MODEL_PATH', os.path.join(self.work_dir, "model.json"))):
+            p = patch(target, value)
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    @patch('config.TTS_MAX_WORKERS', 1)
+    def test_render_after_presynth_hits_cache(self):
+        progress = []
+        presynth = Presynthesizer(progress_callback=lambda done, total: progress.append((done, total)))
+        presynth.start(self.srt_path, PARAMS)
+        presynth._thread.join()
+        self.assertEqual(progress[-1], (40, 40))
+        synthesized = self.engine.synthesize.call_count
+
+        # 正式渲染复用同一引擎与已解析的字幕，语速规划与预合成一致，全部句子命中缓存
+        subtitles = presynth.subtitles(self.srt_path)
+        self.assertIs(presynth.provider(PARAMS), self.provider)
+        processor = AudioProcessor(presynth.provider(PARAMS), duration_model=DurationPredictor())
+        processor.synthesize_segments(subtitles, processor.allocate_timeline(subtitles), max_speed=1.5)
+        self.assertEqual(self.engine.synthesize.call_count, synthesized)
+
+    @patch('config.TTS_MAX_WORKERS', 1)
+    def test_render_plans_from_presynth_starting_model(self):
+        presynth = Presynthesizer()
+        presynth.start(self.srt_path, PARAMS)
+        presynth._thread.join()
+        synthesized = self.engine.synthesize.call_count
+
+        # 预合成之后另一次渲染更新了磁盘上的时长模型 (该音色被学成语速很慢)
+        voice = DurationPredictor.voice_key(self.provider.cache_identity())
+        other = DurationPredictor()
+        for _ in range(10):
+            other.observe(voice, "一二三四", 4000)
+        other.save()
+
+        # 正式渲染从预合成开始时的状态规划语速，仍全部命中缓存
+        subtitles = presynth.subtitles(self.srt_path)
+        processor = AudioProcessor(presynth.provider(PARAMS), duration_model=presynth.duration_model(self.srt_path, PARAMS))
+        processor.synthesize_segments(subtitles, processor.allocate_timeline(subtitles), max_speed=1.5)
+        self.assertEqual(self.engine.synthesize.call_count, synthesized)
+        self.assertIsNone(presynth.duration_model(self.srt_path, dict(PARAMS, gender="female")))
+
+    def test_only_current_provider_is_kept(self):
+        male, female = MagicMock(), MagicMock()
+        presynth = Presynthesizer()
+        with patch('core.presynth.get_tts_provider',
+                   side_effect=lambda params: female if params["gender"] == "female" else male):
+            self.assertIs(presynth.provider(PARAMS), male)
+            # 换音色时关闭旧引擎，不再保留
+            self.assertIs(presynth.provider(dict(PARAMS, gender="female")), female)
+            male.close.assert_called_once_with()
+            # 正式渲染前的 stop 保留引擎，关闭程序时的 stop 一并关闭
+            presynth.stop(keep_provider=True)
+            self.assertIs(presynth.provider(dict(PARAMS, gender="female")), female)
+            female.close.assert_not_called()
+            presynth.stop()
+            female.close.assert_called_once_with()
+
+    def test_parameter_change_abandons_previous_run(self):
+        gate, entered = threading.Event(), threading.Event()
+        self.addCleanup(gate.set)
+
+        def blocked(text):
+            entered.set()
+            gate.wait()
+        self.engine._wait = blocked
+        female = FakeTTSProvider(chars_per_second=4.0)
+        female.synthesize = MagicMock(side_effect=female.synthesize)
+        female_provider = CachedTTSProvider(female, TTSCache(os.path.join(self.work_dir, "cache"), 10 ** 9, fmt="wav"))
+        presynth = Presynthesizer()
+        with patch('core.presynth.get_tts_provider',
+                   side_effect=lambda params: female_provider if params["gender"] == "female" else self.provider), \
+                patch('config.PRESYNTH_CHUNK_LINES', 8):
+            presynth.start(self.srt_path, PARAMS)
+            first = presynth._thread
+            self.assertTrue(entered.wait(5))
+            # 参数改动立即返回 (不等待旧任务)，旧任务合成完手头的一组后放弃
+            presynth.start(self.srt_path, dict(PARAMS, gender="female"))
+            self.assertTrue(first.is_alive())
+            gate.set()
+            presynth._thread.join()
+
+        self.assertFalse(first.is_alive())
+        self.assertLessEqual(self.engine.synthesize.call_count, 8)
+        self.assertEqual(female.synthesize.call_count, 40)
+
+    def test_same_parameters_do_not_restart(self):
+        presynth = Presynthesizer()
+        presynth.start(self.srt_path, PARAMS)
+        thread = presynth._thread
+        presynth.start(self.srt_path, dict(PARAMS))
+        self.assertIs(presynth._thread, thread)
+        presynth.stop()
+
+if __name__ == '__main__':
+    unittest.main()
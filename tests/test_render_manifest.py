@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core.audio_clip import AudioClip
+from core.audio_processor import AudioProcessor
+from core.render_manifest import RenderManifest
+from core.subtitle_parser import SubtitleItem
+from core.tts_provider import TTSProvider
+
+class _ToneTTS(TTSProvider):
+    """按文本长度生成常量采样的假引擎，记录每次真正合成的文本"""
+    def __init__(self, fail_texts=()):
+        self.calls = []
+        self.fail_texts = set(fail_texts)
+
+    def cache_identity(self):
+        return {"mode": "fake"}
+
+    def generate_audio(self, text, output_path):
+        raise AssertionError("应走内存合成路径")
+
+    def synthesize(self, text):
+        self.calls.append(text)
+        if text in self.fail_texts:
+            return None
+        samples = np.full((22050 * len(text) // 10, 1), 1000, dtype=np.int16)
+        return AudioClip(samples, 22050)
+
+def _subs(*texts):
+    return [SubtitleItem(index=i, start_time_ms=(i - 1) * 1000, end_time_ms=i * 1000, duration_ms=1000, text=t)
+            for i, t in enumerate(texts, start=1)]
+
+class TestRenderManifest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.work_dir, "out.mp4")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _render(self, tts, subtitles):
+        processor = AudioProcessor(tts, max_workers=1)
+        return processor.render_timeline(subtitles, self.work_dir, 1.5, manifest=RenderManifest(self.output))
+
+    def test_only_changed_lines_are_resynthesized(self):
+        first = self._render(_ToneTTS(), _subs("一二三", "四五六七", "八九"))
+
+        tts = _ToneTTS()
+        subtitles = _subs("一二三", "改过的一句", "八九")
+        manifest = RenderManifest(self.output)
+        manifest.begin(AudioProcessor(tts).render_params(1.5))
+        self.assertEqual(manifest.diff(subtitles),
+                         {"unchanged": 2, "changed": 1, "added": 0, "removed": 0, "reusable": 2})
+
+        second = self._render(tts, subtitles)
+        self.assertEqual(tts.calls, ["改过的一句"])
+        # 未改动的句子原样拼回时间轴
+        np.testing.assert_array_equal(first.samples[:22050], second.samples[:22050])
+        np.testing.assert_array_equal(first.samples[44100:], second.samples[44100:])
+
+        with open(os.path.join(self.output + ".lark", "manifest.json"), encoding="utf-8") as f:
+            lines = json.load(f)["lines"]
+        self.assertEqual([line["text"] for line in lines], ["一二三", "改过的一句", "八九"])
+        # 被替换的旧片段已被清理
+        self.assertEqual(len(os.listdir(os.path.join(self.output + ".lark", "segments"))), 3)
+
+    def test_resume_after_partial_run(self):
+        # 第一次运行中第二句失败 (模拟中途崩溃)，已完成的句子仍然落盘
+        self._render(_ToneTTS(fail_texts={"四五六七"}), _subs("一二三", "四五六七", "八九"))
+        tts = _ToneTTS()
+        self._render(tts, _subs("一二三", "四五六七", "八九"))
+        self.assertEqual(tts.calls, ["四五六七"])
+
+    def test_stretched_segment_is_stored_fitted(self):
+        tts = _ToneTTS()
+        # 15 个字 -> 1.5 秒音频，需压缩进 1 秒窗口
+        self._render(tts, _subs("字" * 15))
+        tts2 = _ToneTTS()
+        timeline = self._render(tts2, _subs("字" * 15))
+        self.assertEqual(tts2.calls, [])
+        self.assertTrue(np.any(timeline.samples[-100:] != 0))
+
+    def test_param_change_invalidates_segments(self):
+        self._render(_ToneTTS(), _subs("一二三"))
+        tts = _ToneTTS()
+        processor = AudioProcessor(tts, max_workers=1)
+        processor.render_timeline(_subs("一二三"), self.work_dir, 1.2, manifest=RenderManifest(self.output))
+        self.assertEqual(tts.calls, ["一二三"])
+
+    def test_segment_temp_files_are_unique_across_processes(self):
+        manifest = RenderManifest(self.output)
+        manifest.begin({"mode": "fake"})
+        staged, replace = [], os.replace
+        with patch('threading.get_ident', return_value=1), \
+                patch('os.replace', side_effect=lambda src, dst: staged.append(src) or replace(src, dst)):
+            for pid in (100, 200):
+                with patch('os.getpid', return_value=pid):
+                    manifest.save_segment("ab" * 32, np.zeros((80, 1), dtype=np.int16), 22050)
+        self.assertEqual(len(set(staged)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
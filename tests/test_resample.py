@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+from core.resample import resample, remix
+
+def _tone(freq, rate, seconds=0.5, amplitude=12000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16).reshape(-1, 1)
+
+def _snr_db(samples, freq, rate, amplitude=12000, margin=200):
+    t = np.arange(len(samples)) / rate
+    ref = amplitude * np.sin(2 * np.pi * freq * t)
+    err = (samples[:, 0] - ref)[margin:-margin]
+    return 10 * np.log10(np.mean(ref[margin:-margin] ** 2) / np.mean(err ** 2))
+
+class TestResample(unittest.TestCase):
+    def test_up_and_down_sampling_preserve_tone(self):
+        for src, dst in ((22050, 48000), (48000, 22050), (24000, 44100)):
+            out = resample(_tone(1000, src), src, dst)
+            self.assertEqual(len(out), dst // 2)
+            self.assertEqual(out.dtype, np.int16)
+            self.assertGreater(_snr_db(out, 1000, dst), 70)
+
+    def test_downsampling_removes_content_above_new_nyquist(self):
+        # 15kHz 在 22050Hz 下无法表示，应被低通滤除而不是折叠成可闻的混叠
+        out = resample(_tone(15000, 48000), 48000, 22050)
+        self.assertLess(np.abs(out[200:-200]).max(), 10)
+
+    def test_same_rate_and_channel_passthrough(self):
+        samples = _tone(440, 22050)
+        self.assertIs(resample(samples, 22050, 22050), samples)
+        self.assertIs(remix(samples, 1), samples)
+
+    def test_remix_channels(self):
+        mono = np.array([[100], [-200]], dtype=np.int16)
+        stereo = remix(mono, 2)
+        self.assertEqual(stereo.tolist(), [[100, 100], [-200, -200]])
+        self.assertEqual(remix(np.array([[100, 300]], dtype=np.int16), 1).tolist(), [[200]])
+
+if __name__ == '__main__':
+    unittest.main()
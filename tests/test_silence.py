@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from core.silence import trim_silence
+
+RATE = 16000
+
+def _signal(lead_ms, speech_ms, tail_ms, channels=1, noise=0):
+    """首尾为静音 (可带低电平噪声)、中间为满幅一半的正弦"""
+    rng = np.random.default_rng(0)
+    n = (lead_ms + speech_ms + tail_ms) * RATE // 1000
+    samples = rng.integers(-noise, noise + 1, size=(n, channels)) if noise else np.zeros((n, channels))
+    start = lead_ms * RATE // 1000
+    t = np.arange(speech_ms * RATE // 1000) / RATE
+    samples[start:start + len(t)] = (16000 * np.sin(2 * np.pi * 220 * t))[:, None]
+    return samples.astype(np.int16)
+
+class TestTrimSilence(unittest.TestCase):
+    def test_trims_to_voiced_region_with_guard(self):
+        samples = _signal(300, 500, 200, noise=20)
+        trimmed = trim_silence(samples, RATE, threshold_db=-45, pad_ms=40, window_ms=10)
+        # 有声区间 [300ms, 800ms) 两侧各保留 40ms
+        self.assertEqual(len(trimmed), 580 * RATE // 1000)
+        self.assertTrue(np.shares_memory(trimmed, samples))
+
+    def test_stereo_and_edges(self):
+        samples = _signal(0, 500, 0, channels=2)
+        self.assertEqual(len(trim_silence(samples, RATE)), len(samples))
+        # 整段静音或空数组原样返回
+        silent = np.zeros((RATE, 1), dtype=np.int16)
+        self.assertIs(trim_silence(silent, RATE), silent)
+        empty = np.zeros((0, 1), dtype=np.int16)
+        self.assertIs(trim_silence(empty, RATE), empty)
+
+    def test_threshold_keeps_quiet_speech(self):
+        samples = _signal(200, 300, 200, noise=20)
+        samples[200 * RATE // 1000:500 * RATE // 1000] //= 20  # 约 -35 dBFS 的轻声
+        self.assertEqual(len(trim_silence(samples, RATE, threshold_db=-45, pad_ms=0)), 300 * RATE // 1000)
+        self.assertEqual(len(trim_silence(samples, RATE, threshold_db=-30, pad_ms=0)), len(samples))
+
+if __name__ == '__main__':
+    unittest.main()
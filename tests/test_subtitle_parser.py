@@ -1,7 +1,8 @@
 import os
 import tempfile
 import unittest
-from core.subtitle_parser import SubtitleParser
+from core.subtitle_parser import SubtitleParser, SubtitleItem, detect_encoding, parse_timecode, select_range
+from benchmarks.bench_subtitle_parser import parse_with_pysrt
 
 class TestSubtitleParser(unittest.TestCase):
     def setUp(self):
@@ -34,6 +35,66 @@ class TestSubtitleParser(unittest.TestCase):
         self.assertEqual(items[1].duration_ms, 2000)
         self.assertEqual(items[1].text, "这是第二句话")
 
+    def _write(self, content, encoding):
+        with open(self.srt_path, 'w', encoding=encoding) as f:
+            f.write(content)
+
+    def test_gbk_detected_from_sample(self):
+        self._write("1\n00:00:01,000 --> 00:00:02,000\n简体中文字幕，编码为国标扩展\n", "gbk")
+        self.assertEqual(detect_encoding(self.srt_path), "gb18030")
+        self.assertEqual(SubtitleParser(self.srt_path).parse()[0].text, "简体中文字幕，编码为国标扩展")
+
+    def test_utf8_bom_and_truncated_sample(self):
+        self._write("\ufeff1\n00:00:01,000 --> 00:00:02,000\n你好\n", "utf-8")
+        self.assertEqual(detect_encoding(self.srt_path), "utf-8-sig")
+        self._write("1\n00:00:01,000 --> 00:00:02,000\n你好\n", "utf-8")
+        # 样本在多字节字符中间截断时仍判定为 UTF-8
+        self.assertEqual(detect_encoding(self.srt_path, sample_bytes=32), "utf-8")
+
+    def test_iter_items_is_lazy(self):
+        items = SubtitleParser(self.srt_path).iter_items()
+        self.assertEqual(next(items).index, 1)
+        self.assertEqual(next(items).index, 2)
+
+    def test_matches_pysrt_on_irregular_input(self):
+        self._write(
+            "1\n00:00:01,000 --> 00:00:02,000 X1:10 Y1:20\n带位置信息\n\n"
+            "2\n00:00:03.000 --> 00:00:04.500\n点号分隔\n  \n"
+            "garbage block\n\n"
+            "3\n00:00:05,000 --> 00:00:05,000\n零时长\n\n"
+            "00:00:06,000 --> 00:00:07,000\n没有序号\n\n\n\n"
+            "5\n00:00:08,000 --> 00:00:09,000\n\n"
+            "6\n00:00:10,000 --> 00:00:11,000\n<i>最后一句</i>",
+            "utf-8"
+        )
+        items = SubtitleParser(self.srt_path).parse()
+        self.assertEqual(items, list(parse_with_pysrt(self.srt_path)))
+        self.assertEqual([item.index for item in items], [1, 2, 4, 6])
+
+    def test_parse_timecode(self):
+        self.assertEqual(parse_timecode("90"), 90000)
+        self.assertEqual(parse_timecode("1:30.5"), 90500)
+        self.assertEqual(parse_timecode("00:01:30,250"), 90250)
+        with self.assertRaises(ValueError):
+            parse_timecode("1:x")
+
+    def test_select_range_expands_to_whole_lines(self):
+        items = [
+            SubtitleItem(1, 1000, 3000, 2000, "一"),
+            SubtitleItem(2, 4000, 6000, 2000, "二"),
+            SubtitleItem(3, 9000, 12000, 3000, "三"),
+        ]
+        selected, span = select_range(items, 2000, 10000)
+        # 第 1、3 句部分重叠，截取范围向外扩展到它们的完整时间轴，时间改为相对起点
+        self.assertEqual(span, (1000, 12000))
+        self.assertEqual([(it.index, it.start_time_ms, it.end_time_ms) for it in selected],
+                         [(1, 0, 2000), (2, 3000, 5000), (3, 8000, 11000)])
+
+        selected, span = select_range(items, 5000)
+        self.assertEqual(span, (4000, None))
+        self.assertEqual([it.index for it in selected], [2, 3])
+        self.assertEqual(select_range(items, 6500, 8000)[0], [])
+
     def test_parse_file_not_found(self):
         with self.assertRaises(FileNotFoundError):
             SubtitleParser("non_existent_file.srt")
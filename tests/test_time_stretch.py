@@ -0,0 +1,38 @@
+import unittest
+import numpy as np
+from core.time_stretch import wsola_stretch, stretch_many
+
+SR = 22050
+
+def _sine(freq, seconds, channels=1):
+    t = np.arange(int(SR * seconds)) / SR
+    wave = (np.sin(2 * np.pi * freq * t) * 8000).astype(np.int16)
+    return np.repeat(wave.reshape(-1, 1), channels, axis=1)
+
+def _dominant_freq(samples):
+    spectrum = np.abs(np.fft.rfft(samples.astype(np.float64)))
+    return np.argmax(spectrum) * SR / len(samples)
+
+class TestTimeStretch(unittest.TestCase):
+    def test_length_follows_ratio(self):
+        x = _sine(220, 3)
+        for ratio in (1.1, 1.5, 0.8):
+            y = wsola_stretch(x, ratio, SR)
+            self.assertEqual(len(y), int(round(len(x) / ratio)))
+
+    def test_pitch_is_preserved(self):
+        y = wsola_stretch(_sine(440, 2), 1.4, SR)
+        self.assertAlmostEqual(_dominant_freq(y[:, 0]), 440, delta=5)
+
+    def test_stereo_shape_and_dtype(self):
+        y = wsola_stretch(_sine(300, 1, channels=2), 1.25, SR)
+        self.assertEqual(y.shape[1], 2)
+        self.assertEqual(y.dtype, np.int16)
+
+    def test_stretch_many_keeps_order(self):
+        jobs = [(_sine(220, 1), 1.2), (_sine(220, 2), 1.5)]
+        results = stretch_many(jobs, SR, workers=1)
+        self.assertEqual([len(r) for r in results], [int(round(SR / 1.2)), int(round(2 * SR / 1.5))])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import wave
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core.audio_clip import AudioClip
+from core.tts_provider import TTSProvider, ThrottledTTSProvider
+from core.tts_cache import TTSCache, CachedTTSProvider, normalize_text
+
+class _CountingTTS(TTSProvider):
+    """写出固定长度静音 wav 并记录调用次数的假引擎"""
+    def __init__(self, voice="A", frames=8000):
+        self.voice = voice
+        self.frames = frames
+        self.calls = 0
+
+    def cache_identity(self):
+        return {"mode": "fake", "voice": self.voice}
+
+    def generate_audio(self, text, output_path):
+        self.calls += 1
+        with wave.open(output_path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\x00\x00" * self.frames)
+        return True
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.work_dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _out(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def test_hit_skips_engine_across_instances(self):
+        tts = _CountingTTS()
+        cached = CachedTTSProvider(tts, TTSCache(self.cache_dir, 10 ** 9, fmt="wav"))
+        self.assertTrue(cached.generate_audio("你好 世界", self._out("a.wav")))
+        # 新的 provider 实例模拟下一次运行，规范化后相同的文本应直接命中
+        cached2 = CachedTTSProvider(tts, TTSCache(self.cache_dir, 10 ** 9, fmt="wav"))
+        self.assertTrue(cached2.generate_audio("  你好   世界 ", self._out("b.wav")))
+        self.assertEqual(tts.calls, 1)
+        self.assertEqual(cached2.hits, 1)
+        self.assertTrue(os.path.exists(self._out("b.wav")))
+
+    def test_identity_is_part_of_key(self):
+        cache = TTSCache(self.cache_dir, 10 ** 9, fmt="wav")
+        self.assertNotEqual(cache.make_key({"voice": "A"}, "x"), cache.make_key({"voice": "B"}, "x"))
+        self.assertEqual(normalize_text("ＡＢ　 c"), "AB c")
+
+    def test_speed_is_part_of_key(self):
+        tts = _CountingTTS()
+        tts.supports_speed = True
+        cached = CachedTTSProvider(tts, TTSCache(self.cache_dir, 10 ** 9, fmt="wav"))
+        cached.synthesize("你好")
+        cached.synthesize("你好", 1.0)
+        self.assertEqual(tts.calls, 1)
+        # 不同语速的结果各自缓存；1.0 倍速沿用原有的缓存键
+        cached.synthesize_batch(["你好", "你好"], [1.2, 1.2])
+        self.assertEqual(tts.calls, 2)
+        self.assertEqual(cached.cache.make_key(tts.cache_identity(), "x"),
+                         cached.cache.make_key(cached._identity(1.0), "x"))
+
+    def test_lru_eviction_respects_budget(self):
+        tts = _CountingTTS(frames=8000)  # 每个条目约 16KB
+        cache = TTSCache(self.cache_dir, max_bytes=40000, fmt="wav")
+        cached = CachedTTSProvider(tts, cache)
+        for i in range(4):
+            cached.generate_audio(f"line {i}", self._out(f"{i}.wav"))
+        self.assertLessEqual(cache._scan_size(), 40000)
+        # 最近写入的条目应被保留
+        self.assertTrue(cache.fetch(cache.make_key(tts.cache_identity(), "line 3"), self._out("again.wav")))
+
+    def test_batch_dedupes_and_uses_cache(self):
+        tts = _CountingTTS()
+        cached = CachedTTSProvider(tts, TTSCache(self.cache_dir, 10 ** 9, fmt="wav"))
+        cached.generate_audio("已缓存", self._out("warm.wav"))
+        items = [("已缓存", self._out("1.wav")), ("重复", self._out("2.wav")), ("重复", self._out("3.wav"))]
+        self.assertEqual(cached.generate_batch(items), [True, True, True])
+        # 预热 1 次 + 批内去重后只合成 "重复" 1 次
+        self.assertEqual(tts.calls, 2)
+        self.assertTrue(all(os.path.exists(path) for _, path in items))
+
+    def test_generate_batch_forwards_speeds(self):
+        tts = _CountingTTS()
+        tts.supports_speed = True
+        received = []
+        tts.synthesize_batch = lambda texts, speeds=None: received.append(speeds) or [None] * len(texts)
+        cached = CachedTTSProvider(ThrottledTTSProvider(tts, threading.BoundedSemaphore(1)),
+                                   TTSCache(self.cache_dir, 10 ** 9, fmt="wav"))
+        items = [("一", self._out("1.wav")), ("二", self._out("2.wav"))]
+        self.assertEqual(cached.generate_batch(items, [0.8, 1.25]), [False, False])
+        # 缓存层与限流层都把逐句语速原样交给底层引擎
+        self.assertEqual(received, [[0.8, 1.25]])
+
+        # 关闭同样逐层转发到底层引擎
+        tts.close = lambda: received.append("closed")
+        cached.close()
+        self.assertEqual(received[-1], "closed")
+
+    def test_default_format_and_key_locks_stay_bounded(self):
+        # 缺省格式在进程内读写，不依赖 ffmpeg 子进程
+        self.assertEqual(TTSCache(self.cache_dir).fmt, "wav")
+        tts = _CountingTTS(frames=80)
+        cached = CachedTTSProvider(tts, TTSCache(self.cache_dir, 10 ** 9))
+        for i in range(200):
+            cached.synthesize(f"第{i}句")
+        cached.synthesize_batch([f"批{i}" for i in range(100)] + ["批0"])
+        # 常驻进程合成再多不同文本，去重锁的数量也不增长
+        self.assertEqual(len(cached._key_locks), 64)
+        self.assertEqual(tts.calls, 300)
+
+    def test_temp_files_are_unique_across_processes(self):
+        # 批量任务的工作进程共享缓存目录，不同进程中的线程标识可能相同
+        cache = TTSCache(self.cache_dir, 10 ** 9, fmt="wav")
+        clip = AudioClip(np.zeros((80, 1), dtype=np.int16), 16000)
+        staged, replace = [], os.replace
+        with patch('threading.get_ident', return_value=1), \
+                patch('os.replace', side_effect=lambda src, dst: staged.append(src) or replace(src, dst)):
+            for pid in (100, 200):
+                with patch('os.getpid', return_value=pid):
+                    cache.store("ab" * 32, clip)
+        self.assertEqual(len(set(staged)), 2)
+
+    def test_size_counter_sees_other_processes_writes(self):
+        # 两个实例模拟共用缓存目录的两个进程
+        tts = _CountingTTS(frames=8000)  # 每个条目约 16KB
+        first = CachedTTSProvider(tts, TTSCache(self.cache_dir, max_bytes=70000, fmt="wav"))
+        second = CachedTTSProvider(tts, TTSCache(self.cache_dir, max_bytes=70000, fmt="wav"))
+        clock = [0.0]
+        with patch('core.tts_cache.time.monotonic', side_effect=lambda: clock[0]):
+            second.synthesize("乙")
+            for text in ("甲", "丙", "戊"):
+                first.synthesize(text)
+            # second 只累计了自己的一个条目；超过重新扫描间隔后的写入会计入 first 的三个条目
+            clock[0] += 60
+            second.synthesize("丁")
+        self.assertLessEqual(second.cache._scan_size(), 70000)
+
+if __name__ == '__main__':
+    unittest.main()
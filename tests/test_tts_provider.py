@@ -1,6 +1,17 @@
+import io
+import os
+import json
+import wave
+import shutil
+import tempfile
 import unittest
-from unittest.mock import patch
-from core.tts_provider import Pyttsx3TTS, HttpTTS
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock
+from core.tts_provider import Pyttsx3TTS, HttpTTS, NativeProcessPoolTTS, get_tts_provider
+from core.http_pool import HTTPResult
+
+# 批量接口缺省关闭，批量相关的用例显式配置地址
+BATCH_URL = "http://localhost:9233/v1/audio/speech/batch"
 
 class TestTTSProvider(unittest.TestCase):
     @patch('sys.platform', 'darwin')
@@ -26,19 +37,272 @@ class TestTTSProvider(unittest.TestCase):
         args_ffmpeg = mock_run.call_args_list[1][0][0]
         self.assertIn('ffmpeg', args_ffmpeg)
 
-    @patch('urllib.request.urlopen')
-    def test_http_tts_success(self, mock_urlopen):
-        # Mocking http response
-        mock_response = mock_urlopen.return_value.__enter__.return_value
-        mock_response.status = 200
-        mock_response.read.return_value = b'fake_audio_data'
+    @patch('sys.platform', 'linux')
+    @patch('core.tts_provider.pyttsx3')
+    def test_native_batch_single_run_and_wait(self, mock_pyttsx3):
+        engine = MagicMock()
+        engine.getProperty.return_value = []
+        engine.save_to_file.side_effect = lambda text, path: open(path, "wb").close()
+        mock_pyttsx3.init.return_value = engine
+        tts = Pyttsx3TTS("female")
+        self.assertTrue(tts.supports_batch)
+        # 驱动推迟到首次合成时才初始化
+        mock_pyttsx3.init.assert_not_called()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            items = [(f"第{i}句", os.path.join(tmp, f"{i}.wav")) for i in range(5)]
+            self.assertEqual(tts.generate_batch(items), [True] * 5)
+        # 找不到同名音色时按 espeak-ng 标识符直接设置
+        engine.setProperty.assert_any_call('voice', 'cmn+f3')
+        self.assertEqual(mock_pyttsx3.init.call_count, 1)
+        # 整批排队后只进入一次驱动循环
+        self.assertEqual(engine.save_to_file.call_count, 5)
+        self.assertEqual(engine.runAndWait.call_count, 1)
+
+    @patch('sys.platform', 'linux')
+    @patch('core.tts_provider.pyttsx3')
+    def test_native_batch_per_line_rate(self, mock_pyttsx3):
+        engine = MagicMock()
+        engine.getProperty.return_value = []
+        mock_pyttsx3.init.return_value = engine
+        tts = Pyttsx3TTS("female", rate=200)
+        tts.engine
+        engine.reset_mock()
+        tts.generate_batch([("一", "a.wav"), ("二", "b.wav")], speeds=[1.0, 1.25])
+        # 先切换到本实例的音色与语速，逐句语速与 save_to_file 交替排队
+        calls = [c for c in engine.mock_calls if c[0] in ("setProperty", "save_to_file")]
+        self.assertEqual([c[1] for c in calls], [
+            ('voice', 'cmn+f3'), ('rate', 200), ('rate', 200), ("一", "a.wav"), ('rate', 250), ("二", "b.wav")
+        ])
+
+    @patch('sys.platform', 'linux')
+    @patch('core.tts_provider.pyttsx3')
+    def test_native_instances_sharing_engine_keep_own_voice(self, mock_pyttsx3):
+        # pyttsx3.init() 在同一进程内返回同一个引擎
+        engine = MagicMock()
+        engine.getProperty.return_value = []
+        mock_pyttsx3.init.return_value = engine
+        male, female = Pyttsx3TTS("male", rate=160), Pyttsx3TTS("female", rate=220)
+        male.engine, female.engine
+        female.generate_audio("一", "a.wav")
+        male.generate_audio("二", "b.wav")
+        # 每次合成前都重新设置自己的音色与语速，不会沿用另一实例最后设置的值
+        calls = [c[1] for c in engine.mock_calls if c[0] in ("setProperty", "save_to_file")]
+        self.assertEqual(calls, [
+            ('voice', 'cmn+f3'), ('rate', 220), ("一", "a.wav"),
+            ('voice', 'cmn+m3'), ('rate', 160), ("二", "b.wav"),
+        ])
+
+    @patch('sys.platform', 'linux')
+    @patch('core.tts_provider.pyttsx3', MagicMock())
+    def test_native_process_pool_dispatch(self):
+        with patch('core.tts_provider.config.NATIVE_TTS_PROCESSES', 4), \
+                patch('core.tts_provider.config.TTS_CACHE_ENABLED', False):
+            tts = get_tts_provider({"mode": "native", "gender": "male"})
+        self.assertIsInstance(tts, NativeProcessPoolTTS)
+        self.assertTrue(tts.thread_safe)
+        self.assertEqual(tts.cache_identity()["voice"], "cmn+m3")
+
+        executor = MagicMock()
+        future = Future()
+        future.set_result([True, False])
+        executor.submit.return_value = future
+        with patch.object(tts, '_get_executor', return_value=executor):
+            self.assertEqual(tts.generate_batch([("一", "a.wav"), ("二", "b.wav")]), [True, False])
+        # 整批交给同一个工作进程，由其独占的引擎一次性合成
+        self.assertEqual(executor.submit.call_args[0][1], [("一", "a.wav"), ("二", "b.wav")])
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_success(self, mock_request):
+        # Mocking pooled http response
+        mock_request.return_value = HTTPResult(200, {}, b'fake_audio_data')
         
-        tts = HttpTTS()
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
         with patch('builtins.open', unittest.mock.mock_open()) as mocked_file:
             result = tts.generate_audio("Test", "mock.wav")
             self.assertTrue(result)
             mocked_file.assert_called_with("mock.wav", 'wb')
             mocked_file().write.assert_called_with(b'fake_audio_data')
 
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_streams_only_to_files(self, mock_request):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\x01\x00" * 1600)
+        mock_request.return_value = HTTPResult(200, {}, buf.getvalue())
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        # 内存合成直接解析整段响应体，不经过流式写入器
+        self.assertEqual(tts.synthesize("Test").duration_ms, 100)
+        self.assertIsNone(mock_request.call_args[1]["stream_factory"])
+        # 落盘请求边接收边写入文件
+        with patch('config.COSYVOICE_STREAMING', True), patch('builtins.open', unittest.mock.mock_open()):
+            tts.generate_audio("Test", "mock.wav")
+        self.assertTrue(callable(mock_request.call_args[1]["stream_factory"]))
+
+    @patch('config.COSYVOICE_BATCH_URL', BATCH_URL)
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_batch_splits_response(self, mock_request):
+        # 服务端返回拼接的 wav，并通过响应头给出每句的帧数
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\x01\x00" * 300 + b"\x02\x00" * 500)
+        mock_request.return_value = HTTPResult(200, {"X-Segment-Frames": "300,500"}, buf.getvalue())
+
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, "a.wav"), os.path.join(tmp, "b.wav")]
+            result = tts.generate_batch([("第一句", paths[0]), ("第二句", paths[1])])
+            self.assertEqual(result, [True, True])
+            self.assertEqual(mock_request.call_count, 1)
+            for path, frames in zip(paths, (300, 500)):
+                with wave.open(path, "rb") as w:
+                    self.assertEqual(w.getnframes(), frames)
+
+    @patch('config.COSYVOICE_BATCH_URL', BATCH_URL)
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_batch_falls_back_when_unsupported(self, mock_request):
+        mock_request.side_effect = [HTTPResult(404, {}, b""), HTTPResult(200, {}, b"a"), HTTPResult(200, {}, b"b")]
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        with tempfile.TemporaryDirectory() as tmp:
+            result = tts.generate_batch([("一", os.path.join(tmp, "a.wav")), ("二", os.path.join(tmp, "b.wav"))])
+        self.assertEqual(result, [True, True])
+        self.assertFalse(tts.batch_available)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_synthesize_in_memory(self, mock_request):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\x01\x00" * 1600)
+        mock_request.return_value = HTTPResult(200, {}, buf.getvalue())
+
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        with patch('builtins.open') as mocked_open:
+            clip = tts.synthesize("Test")
+        # 音频不经过任何临时文件，时长由采样数直接得出
+        self.assertFalse(mocked_open.called)
+        self.assertEqual(clip.frame_rate, 16000)
+        self.assertEqual(clip.samples.shape, (1600, 1))
+        self.assertEqual(clip.duration_ms, 100)
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_speed_in_payload(self, mock_request):
+        mock_request.return_value = HTTPResult(500, {}, b"")
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        tts.synthesize("Test")
+        self.assertNotIn("speed", json.loads(mock_request.call_args[1]["body"]))
+        tts.synthesize("Test", 1.2)
+        self.assertEqual(json.loads(mock_request.call_args[1]["body"])["speed"], 1.2)
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_requests_pcm_at_job_rate(self, mock_request):
+        mock_request.return_value = HTTPResult(200, {"X-Sample-Rate": "48000"}, b"\x01\x00" * 4800)
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        tts.set_output_sample_rate(48000)
+        with patch('config.COSYVOICE_STREAMING', False):
+            clip = tts.synthesize("Test")
+        payload = json.loads(mock_request.call_args[1]["body"])
+        self.assertEqual((payload["response_format"], payload["sample_rate"]), ("pcm", 48000))
+        # 服务端声明了采样率的裸 PCM 按该采样率解释
+        self.assertEqual((clip.frame_rate, clip.duration_ms), (48000, 100))
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_pcm_ignored_sample_rate_refetches_wav(self, mock_request):
+        # 服务端忽略 sample_rate，按自身的 24kHz 返回未声明采样率的裸 PCM
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(24000)
+            w.writeframes(b"\x01\x00" * 2400)
+        mock_request.side_effect = [HTTPResult(200, {"Content-Type": "audio/pcm"}, b"\x01\x00" * 2400),
+                                    HTTPResult(200, {}, buf.getvalue())]
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        tts.set_output_sample_rate(48000)
+        clip = tts.synthesize("Test")
+        # 不会把 24kHz 的音频当作 48kHz，改为请求自带采样率的 wav
+        self.assertEqual((clip.frame_rate, clip.duration_ms), (24000, 100))
+        self.assertEqual(json.loads(mock_request.call_args[1]["body"])["response_format"], "wav")
+        self.assertFalse(tts.pcm_available)
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_pcm_falls_back_only_on_format_rejection(self, mock_request):
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        tts.set_output_sample_rate(48000)
+        # 与格式无关的 400 (如某句文本无效) 只影响该句
+        mock_request.side_effect = [HTTPResult(400, {}, b'{"error": "input too long"}')]
+        self.assertIsNone(tts.synthesize("Test"))
+        self.assertTrue(tts.pcm_available)
+
+        mock_request.side_effect = [HTTPResult(422, {}, b'{"error": "unsupported response_format: pcm"}'),
+                                    HTTPResult(500, {}, b""), HTTPResult(500, {}, b"")]
+        tts.synthesize("Test")
+        self.assertFalse(tts.pcm_available)
+        payload = json.loads(mock_request.call_args[1]["body"])
+        self.assertEqual(payload["response_format"], "wav")
+        self.assertNotIn("sample_rate", payload)
+        # 之后的请求直接使用 wav
+        tts.synthesize("Test")
+        self.assertEqual(mock_request.call_count, 4)
+
+    @patch('config.COSYVOICE_BATCH_URL', BATCH_URL)
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_synthesize_batch_splits_clips(self, mock_request):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\x01\x00" * 300 + b"\x02\x00" * 500)
+        mock_request.return_value = HTTPResult(200, {"X-Segment-Frames": "300,500"}, buf.getvalue())
+
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        clips = tts.synthesize_batch(["第一句", "第二句"])
+        self.assertEqual([clip.frames for clip in clips], [300, 500])
+        self.assertTrue((clips[1].samples == 2).all())
+
+    @patch('config.COSYVOICE_BATCH_URL', BATCH_URL)
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_generate_batch_forwards_speeds(self, mock_request):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\x01\x00" * 800)
+        mock_request.return_value = HTTPResult(200, {"X-Segment-Frames": "300,500"}, buf.getvalue())
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        items = [("第一句", os.path.join(work_dir, "a.wav")), ("第二句", os.path.join(work_dir, "b.wav"))]
+
+        # 整批语速一致：批量请求携带该语速
+        self.assertEqual(tts.generate_batch(items, [1.2, 1.2]), [True, True])
+        self.assertEqual(json.loads(mock_request.call_args[1]["body"])["speed"], 1.2)
+        # 语速不一致：逐句请求，各自携带自己的语速
+        mock_request.reset_mock()
+        mock_request.return_value = HTTPResult(200, {}, buf.getvalue())
+        with patch('config.COSYVOICE_STREAMING', False):
+            self.assertEqual(tts.generate_batch(items, [0.9, 1.3]), [True, True])
+        self.assertEqual([json.loads(c[1]["body"])["speed"] for c in mock_request.call_args_list], [0.9, 1.3])
+
+    @patch('core.http_pool.HTTPConnectionPool.request')
+    def test_http_tts_batch_endpoint_is_opt_in(self, mock_request):
+        mock_request.return_value = HTTPResult(200, {}, b"")
+        tts = HttpTTS({"mode": "cosyvoice", "language": "中文", "gender": "male", "style": "broadcaster"})
+        # 未配置批量接口：不按批调度，也不会先发出一次注定失败的批量请求
+        self.assertFalse(tts.supports_batch)
+        tts.synthesize_batch(["第一句", "第二句"])
+        self.assertTrue(all("input" in json.loads(c[1]["body"]) for c in mock_request.call_args_list))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,219 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core.audio_clip import AudioClip
+from core.media_probe import MediaInfo, probe_media, parse_probe_output
+from core.adts import split_frames, chunk_windows
+from core.video_mixer import VideoMixer, plan_mix, vocal_format
+
+STEREO_48K = MediaInfo(duration_s=60.0, has_video=True, has_audio=True, audio_codec="aac",
+                       sample_rate=48000, channels=2, audio_bitrate=320000)
+SILENT = MediaInfo(duration_s=60.0, has_video=True, has_audio=False)
+
+class TestVideoMixer(unittest.TestCase):
+    @patch('core.video_mixer.subprocess.Popen')
+    def test_open_stream_pipes_raw_pcm(self, mock_popen):
+        mixer = VideoMixer()
+        with patch('core.video_mixer.probe_media', return_value=STEREO_48K):
+            stream = mixer.open_stream("in.mp4", "out.mp4", 22050, 1)
+
+        cmd = mock_popen.call_args[0][0]
+        self.assertIn("pipe:0", cmd)
+        self.assertEqual(cmd[cmd.index("-f") + 1], "s16le")
+        self.assertIn("[aout]", cmd)
+        self.assertEqual(mock_popen.call_args[1]["stdin"], subprocess.PIPE)
+
+        samples = np.zeros((100, 1), dtype=np.int16)
+        stream.write(samples)
+        mock_popen.return_value.stdin.write.assert_called_with(samples.tobytes())
+        self.assertEqual(stream.bytes_written, 200)
+
+        mock_popen.return_value.wait.return_value = 0
+        stream.close()
+        mock_popen.return_value.stdin.close.assert_called_once()
+
+    @patch('core.video_mixer.subprocess.Popen')
+    def test_open_stream_without_source_audio(self, mock_popen):
+        with patch('core.video_mixer.probe_media', return_value=SILENT):
+            VideoMixer().open_stream("in.mp4", "out.mp4", 22050, 1)
+        cmd = mock_popen.call_args[0][0]
+        self.assertNotIn("-filter_complex", cmd)
+        self.assertIn("1:a", cmd)
+
+    @patch('core.video_mixer.subprocess.Popen')
+    def test_close_raises_on_ffmpeg_failure(self, mock_popen):
+        mock_popen.return_value.wait.return_value = 1
+        with patch('core.video_mixer.probe_media', return_value=STEREO_48K):
+            stream = VideoMixer().open_stream("in.mp4", "out.mp4", 22050, 1)
+        with self.assertRaises(subprocess.CalledProcessError):
+            stream.close()
+
+def _adts_frame(tag: int) -> bytes:
+    """构造一个负载为 1 字节 tag 的最小 ADTS 帧"""
+    length = 8
+    return bytes([0xFF, 0xF1, 0x50, 0x80 | (length >> 11), (length >> 3) & 0xFF, ((length & 7) << 5) | 0x1F, 0xFC, tag])
+
+class TestMixPlanning(unittest.TestCase):
+    def test_plan_matches_source_audio(self):
+        plan = plan_mix(STEREO_48K, 22050, 1)
+        self.assertEqual((plan.sample_rate, plan.channels), (48000, 2))
+        # 配音重采样并上混到原音轨规格后再混音，码率不低于原音轨
+        self.assertIn("[1:a]aresample=48000,aformat=sample_rates=48000:channel_layouts=stereo[vo]", plan.filter_complex)
+        self.assertEqual(plan.audio_bitrate, "320000")
+        args = plan.output_args()
+        self.assertEqual(args[args.index("-ar") + 1], "48000")
+
+    def test_vocal_in_source_format_mixes_without_conversion(self):
+        self.assertEqual(vocal_format(STEREO_48K), (48000, 2))
+        plan = plan_mix(STEREO_48K, *vocal_format(STEREO_48K))
+        self.assertEqual(plan.filter_complex,
+                         "[0:a]volume=0.2[bg];[bg][1:a]amix=inputs=2:duration=first:dropout_transition=0[aout]")
+        # 无音轨、环绕声或关闭匹配时沿用缺省格式
+        surround = MediaInfo(duration_s=60.0, has_video=True, has_audio=True, sample_rate=48000, channels=6)
+        self.assertEqual(vocal_format(surround), (48000, 1))
+        self.assertEqual(vocal_format(SILENT), (22050, 1))
+        with patch('config.VOCAL_MATCH_SOURCE_FORMAT', False):
+            self.assertEqual(vocal_format(STEREO_48K), (22050, 1))
+        self.assertEqual(VideoMixer().vocal_format("missing.mp4"), (22050, 1))
+
+    def test_plan_for_silent_source(self):
+        plan = plan_mix(SILENT, 22050, 1)
+        self.assertIsNone(plan.filter_complex)
+        self.assertEqual((plan.sample_rate, plan.channels, plan.audio_bitrate), (22050, 1, "192k"))
+
+    @patch('core.video_mixer.subprocess.Popen')
+    def test_mix_silent_source_runs_single_pass(self, mock_popen):
+        mock_popen.return_value.__enter__.return_value.stdout = []
+        mock_popen.return_value.returncode = 0
+        with tempfile.TemporaryDirectory() as work_dir:
+            vocal = os.path.join(work_dir, "vocal.wav")
+            AudioClip(np.zeros((100, 1), dtype=np.int16), 22050).write_wav(vocal)
+            with patch('core.video_mixer.probe_media', return_value=SILENT):
+                VideoMixer().mix("in.mp4", vocal, "out.mp4")
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertNotIn("-filter_complex", mock_popen.call_args[0][0])
+
+    @patch('core.video_mixer.subprocess.Popen')
+    def test_mix_span_seeks_source_and_skips_chunking(self, mock_popen):
+        mock_popen.return_value.__enter__.return_value.stdout = []
+        mock_popen.return_value.returncode = 0
+        with tempfile.TemporaryDirectory() as work_dir:
+            vocal = os.path.join(work_dir, "vocal.wav")
+            AudioClip(np.zeros((100, 1), dtype=np.int16), 22050).write_wav(vocal)
+            with patch('core.video_mixer.probe_media', return_value=STEREO_48K), \
+                    patch('config.MIX_CHUNKS', 3), patch('config.MIX_CHUNK_MIN_SECONDS', 0):
+                VideoMixer().mix("in.mp4", vocal, "out.mp4", span=(61500, 121500))
+        self.assertEqual(mock_popen.call_count, 1)
+        cmd = mock_popen.call_args[0][0]
+        # 只在原视频输入前定位与限长，配音输入从头读取
+        video_at = cmd.index("in.mp4")
+        self.assertEqual(cmd[video_at - 5:video_at], ["-ss", "61.500", "-t", "60.000", "-i"])
+        self.assertEqual(cmd[cmd.index(vocal) - 1], "-i")
+        self.assertEqual(cmd.count("-ss"), 1)
+
+    @patch('core.media_probe.subprocess.run')
+    def test_probe_cached_by_path_size_and_mtime(self, mock_run):
+        mock_run.return_value.stdout = (
+            b'{"streams": [{"codec_type": "video", "codec_name": "h264"},'
+            b' {"codec_type": "audio", "codec_name": "aac", "sample_rate": "44100", "channels": 2}],'
+            b' "format": {"duration": "12.5"}}'
+        )
+        with tempfile.TemporaryDirectory() as work_dir:
+            path = os.path.join(work_dir, "in.mp4")
+            with open(path, "wb") as f:
+                f.write(b"x")
+            info = probe_media(path)
+            probe_media(path)
+            self.assertEqual(mock_run.call_count, 1)
+            self.assertEqual((info.sample_rate, info.channels, info.duration_s), (44100, 2, 12.5))
+            self.assertIsNone(info.audio_bitrate)
+
+            with open(path, "wb") as f:
+                f.write(b"xy")
+            probe_media(path)
+            self.assertEqual(mock_run.call_count, 2)
+
+    @patch('core.video_mixer.subprocess.Popen')
+    def test_mix_variants_writes_labelled_tracks(self, mock_popen):
+        mock_popen.return_value.__enter__.return_value.stdout = []
+        mock_popen.return_value.returncode = 0
+        with tempfile.TemporaryDirectory() as work_dir:
+            tracks = []
+            for i, (title, language) in enumerate([("男声", "chi"), ("English", "eng")]):
+                path = os.path.join(work_dir, f"v{i}.wav")
+                AudioClip(np.zeros((100, 1), dtype=np.int16), 22050).write_wav(path)
+                tracks.append({"path": path, "title": title, "language": language})
+            with patch('core.video_mixer.probe_media', return_value=STEREO_48K):
+                VideoMixer().mix_variants("in.mp4", tracks, "out.mp4")
+
+        cmd = mock_popen.call_args[0][0]
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertEqual(cmd.count("-i"), 3)
+        # 背景音只压低一次，经 asplit 分给两条音轨
+        graph = cmd[cmd.index("-filter_complex") + 1]
+        self.assertEqual(graph.count("volume="), 1)
+        self.assertIn("asplit=2[bg0][bg1]", graph)
+        self.assertEqual([cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-map"], ["0:v", "[aout0]", "[aout1]"])
+        self.assertEqual(cmd[cmd.index("-metadata:s:a:1") + 1], "title=English")
+        self.assertIn("language=eng", cmd)
+        self.assertEqual(cmd[cmd.index("-disposition:a:0") + 1], "default")
+
+    def test_chunk_windows_align_to_aac_frames(self):
+        windows = chunk_windows(48000 * 10 + 7, 4)
+        self.assertEqual(windows[0], (0, 120832))
+        self.assertTrue(all(start % 1024 == 0 for start, _ in windows))
+        self.assertEqual(windows[-1][1], 480007)
+        self.assertEqual(chunk_windows(500, 4), [(0, 500)])
+
+    def test_split_frames(self):
+        data = _adts_frame(1) + _adts_frame(2)
+        self.assertEqual([f[-1] for f in split_frames(data)], [1, 2])
+        with self.assertRaises(ValueError):
+            split_frames(b"\x00" * 8)
+
+    def test_chunked_mix_splices_frames_and_copies_streams(self):
+        long_video = MediaInfo(duration_s=4096 * 3 / 48000, has_video=True, has_audio=True,
+                               sample_rate=48000, channels=2)
+        commands = []
+
+        def fake_run(cmd, report=True):
+            commands.append(cmd)
+            if cmd[-1].endswith(".aac") and "-f" in cmd:
+                # 每段输出: 1 个 priming 帧 + 预热帧 + 窗口帧 + 1 个冲刷帧，负载记录段号与帧序号
+                chunk = int(os.path.basename(cmd[-1])[6:-4])
+                end = int(cmd[cmd.index("-filter_complex") + 1].rsplit("end_sample=", 1)[1].split("[")[0])
+                frames = 1 + -(-end // 1024) + 1
+                with open(cmd[-1], "wb") as f:
+                    for k in range(frames):
+                        f.write(_adts_frame(chunk * 16 + k))
+            else:
+                with open(cmd[cmd.index("-i", 4) + 1], "rb") as f:
+                    self.spliced = [frame[-1] for frame in split_frames(f.read())]
+
+        with tempfile.TemporaryDirectory() as work_dir, \
+                patch('core.video_mixer.probe_media', return_value=long_video), \
+                patch('config.MIX_CHUNKS', 3), patch('config.MIX_CHUNK_MIN_SECONDS', 0):
+            vocal = os.path.join(work_dir, "vocal.wav")
+            AudioClip(np.zeros((100, 1), dtype=np.int16), 22050).write_wav(vocal)
+            mixer = VideoMixer()
+            with patch.object(mixer, '_run_ffmpeg', side_effect=fake_run):
+                mixer.mix("in.mp4", vocal, os.path.join(work_dir, "out.mp4"))
+            self.assertEqual(os.listdir(work_dir), ["vocal.wav"])
+
+        self.assertEqual(len(commands), 4)
+        # 第 2、3 段向前预热 2 帧
+        self.assertAlmostEqual(float(commands[1][commands[1].index("-ss") + 1]), 2048 / 48000, places=5)
+        # 段 0 去掉 priming 帧保留 4 帧；段 1 去掉 priming + 2 个预热帧保留 4 帧；末段保留到冲刷帧
+        self.assertEqual(self.spliced, [1, 2, 3, 4, 19, 20, 21, 22, 35, 36, 37, 38, 39])
+        final = commands[-1]
+        self.assertEqual(final[final.index("-c") + 1], "copy")
+
+    def test_parse_probe_without_audio(self):
+        info = parse_probe_output(b'{"streams": [{"codec_type": "video"}], "format": {"duration": "N/A"}}')
+        self.assertEqual((info.has_video, info.has_audio, info.duration_s), (True, False, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
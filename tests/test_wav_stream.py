@@ -0,0 +1,71 @@
+import io
+import os
+import wave
+import shutil
+import tempfile
+import unittest
+from core.wav_stream import WavStreamWriter, pcm_wav_header
+
+def _chunks(data, size=100):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+class TestWavStreamWriter(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, "out.wav")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_duration_known_from_header_before_body(self):
+        pcm = b"\x01\x00" * 16000  # 1 秒 16kHz 单声道
+        data = pcm_wav_header(1, 2, 16000, len(pcm)) + pcm
+        writer = WavStreamWriter(self.path)
+        chunks = _chunks(data)
+        writer.feed(chunks[0])
+        # 仅收到前 100 字节 (头部) 时已经得到总时长
+        self.assertEqual(writer.duration_ms, 1000)
+        for chunk in chunks[1:]:
+            writer.feed(chunk)
+        writer.close()
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_streaming_wav_sizes_are_patched(self):
+        pcm = b"\x01\x00" * 8000
+        data = pcm_wav_header(1, 2, 16000, 0xFFFFFFFF - 36) + pcm
+        data = data[:40] + b"\xff\xff\xff\xff" + data[44:]
+        writer = WavStreamWriter(self.path)
+        for chunk in _chunks(data):
+            writer.feed(chunk)
+        writer.close()
+        self.assertEqual(writer.duration_ms, 500)
+        with wave.open(self.path, "rb") as w:
+            self.assertEqual(w.getnframes(), 8000)
+
+    def test_raw_pcm_gets_header(self):
+        pcm = b"\x02\x00" * 22050
+        writer = WavStreamWriter(self.path, pcm_format=(1, 2, 22050), content_length=len(pcm))
+        writer.feed(pcm[:4096])
+        self.assertEqual(writer.duration_ms, 1000)
+        for chunk in _chunks(pcm[4096:], 4096):
+            writer.feed(chunk)
+        writer.close()
+        with wave.open(self.path, "rb") as w:
+            self.assertEqual(w.getframerate(), 22050)
+            self.assertEqual(w.getnframes(), 22050)
+
+    def test_in_memory_target_with_raw_pcm(self):
+        buf = io.BytesIO()
+        writer = WavStreamWriter(buf, pcm_format=(1, 2, 16000))
+        for chunk in _chunks(b"\x01\x00" * 4000):
+            writer.feed(chunk)
+        writer.close()
+        # 内存目标不会被关闭，回填长度后可直接按 wav 读取
+        self.assertFalse(buf.closed)
+        with wave.open(io.BytesIO(buf.getvalue()), "rb") as w:
+            self.assertEqual(w.getnframes(), 4000)
+        self.assertEqual(writer.duration_ms, 250)
+
+if __name__ == '__main__':
+    unittest.main()